@@ -30,7 +30,10 @@ export const WebSocketProvider = ({ children }) => {
 }, [isNewMessage]);
 
   useEffect(() => {
-    const socketIo = io('/chat', { transports: ['websocket'] });
+    const socketIo = io('/chat', {
+      transports: ['websocket'],
+      auth: (cb) => cb({ token: localStorage.getItem('accessToken') }),
+    });
 
     socketIo.on('connect', () => {
       console.log('Connected to WebSocket');
@@ -17,7 +17,12 @@ export default function UpdateWebSocketProvider({ children }) {
   const { refetch: refetchCalendarEvents } = useGetCalendarEventsQuery(calendarRange, { skip: !calendarRange });
 
   useEffect(() => {
-    const socket = io('/updates', { transports: ['websocket'], secure: true });
+    const socket = io('/updates', {
+      transports: ['websocket'],
+      secure: true,
+      // Сервер проверяет JWT при подключении и подписывает сокет на комнату пользователя
+      auth: (cb) => cb({ token: localStorage.getItem('accessToken') }),
+    });
 
     socket.on('connect', () => {
       console.log('Connected to updates WebSocket');
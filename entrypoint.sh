@@ -7,5 +7,8 @@ flask db upgrade
 # инициализация данных
 flask seed
 
+# Счётчики фильтров журналов, если они не построены или изменился filter_config
+flask rebuild-journal-facets --stale
+
 # Запуск приложения
 exec python run.py --mode docker 
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import click
 from flask import Flask, send_from_directory, jsonify, abort, current_app
 from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
@@ -171,3 +172,49 @@ def register_cli_commands(app):
         except Exception as e:
             app.logger.error(f"Failed to create list counter triggers: {e}")
         print("Данные успешно инициализированы.")
+
+    @app.cli.command("compact-overrides")
+    def compact_overrides_command():
+        """Удаление избыточных и осиротевших переопределений повторяющихся задач"""
+        from .tasks.calendar.maintenance import compact_overrides
+        stats = compact_overrides()
+        print(f"Проверено: {stats['scanned']}, избыточных: {stats['redundant']}, осиротевших: {stats['orphaned']}")
+
+    @app.cli.command("expire-subscriptions")
+    def expire_subscriptions_command():
+        """Деактивация истёкших подписок и возврат пользователей на Free"""
+        from .subscription_maintenance import expire_subscriptions
+        stats = expire_subscriptions()
+        print(f"Истекло подписок: {stats['expired']}, понижено пользователей: {stats['downgraded']}")
+
+    @app.cli.command("rebuild-journal-facets")
+    @click.option("--stale", is_flag=True,
+                  help="Только журналы, у которых filter_config изменился с прошлого пересчёта")
+    def rebuild_journal_facets_command(stale):
+        """Пересчёт значений выпадающих фильтров журналов (JournalFacet)"""
+        from .journals.facets import rebuild_facets, sync_facets
+        journals = sync_facets()['journals'] if stale else rebuild_facets()
+        print(f"Пересчитано журналов: {journals}")
+
+    @app.cli.command("import-journal")
+    @click.argument("user_id")
+    @click.argument("journal_name")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "file_format", type=click.Choice(["csv", "json", "ndjson"]),
+                  help="Формат файла (по умолчанию — по расширению)")
+    def import_journal_command(user_id, journal_name, path, file_format):
+        """Пакетный импорт записей журнала пользователя из файла"""
+        from .journals.importer import import_entries, read_rows
+        from .journals.models import JournalSchema
+        schema = JournalSchema.query.filter_by(user_id=user_id, name=journal_name).first()
+        if not schema:
+            raise click.ClickException(f"Журнал {journal_name} пользователя {user_id} не найден")
+        file_format = file_format or os.path.splitext(path)[1].lstrip(".").lower()
+        with open(path, "rb") as stream:
+            try:
+                result = import_entries(user_id, schema, read_rows(stream, file_format))
+            except ValueError as e:
+                raise click.ClickException(str(e))
+        for error in result["errors"]:
+            print(f"Строка {error['row']}: {error['errors']}")
+        print(f"Импортировано: {result['imported']}, с ошибками: {result['failed']}")
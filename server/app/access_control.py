@@ -1,5 +1,8 @@
 from functools import wraps
 from flask import jsonify, g
+from collections import OrderedDict
+import threading
+import time
 import json
 
 # Базовые уровни доступа по умолчанию, используются если данные из БД
@@ -22,13 +25,97 @@ DEFAULT_ACCESS_LEVELS = {
     }
 }
 
+# Время жизни и размер кэша разрешений
+PERMISSIONS_CACHE_TTL = 300
+PERMISSIONS_CACHE_SIZE = 1024
+
+
+class PermissionCache:
+    """
+    TTL+LRU-кэш вычисленных разрешений. Ключ — (user_id, ревизия), где ревизия —
+    поля пользователя, от которых зависят права (уровень доступа, админ, модули):
+    их изменение в любом процессе даёт новый ключ. TTL ограничивает устаревание
+    определений уровней доступа, invalidate — явный сброс после изменений.
+    """
+
+    def __init__(self, ttl=PERMISSIONS_CACHE_TTL, maxsize=PERMISSIONS_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Сбрасывает все записи пользователя."""
+        user_id = str(user_id)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+permission_cache = PermissionCache()
+
+
+def _permissions_revision(user):
+    return (user.access_level_id or 1, bool(user.is_admin), tuple(user.modules or ()))
+
+
+def resolve_user_permissions(user):
+    """
+    Права пользователя: {'access_level', 'is_admin', 'permissions'}.
+    Вычисляются один раз и кэшируются. Только чтение: истёкшие подписки
+    понижает периодическая задача expire_subscriptions.
+    """
+    key = (str(user.user_id), _permissions_revision(user))
+    resolved = permission_cache.get(key)
+    if resolved is not None:
+        return resolved
+
+    access_level = user.access_level_id or 1
+    resolved = {
+        'access_level': access_level,
+        'is_admin': bool(user.is_admin),
+        'permissions': get_user_permissions(access_level, user=user),
+    }
+    permission_cache.put(key, resolved)
+    return resolved
+
+
+def current_permissions():
+    """Разрешения текущего запроса: из load_user_permissions или по уровню доступа."""
+    permissions = getattr(g, 'user_permissions', None)
+    if permissions is None:
+        permissions = get_user_permissions(getattr(g, 'user_access_level', 1), getattr(g, 'user_id', None))
+    return permissions
+
+
 def check_access(feature_name):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            user_level = getattr(g, 'user_access_level', 1)
-            user_id = getattr(g, 'user_id', None)
-            permissions = get_user_permissions(user_level, user_id)
+            permissions = current_permissions()
             user_features = permissions.get('features', [])
             
             if '*' not in user_features and feature_name not in user_features:
@@ -38,13 +125,13 @@ def check_access(feature_name):
         return decorated_function
     return decorator
 
-def get_user_permissions(user_access_level, user_id=None):
+def get_user_permissions(user_access_level, user_id=None, user=None):
     """Возвращает разрешения пользователя в виде словаря
     {'name': str, 'max_containers': int, 'features': list}
     Данные берутся из таблицы access_levels. Если таблица недоступна,
     используются значения по умолчанию из DEFAULT_ACCESS_LEVELS.
-    Если указан user_id и у пользователя есть modules, возвращается список
-    modules пользователя, иначе берётся список из тарифа."""
+    Если указан user_id (или уже загруженный user) и у пользователя есть modules,
+    возвращается список modules пользователя, иначе берётся список из тарифа."""
 
     try:
         from .subscription_models import AccessLevel
@@ -61,20 +148,21 @@ def get_user_permissions(user_access_level, user_id=None):
                 'features': features or []
             }
         else:
-            permissions = DEFAULT_ACCESS_LEVELS.get(user_access_level, DEFAULT_ACCESS_LEVELS[1])
+            # Копия, чтобы не менять значения по умолчанию
+            permissions = dict(DEFAULT_ACCESS_LEVELS.get(user_access_level, DEFAULT_ACCESS_LEVELS[1]))
 
-        if user_id:
+        if user is None and user_id:
             user = User.query.get(user_id)
-            if user:
-                if getattr(user, 'is_admin', False):
-                    permissions['features'] = ['*', 'admin']
-                    permissions['max_containers'] = -1
-                elif user.modules:
-                    permissions['features'] = user.modules
-                # если модулей нет, оставляем список из тарифа
+        if user:
+            if getattr(user, 'is_admin', False):
+                permissions['features'] = ['*', 'admin']
+                permissions['max_containers'] = -1
+            elif user.modules:
+                permissions['features'] = user.modules
+            # если модулей нет, оставляем список из тарифа
 
         return permissions
 
     except Exception:
-        permissions = DEFAULT_ACCESS_LEVELS.get(user_access_level, DEFAULT_ACCESS_LEVELS[1])
+        permissions = dict(DEFAULT_ACCESS_LEVELS.get(user_access_level, DEFAULT_ACCESS_LEVELS[1]))
         return permissions
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify, g
-from .access_control import check_access, get_user_permissions, DEFAULT_ACCESS_LEVELS
+from .access_control import check_access, get_user_permissions, permission_cache, DEFAULT_ACCESS_LEVELS
 import json
 import re
 from .main.models import User, db
@@ -55,6 +55,7 @@ def update_user_access_level(user_id):
     user = User.query.get_or_404(user_id)
     user.access_level_id = new_level
     db.session.commit()
+    permission_cache.invalidate(user.user_id)
 
     return jsonify({'message': 'Access level updated successfully'})
 
@@ -80,6 +81,7 @@ def update_user_plan(user_id):
 
     db.session.add(sub)
     db.session.commit()
+    permission_cache.invalidate(user.user_id)
 
     return jsonify({'message': 'Plan updated successfully'})
 
@@ -106,6 +108,7 @@ def update_user_modules(user_id):
     user = User.query.get_or_404(user_id)
     user.modules = modules
     db.session.commit()
+    permission_cache.invalidate(user.user_id)
     return jsonify({'message': 'Modules updated successfully'})
 
 @admin_bp.route('/available-modules', methods=['GET'])
@@ -0,0 +1,216 @@
+"""
+Разбор голосовых команд по настройкам модулей за один проход по тексту.
+
+CommandGrammar собирается один раз на ревизию настроек (см.
+command_utils.get_command_grammar): слова модулей и маркеры полей
+(command_information, command_num_information) сводятся в один автомат
+Ахо–Корасик, который находит все их вхождения в тексте за один проход.
+"""
+
+import re
+from collections import deque, namedtuple
+
+NUMBER_RE = re.compile(r'\d+')
+
+ParsedCommand = namedtuple('ParsedCommand', 'command_type module module_config fields spans')
+ParsedCommand.__doc__ = """
+Результат разбора: тип команды (по первому слову), модуль, его настройки,
+значения полей и спаны маркеров полей [(поле, начало, конец)] в тексте.
+"""
+
+
+class KeywordAutomaton:
+    """Автомат Ахо–Корасик: все вхождения набора слов в текст за один проход."""
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for index, keyword in enumerate(self.keywords):
+            node = 0
+            for char in keyword:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][char] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                node = child
+            self._output[node] += (index,)
+
+        # Суффиксные ссылки обходом в ширину (у узла меньшей глубины они уже
+        # готовы) и полная таблица переходов: при сканировании не нужно
+        # возвращаться по суффиксным ссылкам
+        self._delta = [dict(self._goto[0])] + [None] * (len(self._goto) - 1)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            self._output[node] += self._output[self._fail[node]]
+            self._delta[node] = {**self._delta[self._fail[node]], **self._goto[node]}
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0) if node else 0
+                queue.append(child)
+
+    def find_all(self, text):
+        """{индекс слова: [позиции начала по возрастанию]} для всех найденных слов."""
+        delta, output, keywords = self._delta, self._output, self.keywords
+        found = {}
+        node = 0
+        for position, char in enumerate(text):
+            node = delta[node].get(char, 0)
+            if output[node]:
+                for index in output[node]:
+                    found.setdefault(index, []).append(position - len(keywords[index]) + 1)
+        return found
+
+
+class CommandGrammar:
+    """
+    Скомпилированные настройки команд. Правила те же, что у прежнего поиска
+    через str.find: модуль — тот, чьё слово встречается в тексте раньше всех
+    (при равенстве — первый в modules.json), маркер поля — первое из слов
+    поля, найденное в тексте до комментария; значение поля — текст после
+    слова с маркером до следующего маркера. Позиции считаются по тексту в
+    нижнем регистре и не сдвигаются от уже найденных маркеров.
+    """
+
+    def __init__(self, modules, commands_list, command_information, command_num_information,
+                 time_parser=None):
+        self.modules = modules
+        self.info_words = command_information | command_num_information
+        self.num_fields = set(command_num_information)
+        self.time_parser = time_parser
+
+        self.command_types = {}
+        for command_type, words in commands_list.items():
+            for word in words:
+                self.command_types.setdefault(word, command_type)
+
+        words = {}
+        self._module_words = []
+        for module_index, (module, config) in enumerate(modules.items()):
+            for word_index, word in enumerate(config.get('words', [])):
+                # Ключ сортировки: кто выигрывает при одинаковой позиции
+                self._module_words.append((words.setdefault(word.lower(), len(words)), (module_index, word_index),
+                                           module))
+        # Текст сравнивается в нижнем регистре, поэтому и маркеры тоже (иначе «Год» не находился бы никогда)
+        self._field_words = {
+            field: [words.setdefault(word.lower(), len(words)) for word in field_words]
+            for field, field_words in self.info_words.items()
+        }
+        self._word_lengths = [len(word) for word in words]
+        self._empty_words = {index for word, index in words.items() if not word}
+        self.automaton = KeywordAutomaton(words)
+
+    def scan(self, text):
+        lowered = text.lower()
+        found = self.automaton.find_all(lowered)
+        for index in self._empty_words:
+            found[index] = list(range(len(lowered) + 1))
+        return lowered, found
+
+    def command_type(self, text):
+        words = text.split()
+        if not words:
+            return None
+        return self.command_types.get(words[0].lower().replace(',', ''))
+
+    def target_module(self, text, found=None):
+        if found is None:
+            found = self.scan(text)[1]
+        best = None
+        for word, priority, module in self._module_words:
+            positions = found.get(word)
+            if positions and (best is None or (positions[0], priority) < best[:2]):
+                best = (positions[0], priority, module)
+        if best is None:
+            return None, None
+        return best[2], self.modules[best[2]]
+
+    def _first_free(self, word, found, limit, spans):
+        """Первое вхождение слова, которое кончается до limit и не пересекает занятые спаны."""
+        length = self._word_lengths[word]
+        for start in found.get(word, ()):
+            end = start + length
+            if end > limit:
+                return None
+            if all(end <= span_start or start >= span_end for _, span_start, span_end in spans):
+                return start
+        return None
+
+    def _replaced(self, text, spans):
+        """Текст, в котором слова с маркерами заменены на ||поле (для parse_time)."""
+        parts, position = [], 0
+        for field, start, end in sorted(spans, key=lambda span: span[1]):
+            parts += [text[position:start], '||', field]
+            position = end
+        parts.append(text[position:])
+        return ''.join(parts)
+
+    def field_spans(self, module_info, text, found=None):
+        """
+        Спаны [(поле, начало, конец)] маркеров полей module_info: от начала
+        маркера до конца слова, которым он заканчивается (маркер может быть из
+        нескольких слов). Маркеры ищутся до комментария, комментарий
+        занимает всё до конца текста. Второе значение — поле time, если оно есть.
+        """
+        if found is None:
+            found = self.scan(text)[1]
+        spans = []
+        time_info = None
+        comment_start = len(text)
+        if 'comment' in module_info:
+            for word in self._field_words.get('comment', ()):
+                start = self._first_free(word, found, len(text), spans)
+                if start is not None:
+                    end = text.find(' ', start + self._word_lengths[word])
+                    spans.append(('comment', start, len(text) if end == -1 else end))
+                    comment_start = start
+                    break
+
+        for field in module_info:
+            if field == 'time':
+                if self.time_parser:
+                    time_info = self.time_parser(self._replaced(text, spans))
+                continue
+            if field == 'comment':
+                continue
+            # Поля без маркеров (например, поля схем журналов пользователя) не ищутся
+            for word in self._field_words.get(field, ()):
+                start = self._first_free(word, found, comment_start, spans)
+                if start is not None:
+                    end = text.find(' ', start + self._word_lengths[word], comment_start)
+                    spans.append((field, start, comment_start if end == -1 else end))
+                    break
+        return spans, time_info
+
+    def fields(self, text, spans, time_info=None):
+        result = {} if time_info is None else {'time': time_info}
+        ordered = sorted(spans, key=lambda span: span[1])
+        for (field, _, end), following in zip(ordered, ordered[1:] + [(None, len(text), None)]):
+            segment = text[end:following[1]]
+            if field in self.num_fields:
+                number = NUMBER_RE.search(segment)
+                if number:
+                    result[field] = number.group()
+                    continue
+            result[field] = ' '.join(segment.split())
+        return result
+
+    def find_info(self, module_info, text):
+        spans, time_info = self.field_spans(module_info, text)
+        return self.fields(text, spans, time_info)
+
+    def parse(self, text):
+        """Тип команды, модуль и поля за один проход автомата по тексту."""
+        _, found = self.scan(text)
+        module, config = self.target_module(text, found)
+        if module is None:
+            return ParsedCommand(self.command_type(text), None, None, {}, [])
+        spans, time_info = self.field_spans(config.get('info', []), text, found)
+        return ParsedCommand(self.command_type(text), module, config, self.fields(text, spans, time_info), spans)
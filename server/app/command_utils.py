@@ -1,25 +1,115 @@
 import os
 import json
 import re
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
 from flask import current_app
 from flask_jwt_extended import current_user
 
+from app.command_grammar import CommandGrammar
+
+# Время жизни объединённой карты модулей пользователя: изменения схем журналов
+# в других процессах становятся видны не позже, чем через это время
+MODULES_CACHE_TTL = 60
+MODULES_CACHE_SIZE = 1024
+
+
+class ConfigRegistry:
+    """
+    Настройки модулей и команд в памяти процесса. Файлы из
+    default_settings/settings читаются один раз и перечитываются, когда меняются
+    их mtime или размер. Карты модулей пользователя (modules.json вместе с его
+    JournalSchema) кэшируются по (user_id, список модулей пользователя) и
+    сбрасываются при изменении схем журналов (см. journals.models).
+    Возвращаемые словари общие для всех вызовов, изменять их нельзя.
+    """
+
+    def __init__(self, ttl=MODULES_CACHE_TTL, maxsize=MODULES_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._files = {}
+        self._user_modules = OrderedDict()
+        self._compiled = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, filename):
+        """Содержимое файла настроек и его версия (mtime, размер)."""
+        path = os.path.join(current_app.static_folder, 'default_settings', 'settings', filename)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self._files.get(path)
+        if cached and cached[0] == version:
+            return cached[1], version
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with self._lock:
+            self._files[path] = (version, data)
+        return data, version
+
+    def user_modules(self, user_id, user_modules, build):
+        """
+        Карта модулей пользователя из кэша или build(base_modules) -> (карта,
+        можно ли кэшировать). Запись устаревает по TTL и при изменении modules.json.
+        """
+        base, version = self.load('modules.json')
+        key = (str(user_id), tuple(user_modules) if user_modules else None)
+        now = time.monotonic()
+        with self._lock:
+            item = self._user_modules.get(key)
+            if item and item[0] > now and item[1] == version:
+                self._user_modules.move_to_end(key)
+                return item[2]
+        modules, cacheable = build(base)
+        if not cacheable:
+            return modules
+        with self._lock:
+            self._user_modules[key] = (now + self.ttl, version, modules)
+            self._user_modules.move_to_end(key)
+            while len(self._user_modules) > self.maxsize:
+                self._user_modules.popitem(last=False)
+        return modules
+
+    def compiled(self, name, sources, build):
+        """
+        Объект, собранный build() из настроек sources (например, грамматика
+        команд). Пересобирается, когда меняется любой из словарей sources:
+        кэшированные настройки при этом заменяются новыми объектами.
+        """
+        key = (name, tuple(id(source) for source in sources))
+        with self._lock:
+            item = self._compiled.get(key)
+            if item and all(cached is source for cached, source in zip(item[0], sources)):
+                self._compiled.move_to_end(key)
+                return item[1]
+        value = build()
+        with self._lock:
+            self._compiled[key] = (tuple(sources), value)
+            self._compiled.move_to_end(key)
+            while len(self._compiled) > self.maxsize:
+                self._compiled.popitem(last=False)
+        return value
+
+    def invalidate_user(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            for key in [key for key in self._user_modules if key[0] == user_id]:
+                del self._user_modules[key]
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self._user_modules.clear()
+            self._compiled.clear()
+
+
+config_registry = ConfigRegistry()
 
-def load_json(filename):
-    with current_app.app_context():
-        filename = os.path.join(
-            current_app.static_folder,
-            'default_settings',
-            'settings',
-            filename,
-        )
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
 
+def load_json(filename):
+    return config_registry.load(filename)[0]
 
-def get_modules():
-    return load_json('modules.json')
 
 def get_commands_list():
     return load_json('commands_list.json')
@@ -99,87 +189,26 @@ def parse_time(text: str):
     }
 
 
-def find_command_type(message: str):
-    command_type = None
-    first_word = message.split()[0].lower().replace(',', '')
-    commands_list = get_commands_list()
+def get_command_grammar(modules=None):
+    """Скомпилированная грамматика команд для текущих настроек (см. app.command_grammar)."""
+    modules = get_modules() if modules is None else modules
+    sources = (modules, get_commands_list(), get_command_information(), get_command_num_information())
+    return config_registry.compiled(
+        'command_grammar', sources, lambda: CommandGrammar(*sources, time_parser=parse_time))
 
-    for commands_types, commands in commands_list.items():
-        if first_word in commands:
-            command_type = commands_types
-            break
-    return command_type
 
+def find_command_type(message: str):
+    return get_command_grammar().command_type(message)
 
-def find_info(target_module, module_info, text):
-    delimiter = "||"
-    replacements_made = False
-
-    result = {}
-    command_information = get_command_information()
-    command_num_information = get_command_num_information()
-    command_info_dict = command_information | command_num_information
-    comment_start = len(text)
-    if 'comment' in module_info:
-        for value in command_info_dict['comment']:
-            comment_start = text.lower().find(value)
-            if comment_start != -1:
-                end = text.find(' ', comment_start)
-                if end == -1:
-                    end = len(text)
-                text = text[:comment_start] + delimiter + 'comment' + text[end:]
-                replacements_made = True
-                break
-
-    for info_type in module_info:
-        if info_type == 'time':
-            result = {'time': parse_time(text)}
-            continue
-        if info_type == 'comment':
-            continue
-        for value in command_info_dict[info_type]:
-            start = text.lower().find(value, 0, comment_start)
-            if start != -1:
-                end = text.find(' ', start)
-                if end == -1:
-                    end = comment_start
-                text = text[:start] + delimiter + info_type + text[end:]
-                replacements_made = True
-                break
-
-    if not replacements_made:
-        return result
-
-    split_text = text.split(delimiter)
-    for segment in split_text[1:]:
-        key = segment.split()[0]
-        if key in command_num_information:
-            found_numbers = re.findall(r'\d+', segment)
-            if found_numbers:
-                result[key] = found_numbers[0]
-                continue
-        value = ' '.join(segment.split()[1:])
-        result[key] = value
 
-    return result
+def find_info(target_module, module_info, text):
+    return get_command_grammar().find_info(module_info, text)
 
 
 def find_target_module(command):
-    modules_data = get_modules()
-    if command is None or modules_data is None:
-        return None, None
-
-    target_module = None
-    earliest_occurrence = len(command) + 1
-    for key, values in modules_data.items():
-        for module_command in values['words']:
-            position = command.lower().find(module_command)
-            if position != -1 and position < earliest_occurrence:
-                earliest_occurrence = position
-                target_module = key
-    if target_module is None:
+    if command is None:
         return None, None
-    return target_module, modules_data[target_module]
+    return get_command_grammar().target_module(command)
 
 
 def get_tables():
@@ -201,7 +230,7 @@ def get_tables():
         }
         filter_config = value.get('filter_config', {})
         for f_type in ['dropdown', 'text', 'range', 'date']:
-            table_info['filters'][f_type] = filter_config.get(f_type, [])
+            table_info['filters'][f_type] = list(filter_config.get(f_type, []))
         if 'date' not in table_info['filters']['date']:
             table_info['filters']['date'].insert(0, 'date')
         tables.append(table_info)
@@ -216,23 +245,30 @@ def get_modules():
         user_modules = None
         user_id = None
 
-    result_modules = load_json('modules.json').copy()
-
-    if user_id:
-        try:
-            from app.journals.models import JournalSchema
-            user_schemas = JournalSchema.query.filter_by(user_id=user_id).all()
-            for schema in user_schemas:
-                result_modules[schema.name] = {
-                    'type': 'journal',
-                    'name': schema.display_name,
-                    'words': [schema.name],
-                    'info': [field['name'] for field in schema.fields],
-                    'user_schema': True,
-                }
-        except Exception as e:
-            current_app.logger.error(f'Error loading user schemas: {e}')
+    if not user_id:
+        return load_json('modules.json')
+    return config_registry.user_modules(
+        user_id, user_modules, lambda base: _build_user_modules(base, user_id, user_modules))
+
+
+def _build_user_modules(base_modules, user_id, user_modules):
+    result_modules = base_modules.copy()
+    cacheable = True
+    try:
+        from app.journals.models import JournalSchema
+        user_schemas = JournalSchema.query.filter_by(user_id=user_id).all()
+        for schema in user_schemas:
+            result_modules[schema.name] = {
+                'type': 'journal',
+                'name': schema.display_name,
+                'words': [schema.name],
+                'info': [field['name'] for field in schema.fields],
+                'user_schema': True,
+            }
+    except Exception as e:
+        current_app.logger.error(f'Error loading user schemas: {e}')
+        cacheable = False
 
     if user_modules:
-        return {name: result_modules.get(name, {}) for name in user_modules if name in result_modules}
-    return result_modules
+        result_modules = {name: result_modules.get(name, {}) for name in user_modules if name in result_modules}
+    return result_modules, cacheable
@@ -1,4 +1,5 @@
 import os
+import json
 import logging
 from datetime import datetime, timedelta
 from logging.handlers import RotatingFileHandler
@@ -31,6 +32,29 @@ class BaseConfig:
 
     SCHEMAS = ['users', 'content', 'workspace', 'communication', 'productivity']
 
+    # Периодичность фоновых задач обслуживания, секунды (0 — выключено)
+    OVERRIDE_COMPACTION_INTERVAL = int(os.environ.get('OVERRIDE_COMPACTION_INTERVAL', 3600))
+    SUBSCRIPTION_EXPIRY_INTERVAL = int(os.environ.get('SUBSCRIPTION_EXPIRY_INTERVAL', 300))
+    FACET_SYNC_INTERVAL = int(os.environ.get('FACET_SYNC_INTERVAL', 300))
+
+    # Ограничения кэша озвучки в temp/ (см. app.tts_cache)
+    TTS_CACHE_MAX_BYTES = int(os.environ.get('TTS_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    TTS_CACHE_MAX_FILES = int(os.environ.get('TTS_CACHE_MAX_FILES', 10000))
+    # Пул исполнителей озвучки и предел заданий в очереди (см. app.tts_jobs);
+    # TTS_BACKEND — синтезатор backend(text, voice, rate, output_path); если не задан,
+    # используется HTTP-сервис TTS_HTTP_URL, а без него — edge-tts
+    TTS_WORKERS = int(os.environ.get('TTS_WORKERS', 2))
+    TTS_MAX_PENDING = int(os.environ.get('TTS_MAX_PENDING', 64))
+    TTS_BACKEND = None
+    # HTTP-сервис озвучки по частям (см. app.tts_chunked): постоянные параметры запроса
+    # (JSON), голос сервиса и параметр для него (без голоса параметр не передаётся;
+    # голос edge-tts сервису не подходит) и число параллельных запросов
+    TTS_HTTP_URL = os.environ.get('TTS_HTTP_URL')
+    TTS_HTTP_PARAMS = json.loads(os.environ.get('TTS_HTTP_PARAMS', '{}'))
+    TTS_HTTP_VOICE = os.environ.get('TTS_HTTP_VOICE')
+    TTS_HTTP_VOICE_PARAM = os.environ.get('TTS_HTTP_VOICE_PARAM', 'speaker')
+    TTS_HTTP_WORKERS = int(os.environ.get('TTS_HTTP_WORKERS', 4))
+
     @staticmethod
     def setup_logger(app):
         instance_path = app.instance_path
@@ -7,6 +7,7 @@ from flask_jwt_extended import current_user
 
 from app import db
 from app.journals.models import JournalEntry
+from app.journals.facets import track_entry_change
 from .command_utils import get_modules
 from .file_utils import upload_files_to_server
 
@@ -53,14 +54,19 @@ def save_to_base_modules(target_module, command_type, message_info=None, files_l
             case 'create':
                 entry = JournalEntry(user_id=current_user.id, journal_type=target_module, data=message_info)
                 db.session.add(entry)
+                track_entry_change(target_module, None, message_info, modules=modules_data)
             case 'append':
                 entry = JournalEntry.query.filter_by(user_id=current_user.id, journal_type=target_module)
                 entry = entry.order_by(JournalEntry.id.desc()).first()
                 if not entry:
                     return {'text': 'Нет записей для обновления', 'error': 'Нет записей для обновления'}
+                # Новый словарь: изменения JSON на месте не отслеживаются SQLAlchemy
+                data = dict(entry.data or {})
                 for k, v in message_info.items():
-                    cur_val = entry.data.get(k, '')
-                    entry.data[k] = f"{cur_val}\n{v}" if cur_val else v
+                    cur_val = data.get(k, '')
+                    data[k] = f"{cur_val}\n{v}" if cur_val else v
+                track_entry_change(target_module, entry.data, data, modules=modules_data)
+                entry.data = data
             case 'update':
                 record_id = message_info.get('id')
                 if not record_id:
@@ -68,9 +74,12 @@ def save_to_base_modules(target_module, command_type, message_info=None, files_l
                 entry = JournalEntry.query.filter_by(id=record_id, user_id=current_user.id, journal_type=target_module).first()
                 if not entry:
                     return {'text': 'Запись не найдена', 'error': 'Запись не найдена'}
+                data = dict(entry.data or {})
                 for k, v in message_info.items():
                     if k != 'id':
-                        entry.data[k] = v
+                        data[k] = v
+                track_entry_change(target_module, entry.data, data, modules=modules_data)
+                entry.data = data
             case _:
                 return {'text': 'Команда не обработана'}
         db.session.commit()
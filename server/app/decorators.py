@@ -15,13 +15,13 @@ def etag(version_key):
             if status_code >= 300:
                 return rv
 
-            version = DataVersion.get_version(version_key)
+            version = DataVersion.get_version(current_user.id, version_key)
             if version is not None:
                 # current_app.logger.info(f'ETag version: {version}')
                 # current_app.logger.info(f'ETag data: {data}')
                 response = make_response(data, status_code)
                 # current_app.logger.info(f'Setting ETag: {response}')
-                response.set_etag(version)
+                response.set_etag(str(version))
                 # current_app.logger.info(f'Setting ETag: {response}')
 
                 conditional_response = response.make_conditional(request)
@@ -42,12 +42,12 @@ def update_version_on_success(version_key='tasksVersion', notify_func=None, succ
         def decorated_function(*args, **kwargs):
             result, status_code = f(*args, **kwargs)
             if status_code in success_codes:
-                new_version = DataVersion.update_version(version_key)
-                notify_data_update(**{version_key: new_version})
+                new_version = DataVersion.update_version(current_user.id, version_key)
+                notify_data_update(current_user.id, **{version_key: new_version})
                 if notify_func:
                     notify_func(result, request.get_json(), current_user)
                 response = jsonify(result)
-                response.set_etag(new_version)
+                response.set_etag(str(new_version))
                 return response, status_code
             return jsonify(result), status_code
         return decorated_function
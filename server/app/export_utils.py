@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+
+from flask import Response, stream_with_context
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+EXPORT_BATCH_SIZE = 1000
+# Строки склеиваются в куски примерно такого размера перед отправкой клиенту
+CHUNK_SIZE = 64 * 1024
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return '' if value is None else value
+
+
+def iter_ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+
+def iter_csv(records, columns):
+    """Строки CSV с заголовком columns; вложенные значения записываются как JSON."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for record in records:
+        writer.writerow([_csv_value(record.get(column)) for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _chunked(lines, size=CHUNK_SIZE):
+    chunk, length = [], 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def export_response(records, export_format, filename, columns, to_row=None):
+    """
+    Потоковый ответ с записями в формате NDJSON или CSV. records — итератор
+    словарей, который читается по мере отправки, поэтому в памяти находится
+    только текущая пачка. to_row превращает запись в строку CSV с ключами columns.
+    ValueError — неизвестный формат.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported export format: {export_format}')
+    if export_format == 'csv':
+        lines = iter_csv(records if to_row is None else map(to_row, records), columns)
+    else:
+        lines = iter_ndjson(records)
+    return Response(
+        stream_with_context(_chunked(lines)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{export_format}"'},
+    )
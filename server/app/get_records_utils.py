@@ -1,7 +1,13 @@
+import math
+
 from flask import current_app, jsonify
+from sqlalchemy import and_, cast, false, func, literal_column, or_
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import selectinload
 from flask_jwt_extended import current_user
 from app.command_utils import get_modules
-from app.journals.models import JournalEntry
+from app.journals import facets
+from app.journals.models import JournalEntry, JournalFacet
 from app import db
 
 
@@ -25,18 +31,158 @@ def get_records_by_ids(table_name, records_ids):
     raise ValueError("Invalid table name")
 
 
+# Ключи записи, которые берутся не из data: фильтры по ним проверяются в Python.
+# Функции _*_clauses ниже переводят фильтр по полю data в условия SQL с прежней
+# семантикой или возвращают None, если фильтр нужно проверить в Python.
+RECORD_KEYS = ('id', 'created_at', 'files')
+NAN = literal_column("'NaN'::double precision")
+
+
+def _json_field(field):
+    return JournalEntry.data[field]
+
+
+def _json_type(field):
+    return func.json_typeof(_json_field(field))
+
+
+def _date_clauses(field, filters):
+    """Строковое сравнение по кодовым точкам, как в Python; пустые и нестроковые значения не проходят."""
+    key = func.content.journal_sort_key(_json_field(field))
+    clauses = []
+    for filter_key, in_bounds in ((f"{field}_from", lambda bound: key >= bound),
+                                  (f"{field}_to", lambda bound: key <= bound)):
+        bound = filters.get(filter_key)
+        if bound:
+            if not isinstance(bound, str):
+                return None
+            clauses.append(in_bounds(func.convert_to(bound, 'UTF8')))
+    return clauses
+
+
+def _range_clauses(field, filters):
+    """Значение приводится как float(); нечисловые значения (NaN) проходят фильтр, как и раньше."""
+    number = func.content.journal_number(_json_field(field))
+    clauses = []
+    if filters.get(f"{field}_min") not in [None, '']:
+        bound = float(filters[f"{field}_min"])
+        if not math.isnan(bound):
+            # NaN в PostgreSQL больше любого числа
+            clauses.append(number >= bound)
+    if filters.get(f"{field}_max") not in [None, '']:
+        bound = float(filters[f"{field}_max"])
+        if not math.isnan(bound):
+            clauses.append(or_(number <= bound, number == NAN))
+    return clauses
+
+
+def _dropdown_clauses(field, filters):
+    """Равенство значения одному из вариантов с учётом типа (1 == 1.0 == True)."""
+    vals = filters.get(field)
+    if not vals:
+        return []
+    if isinstance(vals, str):
+        vals = [vals]
+    options = []
+    strings = [v for v in vals if isinstance(v, str)]
+    if strings:
+        options.append(and_(_json_type(field) == 'string', _json_field(field).as_string().in_(strings)))
+    for v in vals:
+        if v is None:
+            options.append(or_(_json_field(field).is_(None), _json_type(field) == 'null'))
+        elif isinstance(v, (bool, int, float)):
+            if not math.isnan(v):
+                options.append(and_(_json_type(field).in_(('number', 'boolean')),
+                                    func.content.journal_number(_json_field(field)) == float(v)))
+        elif not isinstance(v, str):
+            options.append(cast(_json_field(field), JSONB) == cast(v, JSONB))
+    return [or_(*options) if options else false()]
+
+
+def _text_clauses(field, filters):
+    """Подстрока с учётом регистра для строк, вхождение элемента/ключа для массивов и объектов."""
+    val_filter = filters.get(field)
+    if not val_filter:
+        return []
+    if not isinstance(val_filter, str):
+        return None
+    return [or_(
+        and_(_json_type(field) == 'string', func.strpos(_json_field(field).as_string(), val_filter) > 0),
+        and_(_json_type(field).in_(('array', 'object')), func.jsonb_exists(cast(_json_field(field), JSONB), val_filter)),
+    )]
+
+
+def _record_matches(record, filters, date_fields=(), range_fields=(), dropdowns=(), text_fields=()):
+    for field in date_fields:
+        from_key = f"{field}_from"
+        to_key = f"{field}_to"
+        val = record.get(field)
+        if filters.get(from_key) and (not val or val < filters[from_key]):
+            return False
+        if filters.get(to_key) and (not val or val > filters[to_key]):
+            return False
+
+    for field in range_fields:
+        min_key = f"{field}_min"
+        max_key = f"{field}_max"
+        val = record.get(field)
+        try:
+            val_f = float(val)
+        except (TypeError, ValueError):
+            val_f = None
+        if val_f is not None:
+            if filters.get(min_key) not in [None, ''] and val_f < float(filters[min_key]):
+                return False
+            if filters.get(max_key) not in [None, ''] and val_f > float(filters[max_key]):
+                return False
+
+    for field in dropdowns:
+        vals = filters.get(field)
+        if vals:
+            if isinstance(vals, str):
+                vals = [vals]
+            if record.get(field) not in vals:
+                return False
+
+    for field in text_fields:
+        val_filter = filters.get(field)
+        if val_filter and val_filter not in (record.get(field) or ''):
+            return False
+
+    return True
+
+
 def fetch_filtered_records(table_name, filters):
+    """
+    Записи журнала, отфильтрованные по filter_config модуля. Фильтры по полям
+    data выполняются в SQL; фильтры по id, created_at и files, а также
+    нестроковые значения текстовых фильтров и границ дат — в Python.
+    """
     modules = get_modules()
     if table_name not in modules or modules[table_name].get('type') != 'journal':
         raise ValueError("Invalid table name")
 
     module_config = modules[table_name].get('filter_config', {})
-    date_fields = module_config.get('date', [])
-    range_fields = module_config.get('range', [])
-    dropdowns = module_config.get('dropdown', [])
-    text_fields = module_config.get('text', [])
-
-    entries = JournalEntry.query.filter_by(user_id=current_user.id, journal_type=table_name).all()
+    compilers = {'date': _date_clauses, 'range': _range_clauses,
+                 'dropdown': _dropdown_clauses, 'text': _text_clauses}
+    clauses = []
+    python_fields = {}
+    for kind, compile_clauses in compilers.items():
+        fields = module_config.get(kind, [])
+        python_fields[kind] = []
+        for field in fields:
+            field_clauses = None if field in RECORD_KEYS else compile_clauses(field, filters)
+            if field_clauses is None:
+                python_fields[kind].append(field)
+            else:
+                clauses += field_clauses
+
+    entries = (JournalEntry.query
+               .options(selectinload(JournalEntry.files))
+               .filter(JournalEntry.user_id == current_user.id,
+                       JournalEntry.journal_type == table_name,
+                       *clauses)
+               .all())
     records = []
     for entry in entries:
         data = entry.data or {}
@@ -44,52 +190,16 @@ def fetch_filtered_records(table_name, filters):
                  'id': entry.id,
                  'created_at': entry.created_at.isoformat(),
                  'files': [f.to_dict() for f in entry.files]}
-        include = True
-
-        for field in date_fields:
-            from_key = f"{field}_from"
-            to_key = f"{field}_to"
-            val = record.get(field)
-            if filters.get(from_key) and (not val or val < filters[from_key]):
-                include = False
-            if filters.get(to_key) and (not val or val > filters[to_key]):
-                include = False
-
-        for field in range_fields:
-            min_key = f"{field}_min"
-            max_key = f"{field}_max"
-            val = record.get(field)
-            try:
-                val_f = float(val)
-            except (TypeError, ValueError):
-                val_f = None
-            if val_f is not None:
-                if filters.get(min_key) not in [None, ''] and val_f < float(filters[min_key]):
-                    include = False
-                if filters.get(max_key) not in [None, ''] and val_f > float(filters[max_key]):
-                    include = False
-
-        for field in dropdowns:
-            vals = filters.get(field)
-            if vals:
-                if isinstance(vals, str):
-                    vals = [vals]
-                if record.get(field) not in vals:
-                    include = False
-
-        for field in text_fields:
-            val_filter = filters.get(field)
-            if val_filter and val_filter not in (record.get(field) or ''):
-                include = False
-
-        if include:
+        if _record_matches(record, filters,
+                           python_fields['date'], python_fields['range'],
+                           python_fields['dropdown'], python_fields['text']):
             records.append(record)
 
     columns = sorted({key for rec in records for key in rec.keys()})
     return records, columns
 
 
-def get_all_filters(table_name):
+def get_all_filters(table_name, with_counts=False):
     """
     Возвращает JSON-объект вида
     {
@@ -98,26 +208,24 @@ def get_all_filters(table_name):
       ...
     }
     для всех полей из filter_config[table_name]['dropdown'].
+    Значения берутся из индекса JournalFacet; with_counts=True возвращает
+    {"field1": {"opt1": число записей, ...}, ...}.
     """
-    # modules должен быть тем же словарём, где хранят filter_config
-    modules = get_modules()
-    config = modules.get(table_name, {}).get('filter_config', {})
-    dropdown_fields = config.get('dropdown', [])
-    result = {}
+    dropdown_fields = facets.dropdown_fields(table_name)
     try:
-        entries = JournalEntry.query.filter_by(user_id=current_user.id, journal_type=table_name).all()
-        for col in dropdown_fields:
-            values = set()
-            for e in entries:
-                raw = (e.data or {}).get(col)
-                if raw is None:
-                    continue
-                if isinstance(raw, str):
-                    parts = [item.strip() for item in raw.split(',') if item.strip()]
-                    values.update(parts)
-                else:
-                    values.add(str(raw))
-            result[col] = sorted(values)
+        rows = (JournalFacet.query
+                .with_entities(JournalFacet.field, JournalFacet.value, JournalFacet.count)
+                .filter(JournalFacet.user_id == current_user.id,
+                        JournalFacet.journal_type == table_name,
+                        JournalFacet.field.in_(dropdown_fields))
+                .all())
+        counts = {col: {} for col in dropdown_fields}
+        for field, value, count in rows:
+            counts[field][value] = count
+        if with_counts:
+            result = {col: dict(sorted(values.items())) for col, values in counts.items()}
+        else:
+            result = {col: sorted(values) for col, values in counts.items()}
         return jsonify(result), 200
 
     except Exception as e:
@@ -0,0 +1,92 @@
+"""Поддержка индекса значений выпадающих фильтров журналов (JournalFacet)."""
+
+from itertools import groupby
+
+from flask_jwt_extended import current_user
+
+from app import db
+from app.command_utils import get_modules
+from app.maintenance import maintenance_job
+from .models import JournalEntry, JournalFacet, JournalFacetConfig
+
+
+def dropdown_fields(journal_type, modules=None):
+    """Поля выпадающих фильтров журнала из filter_config модуля."""
+    modules = get_modules() if modules is None else modules
+    return modules.get(journal_type, {}).get('filter_config', {}).get('dropdown', [])
+
+
+def _fields_by_type(modules):
+    fields_by_type = {name: dropdown_fields(name, modules) for name in modules}
+    return {name: fields for name, fields in fields_by_type.items() if fields}
+
+
+def track_entry_change(journal_type, old_data, new_data, user_id=None, modules=None):
+    """
+    Обновляет счётчики при создании (old_data=None), изменении или удалении
+    (new_data=None) записи. Вызывается до commit в той же транзакции.
+    """
+    fields = dropdown_fields(journal_type, modules)
+    if fields:
+        JournalFacet.apply_change(user_id or current_user.id, journal_type, fields, old_data, new_data)
+
+
+def drop_journal_facets(user_id, journal_type):
+    JournalFacet.query.filter_by(user_id=str(user_id), journal_type=journal_type).delete(synchronize_session=False)
+
+
+def rebuild_facets(user_id=None, batch_size=1000, journal_types=None):
+    """
+    Пересчитывает счётчики по записям журналов — для первоначального
+    заполнения и после изменения filter_config; journal_types ограничивает
+    пересчёт этими журналами. Пересчёт для всех пользователей запоминает
+    поля, по которым построены счётчики (JournalFacetConfig). Возвращает
+    число журналов.
+    """
+    fields_by_type = _fields_by_type(get_modules())
+    facets = JournalFacet.query
+    if journal_types is not None:
+        fields_by_type = {name: fields for name, fields in fields_by_type.items() if name in journal_types}
+        facets = facets.filter(JournalFacet.journal_type.in_(journal_types))
+
+    entries = (JournalEntry.query
+               .with_entities(JournalEntry.user_id, JournalEntry.journal_type, JournalEntry.data)
+               .filter(JournalEntry.journal_type.in_(fields_by_type))
+               .order_by(JournalEntry.user_id, JournalEntry.journal_type))
+    if user_id:
+        facets = facets.filter_by(user_id=str(user_id))
+        entries = entries.filter(JournalEntry.user_id == str(user_id))
+    else:
+        configs = JournalFacetConfig.query
+        if journal_types is not None:
+            configs = configs.filter(JournalFacetConfig.journal_type.in_(journal_types))
+        configs.delete(synchronize_session=False)
+        db.session.add_all(JournalFacetConfig(journal_type=name, fields=fields)
+                           for name, fields in fields_by_type.items())
+    facets.delete(synchronize_session=False)
+
+    journals = 0
+    for (owner_id, journal_type), rows in groupby(entries.yield_per(batch_size), key=lambda row: row[:2]):
+        JournalFacet.rebuild(owner_id, journal_type, fields_by_type[journal_type], (row.data for row in rows))
+        journals += 1
+    db.session.commit()
+    return journals
+
+
+def stale_journal_types():
+    """
+    Журналы, у которых поля выпадающих фильтров в modules.json отличаются от
+    тех, по которым построены счётчики: ещё не построенные, изменённые и
+    убранные из filter_config.
+    """
+    current = _fields_by_type(get_modules())
+    built = {config.journal_type: config.fields for config in JournalFacetConfig.query}
+    return {name for name in current.keys() | built.keys() if current.get(name) != built.get(name)}
+
+
+@maintenance_job('sync_journal_facets', 'FACET_SYNC_INTERVAL')
+def sync_facets():
+    """Пересчитывает счётчики журналов, у которых изменился filter_config."""
+    stale = stale_journal_types()
+    journals = rebuild_facets(journal_types=stale) if stale else 0
+    return {'stale': len(stale), 'journals': journals}
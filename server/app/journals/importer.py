@@ -0,0 +1,244 @@
+"""Пакетный импорт записей журналов из таблиц (CSV, JSON, NDJSON)."""
+
+import csv
+import io
+import json
+import math
+import re
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from app import db
+from .facets import dropdown_fields
+from .models import JournalEntry, JournalFacet
+
+IMPORT_BATCH_SIZE = 5000
+# Сколько ошибок по строкам возвращается в отчёте (остальные только считаются)
+MAX_REPORTED_ERRORS = 1000
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on', 'да', '+', 'x'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'off', 'нет', '-'}
+NUMBER_RE = re.compile(r'^[+-]?\d+$')
+DATE_FORMATS = ('%d.%m.%Y', '%d/%m/%Y')
+DATETIME_FORMATS = ('%d.%m.%Y %H:%M', '%d.%m.%Y %H:%M:%S')
+
+
+def _is_empty(value):
+    return value is None or value == [] or (isinstance(value, str) and not value.strip())
+
+
+def _scalar_text(value):
+    if isinstance(value, (dict, list)):
+        raise ValueError('Ожидалась строка')
+    return value.strip() if isinstance(value, str) else str(value)
+
+
+def _to_text(value):
+    return value if isinstance(value, str) else _scalar_text(value)
+
+
+def _to_number(value):
+    if isinstance(value, bool):
+        raise ValueError('Ожидалось число')
+    if isinstance(value, (int, float)):
+        number = value
+    else:
+        # В таблицах из русской локали дробная часть отделяется запятой
+        raw = _scalar_text(value).replace(' ', '').replace('\u00a0', '').replace(',', '.')
+        try:
+            number = int(raw) if NUMBER_RE.match(raw) else float(raw)
+        except ValueError:
+            raise ValueError(f'Не число: {value}') from None
+    if isinstance(number, float) and not math.isfinite(number):
+        raise ValueError(f'Не число: {value}')
+    return number
+
+
+def _to_datetime_value(value, formats):
+    raw = _scalar_text(value).removesuffix('Z')
+    try:
+        parsed = datetime.fromisoformat(raw)
+    except ValueError:
+        for fmt in formats:
+            try:
+                return datetime.strptime(raw, fmt)
+            except ValueError:
+                pass
+        raise ValueError(f'Неверная дата: {value}') from None
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _to_date(value):
+    return _to_datetime_value(value, DATE_FORMATS + DATETIME_FORMATS).date().isoformat()
+
+
+def _to_datetime(value):
+    return _to_datetime_value(value, DATETIME_FORMATS + DATE_FORMATS).isoformat()
+
+
+def _to_checkbox(value):
+    if isinstance(value, bool):
+        return value
+    raw = _scalar_text(value).lower()
+    if raw in TRUE_VALUES:
+        return True
+    if raw in FALSE_VALUES:
+        return False
+    raise ValueError(f'Ожидалось да/нет: {value}')
+
+
+def _choice(options):
+    allowed = {str(option) for option in options or []}
+
+    def convert(value):
+        raw = _scalar_text(value)
+        if allowed and raw not in allowed:
+            raise ValueError(f'Недопустимое значение: {raw}')
+        return raw
+    return convert
+
+
+def _to_tags(value):
+    # Теги хранятся строкой через запятую, как их разбирают фильтры журнала (JournalFacet)
+    items = value if isinstance(value, list) else _scalar_text(value).split(',')
+    return ', '.join(tag for tag in (_scalar_text(item) for item in items) if tag)
+
+
+def _file(value):
+    raise ValueError('Файлы не импортируются')
+
+
+CONVERTERS = {
+    'text': _to_text,
+    'textarea': _to_text,
+    'number': _to_number,
+    'date': _to_date,
+    'datetime': _to_datetime,
+    'checkbox': _to_checkbox,
+    'tags': _to_tags,
+    'file': _file,
+}
+
+
+def compile_validator(fields):
+    """
+    Собирает проверку строки по полям схемы журнала (JournalSchema.fields).
+    Возвращает функцию row -> (data, created_at, errors): data содержит только
+    поля схемы с приведёнными значениями, created_at — дата из одноимённого
+    столбца (если есть), errors — {поле: сообщение}.
+    """
+    plan = []
+    for field in fields:
+        field_type = field.get('type', 'text')
+        if field_type in ('select', 'multiselect'):
+            convert = _choice(field.get('options'))
+        else:
+            convert = CONVERTERS.get(field_type, _to_text)
+        plan.append((field['name'], convert, bool(field.get('required'))))
+
+    def validate(row):
+        data, errors = {}, {}
+        for name, convert, required in plan:
+            value = row.get(name)
+            if _is_empty(value):
+                if required:
+                    errors[name] = 'Обязательное поле'
+                continue
+            try:
+                data[name] = convert(value)
+            except ValueError as e:
+                errors[name] = str(e)
+        created_at = None
+        if not _is_empty(row.get('created_at')):
+            try:
+                created_at = _to_datetime_value(row['created_at'], DATETIME_FORMATS + DATE_FORMATS)
+            except ValueError as e:
+                errors['created_at'] = str(e)
+        return data, created_at, errors
+
+    return validate
+
+
+def read_rows(stream, file_format):
+    """Строки файла импорта как словари: csv (с заголовком), json (массив) или ndjson."""
+    if file_format == 'csv':
+        return csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    if file_format == 'json':
+        rows = json.load(stream)
+        if not isinstance(rows, list):
+            raise ValueError('Ожидался массив записей')
+        return rows
+    if file_format == 'ndjson':
+        return (json.loads(line) for line in io.TextIOWrapper(stream, encoding='utf-8') if line.strip())
+    raise ValueError(f'Unsupported import format: {file_format}')
+
+
+def _copy_rows(rows):
+    """Вставка пачки командой COPY (PostgreSQL + psycopg2)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow((row['id'], row['user_id'], row['journal_type'],
+                         json.dumps(row['data'], ensure_ascii=False), row['created_at'].isoformat()))
+    buffer.seek(0)
+    table = JournalEntry.__table__
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {table.schema}.{table.name} (id, user_id, journal_type, data, created_at) '
+            'FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def _insert_rows(rows):
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2':
+        _copy_rows(rows)
+    else:
+        db.session.execute(JournalEntry.__table__.insert(), rows)
+
+
+def import_entries(user_id, schema, rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Проверяет строки по схеме журнала и вставляет корректные пачками по
+    batch_size (COPY на PostgreSQL, executemany на остальных базах) в одной
+    транзакции. Строки с ошибками пропускаются. Нумерация строк в отчёте с 1.
+    """
+    validate = compile_validator(schema.fields)
+    facet_fields = dropdown_fields(schema.name)
+    facet_counts = Counter()
+    imported, errors, error_count = 0, [], 0
+    batch = []
+    now = datetime.utcnow()
+
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            data, created_at, row_errors = None, None, {'': 'Ожидался объект'}
+        else:
+            data, created_at, row_errors = validate(row)
+        if row_errors:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'row': number, 'errors': row_errors})
+            continue
+        batch.append(dict(id=str(uuid.uuid4()), user_id=str(user_id), journal_type=schema.name,
+                          data=data, created_at=created_at or now))
+        if facet_fields:
+            facet_counts.update(JournalFacet.values_of(data, facet_fields))
+        if len(batch) >= batch_size:
+            _insert_rows(batch)
+            imported += len(batch)
+            batch = []
+    if batch:
+        _insert_rows(batch)
+        imported += len(batch)
+
+    JournalFacet.add_counts(user_id, schema.name, facet_counts)
+    db.session.commit()
+    return {'imported': imported, 'failed': error_count, 'errors': errors}
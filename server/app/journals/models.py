@@ -1,9 +1,19 @@
+from collections import Counter
 from datetime import datetime
 import os
 
 from app import db
+from app.command_utils import config_registry
+from app.journals.sql import JOURNAL_FILTER_FUNCTIONS
 import uuid
 from flask import current_app
+from sqlalchemy import DDL, event, text, tuple_
+from sqlalchemy.dialects.postgresql import TSVECTOR, insert as pg_insert
+from sqlalchemy.orm import Session, deferred, object_session, query_expression, selectinload
+
+# Конфигурация текстового поиска по журналам
+SEARCH_CONFIG = 'russian'
+
 
 class JournalSchema(db.Model):
     __tablename__ = 'journal_schemas'
@@ -29,15 +39,60 @@ class JournalSchema(db.Model):
             'updated_at': self.updated_at.isoformat() + 'Z'
         }
 
+
+# Схемы журналов входят в карту модулей пользователя (command_utils.get_modules):
+# кэш сбрасывается сразу при записи схемы и ещё раз после коммита, чтобы не
+# осталась карта, собранная другим запросом до коммита
+@event.listens_for(JournalSchema, 'after_insert')
+@event.listens_for(JournalSchema, 'after_update')
+@event.listens_for(JournalSchema, 'after_delete')
+def _journal_schema_changed(mapper, connection, target):
+    config_registry.invalidate_user(target.user_id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('journal_schema_users', set()).add(str(target.user_id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _journal_schemas_committed(session):
+    for user_id in session.info.pop('journal_schema_users', ()):
+        config_registry.invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _journal_schemas_rolled_back(session):
+    for user_id in session.info.pop('journal_schema_users', ()):
+        config_registry.invalidate_user(user_id)
+
+
 class JournalEntry(db.Model):
     __tablename__ = 'journal_entries'
-    __table_args__ = {'schema': 'content'}
+    __table_args__ = (
+        db.Index('ix_journal_entries_user_type', 'user_id', 'journal_type'),
+        # Выражения совпадают с предикатами get_records_utils.fetch_filtered_records
+        db.Index('ix_journal_entries_publish_date', 'user_id', 'journal_type',
+                 text("content.journal_sort_key(data -> 'publish_date')")),
+        db.Index('ix_journal_entries_score', 'user_id', 'journal_type',
+                 text("content.journal_number(data -> 'score')")),
+        db.Index('ix_journal_entries_search', 'search_vector', postgresql_using='gin'),
+        # Порядок постраничной выдачи journals.pagination.list_entries
+        db.Index('ix_journal_entries_created', 'user_id', 'journal_type', 'created_at', 'id'),
+        {'schema': 'content'}
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), nullable=False)
     journal_type = db.Column(db.String(50))
     data = db.Column(db.JSON)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Полнотекстовый индекс всех строковых значений data (в том числе во
+    # вложенных списках); вычисляется PostgreSQL, см. journals.search
+    search_vector = deferred(db.Column(TSVECTOR, db.Computed(
+        f"jsonb_to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(data::jsonb, '{{}}'), '[\"string\"]')",
+        persisted=True,
+    )))
+    # Часть data с выбранными ключами, если запрос её загрузил (см. journals.pagination)
+    projected_data = query_expression()
 
     # Связь с файлами
     files = db.relationship('JournalFile', backref='entry', lazy=True, cascade='all, delete-orphan')
@@ -47,11 +102,119 @@ class JournalEntry(db.Model):
             'id': self.id,
             'user_id': self.user_id,
             'journal_type': self.journal_type,
-            'data': self.data,
+            'data': self.data if self.projected_data is None else self.projected_data,
             'files': [f.to_dict() for f in self.files],
             'created_at': self.created_at.isoformat() + 'Z'
         }
 
+    @classmethod
+    def iter_dicts(cls, user_id, journal_type, batch_size=1000):
+        """
+        Записи журнала в виде to_dict по одной, без загрузки всего журнала:
+        строки читаются курсором на сервере пачками по batch_size, файлы
+        подгружаются одним запросом на пачку.
+        """
+        query = (db.select(cls)
+                 .options(selectinload(cls.files))
+                 .where(cls.user_id == user_id, cls.journal_type == journal_type)
+                 .order_by(cls.created_at, cls.id)
+                 .execution_options(yield_per=batch_size))
+        for entry in db.session.scalars(query):
+            yield entry.to_dict()
+
+for _statement in JOURNAL_FILTER_FUNCTIONS:
+    event.listen(JournalEntry.__table__, 'before_create', DDL(_statement))
+
+
+class JournalFacet(db.Model):
+    """
+    Значения выпадающих фильтров журнала и число записей с каждым значением.
+    Поддерживается инкрементально при изменении записей (см. journals.facets).
+    """
+    __tablename__ = 'journal_facets'
+    __table_args__ = {'schema': 'content'}
+
+    user_id = db.Column(db.String(36), primary_key=True)
+    journal_type = db.Column(db.String(50), primary_key=True)
+    field = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Text, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def values_of(data, fields):
+        """Пары (поле, значение) записи: строки делятся по запятым, прочие значения — str()."""
+        values = set()
+        for field in fields:
+            raw = (data or {}).get(field)
+            if raw is None:
+                continue
+            if isinstance(raw, str):
+                values.update((field, item.strip()) for item in raw.split(',') if item.strip())
+            else:
+                values.add((field, str(raw)))
+        return values
+
+    @classmethod
+    def apply_change(cls, user_id, journal_type, fields, old_data, new_data):
+        """Переносит изменение записи в счётчики. Коммит — на вызывающей стороне."""
+        old_values = cls.values_of(old_data, fields)
+        new_values = cls.values_of(new_data, fields)
+        added, removed = new_values - old_values, old_values - new_values
+        keys = dict(user_id=str(user_id), journal_type=journal_type)
+        if added:
+            stmt = pg_insert(cls).values([dict(keys, field=field, value=value, count=1) for field, value in added])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[cls.user_id, cls.journal_type, cls.field, cls.value],
+                set_={'count': cls.count + 1},
+            )
+            db.session.execute(stmt)
+        if removed:
+            facets = cls.query.filter_by(**keys).filter(tuple_(cls.field, cls.value).in_(removed))
+            facets.update({cls.count: cls.count - 1}, synchronize_session=False)
+            facets.filter(cls.count <= 0).delete(synchronize_session=False)
+
+    @classmethod
+    def add_counts(cls, user_id, journal_type, counts):
+        """Прибавляет счётчики {(поле, значение): число} одним запросом — для пакетной вставки записей."""
+        if not counts:
+            return
+        stmt = pg_insert(cls).values([
+            dict(user_id=str(user_id), journal_type=journal_type, field=field, value=value, count=count)
+            for (field, value), count in counts.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.user_id, cls.journal_type, cls.field, cls.value],
+            set_={'count': cls.count + stmt.excluded.count},
+        )
+        db.session.execute(stmt)
+
+    @classmethod
+    def rebuild(cls, user_id, journal_type, fields, entries_data):
+        """Пересчитывает счётчики журнала по всем данным записей."""
+        counts = Counter()
+        for data in entries_data:
+            counts.update(cls.values_of(data, fields))
+        cls.query.filter_by(user_id=str(user_id), journal_type=journal_type).delete(synchronize_session=False)
+        if counts:
+            db.session.execute(pg_insert(cls), [
+                dict(user_id=str(user_id), journal_type=journal_type, field=field, value=value, count=count)
+                for (field, value), count in counts.items()
+            ])
+
+
+class JournalFacetConfig(db.Model):
+    """
+    Поля выпадающих фильтров журнала, по которым построены счётчики
+    JournalFacet. Если filter_config в modules.json с ними расходится,
+    счётчики пересчитываются (см. journals.facets.sync_facets).
+    """
+    __tablename__ = 'journal_facet_configs'
+    __table_args__ = {'schema': 'content'}
+
+    journal_type = db.Column(db.String(50), primary_key=True)
+    fields = db.Column(db.JSON, nullable=False)
+
+
 class JournalFile(db.Model):
     __tablename__ = 'journal_files'
     __table_args__ = {'schema': 'content'}
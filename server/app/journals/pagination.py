@@ -0,0 +1,68 @@
+"""Постраничная выдача записей журналов по ключу (без OFFSET)."""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import case, func, literal_column, select, tuple_
+from sqlalchemy.orm import defer, selectinload, with_expression
+
+from .models import JournalEntry
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def clamp_limit(limit):
+    return max(1, min(int(limit), MAX_LIMIT))
+
+
+def encode_cursor(*key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor, *types):
+    """Значения ключа из курсора, приведённые к types; ValueError, если курсор повреждён."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (binascii.Error, UnicodeError, TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def _projected_data(fields):
+    """data, в котором оставлены только ключи fields (отсутствующие не добавляются)."""
+    obj = case((func.json_typeof(JournalEntry.data) == 'object', JournalEntry.data))
+    item = func.json_each(obj).table_valued('key', 'value').alias('item')
+    return (select(func.coalesce(func.json_object_agg(item.c.key, item.c.value), literal_column("'{}'::json")))
+            .where(item.c.key.in_(fields))
+            .scalar_subquery())
+
+
+def list_entries(user_id, journal_type, limit=DEFAULT_LIMIT, cursor=None, fields=None):
+    """
+    Записи журнала в порядке (created_at, id), не больше limit за раз.
+    next_cursor передаётся в cursor следующего запроса; fields — список
+    ключей data, которые нужно вернуть (по умолчанию все).
+    """
+    limit = clamp_limit(limit)
+    query = (JournalEntry.query
+             .options(selectinload(JournalEntry.files))
+             .filter(JournalEntry.user_id == user_id, JournalEntry.journal_type == journal_type))
+    if fields:
+        query = (query.options(defer(JournalEntry.data),
+                               with_expression(JournalEntry.projected_data, _projected_data(fields)))
+                 .execution_options(populate_existing=True))
+    if cursor:
+        after_created, after_id = decode_cursor(cursor, datetime.fromisoformat, str)
+        query = query.filter(tuple_(JournalEntry.created_at, JournalEntry.id) > tuple_(after_created, after_id))
+    entries = query.order_by(JournalEntry.created_at, JournalEntry.id).limit(limit + 1).all()
+
+    page = entries[:limit]
+    results = [entry.to_dict() for entry in page]
+    last = page[-1] if page else None
+    next_cursor = encode_cursor(last.created_at.isoformat(), last.id) if len(entries) > limit else None
+    return {'results': results, 'next_cursor': next_cursor}
@@ -1,3 +1,4 @@
+import csv
 import os
 import uuid
 from werkzeug.utils import secure_filename
@@ -6,20 +7,105 @@ from flask_jwt_extended import jwt_required, current_user
 
 from . import journals
 from .models import JournalEntry, JournalSchema, JournalFile
+from .facets import drop_journal_facets, track_entry_change
+from .importer import import_entries, read_rows
+from .pagination import DEFAULT_LIMIT, list_entries
+from .search import search_entries
 from app import db
+from app.export_utils import EXPORT_BATCH_SIZE, export_response
 from flask import current_app
 
 
 @journals.route('/<journal_type>', methods=['GET'])
 @jwt_required()
 def get_journals(journal_type):
+    """Записи журнала по страницам: ?limit=20&cursor=<next_cursor>&fields=поле1,поле2"""
     # Проверяем, что у пользователя есть доступ к этому типу журнала
     schema = JournalSchema.query.filter_by(user_id=current_user.id, name=journal_type).first()
     if not schema:
         return jsonify({'error': 'Журнал не найден'}), 404
-    
-    entries = JournalEntry.query.filter_by(user_id=current_user.id, journal_type=journal_type).all()
-    return jsonify([e.to_dict() for e in entries])
+
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    try:
+        result = list_entries(current_user.id, journal_type,
+                              limit=request.args.get('limit', DEFAULT_LIMIT, type=int),
+                              cursor=request.args.get('cursor'), fields=fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+
+@journals.route('/<journal_type>/search', methods=['GET'])
+@jwt_required()
+def search_journal(journal_type):
+    """Полнотекстовый поиск: ?q=запрос&limit=20&cursor=<next_cursor>"""
+    schema = JournalSchema.query.filter_by(user_id=current_user.id, name=journal_type).first()
+    if not schema:
+        return jsonify({'error': 'Журнал не найден'}), 404
+
+    query_text = (request.args.get('q') or '').strip()
+    if not query_text:
+        return jsonify({'error': 'Не указан поисковый запрос'}), 400
+    try:
+        result = search_entries(current_user.id, journal_type, query_text,
+                                limit=request.args.get('limit', DEFAULT_LIMIT, type=int),
+                                cursor=request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+
+@journals.route('/<journal_type>/export', methods=['GET'])
+@jwt_required()
+def export_journal(journal_type):
+    """
+    Потоковая выгрузка всех записей журнала с метаданными файлов: ?format=ndjson|csv.
+    В CSV столбцы — id, created_at, поля схемы журнала и files (JSON).
+    """
+    schema = JournalSchema.query.filter_by(user_id=current_user.id, name=journal_type).first()
+    if not schema:
+        return jsonify({'error': 'Журнал не найден'}), 404
+
+    columns = ['id', 'created_at', *(field['name'] for field in schema.fields), 'files']
+    try:
+        return export_response(JournalEntry.iter_dicts(current_user.id, journal_type, EXPORT_BATCH_SIZE),
+                               request.args.get('format', 'ndjson'), journal_type, columns,
+                               to_row=_export_row)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+def _export_row(entry):
+    data = entry['data'] if isinstance(entry['data'], dict) else {}
+    return {**data, 'id': entry['id'], 'created_at': entry['created_at'], 'files': entry['files']}
+
+
+@journals.route('/<journal_type>/import', methods=['POST'])
+@jwt_required()
+def import_journal(journal_type):
+    """
+    Пакетный импорт записей: файл в поле file (csv, json или ndjson — по
+    расширению или ?format=) либо JSON-массив записей в теле запроса.
+    Возвращает число импортированных записей и ошибки по строкам.
+    """
+    schema = JournalSchema.query.filter_by(user_id=current_user.id, name=journal_type).first()
+    if not schema:
+        return jsonify({'error': 'Журнал не найден'}), 404
+
+    try:
+        upload = request.files.get('file')
+        if upload:
+            file_format = request.args.get('format') or os.path.splitext(upload.filename or '')[1].lstrip('.').lower()
+            rows = read_rows(upload.stream, file_format)
+        else:
+            rows = request.get_json(silent=True)
+            if not isinstance(rows, list):
+                return jsonify({'error': 'Ожидался файл или массив записей'}), 400
+        result = import_entries(current_user.id, schema, rows)
+    except (ValueError, UnicodeError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 201 if result['imported'] else 200
 
 
 @journals.route('/<journal_type>', methods=['POST'])
@@ -41,6 +127,7 @@ def create_journal(journal_type):
     entry = JournalEntry(user_id=current_user.id, journal_type=journal_type, data=data)
     db.session.add(entry)
     db.session.flush()  # Получаем ID записи
+    track_entry_change(journal_type, None, data)
     
     # Обрабатываем файлы для полей типа 'file'
     _process_journal_files(entry, schema, files)
@@ -67,6 +154,7 @@ def update_journal(journal_type, entry_id):
         data = request.get_json() or {}
         files = {}
     
+    track_entry_change(journal_type, entry.data, data)
     entry.data = data
     
     # Обрабатываем новые файлы
@@ -90,6 +178,7 @@ def delete_journal(journal_type, entry_id):
     for file in entry.files:
         file.delete_file()
     
+    track_entry_change(journal_type, entry.data, None)
     db.session.delete(entry)
     db.session.commit()
     return jsonify({'result': 'OK'})
@@ -158,6 +247,7 @@ def delete_schema(schema_id):
         for file in entry.files:
             file.delete_file()
     JournalEntry.query.filter_by(user_id=current_user.id, journal_type=schema.name).delete()
+    drop_journal_facets(current_user.id, schema.name)
     db.session.delete(schema)
     db.session.commit()
     return jsonify({'result': 'OK'})
@@ -0,0 +1,62 @@
+"""Полнотекстовый поиск по записям журналов."""
+
+from sqlalchemy import and_, case, cast, func, or_, select, true
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from sqlalchemy.orm import selectinload
+
+from app import db
+from .models import JournalEntry, SEARCH_CONFIG
+from .pagination import DEFAULT_LIMIT, clamp_limit, decode_cursor, encode_cursor
+
+HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5'
+
+
+def _highlights(entry_ids, tsquery):
+    """Фрагменты с подсветкой для строковых полей верхнего уровня, в которых есть совпадение."""
+    if not entry_ids:
+        return {}
+    obj = case((func.json_typeof(JournalEntry.data) == 'object', JournalEntry.data))
+    fields = func.json_each_text(obj).table_valued('key', 'value').lateral('field')
+    rows = db.session.execute(
+        select(JournalEntry.id, fields.c.key,
+               func.ts_headline(SEARCH_CONFIG, fields.c.value, tsquery, HEADLINE_OPTIONS))
+        .select_from(JournalEntry).join(fields, true())
+        .where(JournalEntry.id.in_(entry_ids),
+               func.json_typeof(JournalEntry.data.op('->')(fields.c.key)) == 'string',
+               func.to_tsvector(SEARCH_CONFIG, fields.c.value).op('@@')(tsquery))
+    ).all()
+    highlights = {}
+    for entry_id, field, fragment in rows:
+        highlights.setdefault(entry_id, {})[field] = fragment
+    return highlights
+
+
+def search_entries(user_id, journal_type, query_text, limit=DEFAULT_LIMIT, cursor=None):
+    """
+    Записи журнала, подходящие под запрос (синтаксис websearch_to_tsquery:
+    слова, "фразы", or, -исключение), по убыванию релевантности.
+    Постраничность — по ключу (rank, id): next_cursor передаётся в cursor
+    следующего запроса.
+    """
+    limit = clamp_limit(limit)
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query_text)
+    rank = cast(func.ts_rank_cd(JournalEntry.search_vector, tsquery), DOUBLE_PRECISION)
+
+    query = (db.session.query(JournalEntry, rank)
+             .options(selectinload(JournalEntry.files))
+             .filter(JournalEntry.user_id == user_id,
+                     JournalEntry.journal_type == journal_type,
+                     JournalEntry.search_vector.op('@@')(tsquery)))
+    if cursor:
+        after_rank, after_id = decode_cursor(cursor, float, str)
+        query = query.filter(or_(rank < after_rank, and_(rank == after_rank, JournalEntry.id < after_id)))
+    rows = query.order_by(rank.desc(), JournalEntry.id.desc()).limit(limit + 1).all()
+
+    page = rows[:limit]
+    highlights = _highlights([entry.id for entry, _ in page], tsquery)
+    results = [
+        {**entry.to_dict(), 'rank': entry_rank, 'highlights': highlights.get(entry.id, {})}
+        for entry, entry_rank in page
+    ]
+    next_cursor = encode_cursor(page[-1][1], page[-1][0].id) if len(rows) > limit else None
+    return {'results': results, 'next_cursor': next_cursor}
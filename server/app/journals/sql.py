@@ -0,0 +1,56 @@
+"""
+SQL-функции фильтров журналов (get_records_utils.fetch_filtered_records) и
+их индексов.
+
+journal_number — значение JSON как число по правилам float() из Python
+(логическое — 1/0, не число — NaN); journal_sort_key — непустая строка как
+байты UTF-8, чтобы сравнение шло по кодовым точкам, как в Python.
+
+Для create_all (тестовая база) операторы выполняются перед созданием
+таблицы записей (см. app.journals.models); рабочую базу обновляют миграции,
+у каждой своя копия операторов на момент миграции. При изменении добавить
+миграцию.
+"""
+
+JOURNAL_FILTER_FUNCTIONS = (
+    r"""CREATE OR REPLACE FUNCTION content.journal_number_text(raw text) RETURNS double precision
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+DECLARE
+    t text := btrim(raw, E' \t\n\r\f\v');
+    underflow boolean;
+BEGIN
+    -- Короткая десятичная запись с порядком до двух цифр не переполняется
+    IF t ~ '^[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]{1,2})?$' AND char_length(t) <= 200 THEN
+        RETURN t::double precision;
+    END IF;
+    -- Остальной синтаксис float(): подчёркивания между цифрами, inf, infinity, nan
+    IF t !~* '^[+-]?(([0-9](_?[0-9])*(\.([0-9](_?[0-9])*)?)?|\.[0-9](_?[0-9])*)(e[+-]?[0-9](_?[0-9])*)?|inf|infinity|nan)$' THEN
+        RETURN NULL;
+    END IF;
+    t := replace(t, '_', '');
+    RETURN t::double precision;
+EXCEPTION WHEN numeric_value_out_of_range THEN
+    -- float() не выдаёт ошибку: слишком большое по модулю значение — ±inf, слишком малое — 0
+    BEGIN
+        underflow := abs(t::numeric) < 1;
+    EXCEPTION WHEN numeric_value_out_of_range THEN
+        underflow := t ~ '[eE]-';
+    END;
+    RETURN CASE WHEN underflow THEN 0::double precision WHEN left(t, 1) = '-' THEN '-Infinity' ELSE 'Infinity' END;
+END
+$$""",
+    r"""CREATE OR REPLACE FUNCTION content.journal_number(value json) RETURNS double precision
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(CASE json_typeof(value)
+        WHEN 'boolean' THEN CASE WHEN value::text = 'true' THEN 1 ELSE 0 END
+        WHEN 'number' THEN content.journal_number_text(value::text)
+        WHEN 'string' THEN content.journal_number_text(value #>> '{}')
+    END, 'NaN')
+$$""",
+    r"""CREATE OR REPLACE FUNCTION content.journal_sort_key(value json) RETURNS bytea
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE WHEN json_typeof(value) = 'string' AND value #>> '{}' <> ''
+        THEN convert_to(value #>> '{}', 'UTF8')
+    END
+$$""",
+)
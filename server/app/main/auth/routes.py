@@ -1,4 +1,3 @@
-from datetime import datetime
 import re
 
 from flask import current_app, request, jsonify, make_response
@@ -11,8 +10,7 @@ from flask_jwt_extended import (
 )
 
 from ..models import User
-from ...subscription_models import UserSubscription
-from ...access_control import get_user_permissions
+from ...access_control import resolve_user_permissions
 from app import db
 
 from . import auth_bp
@@ -50,15 +48,8 @@ def api_login():
         )
         return jsonify({"error": "Invalid username or password"}), 401
 
-    active_sub = UserSubscription.query.filter_by(
-        user_id=user.user_id, is_active=True
-    ).first()
-    if active_sub:
-        if active_sub.end_date and active_sub.end_date < datetime.utcnow():
-            active_sub.is_active = False
-            user.access_level_id = 1
-            db.session.commit()
-    permissions = get_user_permissions(getattr(user, "access_level_id", 1), user.user_id)
+    # Истёкшие подписки понижает expire_subscriptions; вход только читает
+    permissions = resolve_user_permissions(user)["permissions"]
 
     access_token = create_access_token(identity=str(user.user_id))
     refresh_token = create_refresh_token(identity=str(user.user_id))
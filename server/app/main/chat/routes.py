@@ -1,55 +1,57 @@
-from flask import Response, request, jsonify, current_app
+from flask import request, jsonify, current_app
 from flask_socketio import emit
-from flask_jwt_extended import jwt_required
+from flask_jwt_extended import jwt_required, current_user
 
 from app import socketio
-from ..models import User, ChatHistory
+from app.socketio_utils import authenticate_socket, socket_user_id
+from ..models import ChatHistory
 from ..handlers import save_and_emit_message
 from app.secretary import answer_from_secretary
 from app.db_utils import update_record
-import json
 
 from . import chat_bp
 
+CHAT_HISTORY_LIMIT = 100
+CHAT_HISTORY_MAX_LIMIT = 500
+
 
 def ws_log(event):
     current_app.logger.info(f"Client {event} from chat websocket")
 
 
-socketio.on_event("connect", lambda auth=None: ws_log("connected"), namespace="/chat")
+@socketio.on("connect", namespace="/chat")
+def chat_ws_connect(auth=None):
+    authenticate_socket(auth)
+    ws_log("connected")
+
+
 socketio.on_event("disconnect", lambda: ws_log("disconnected"), namespace="/chat")
 
 
 @socketio.on("request_messages", namespace="/chat")
 def handle_request_messages():
-    messages = get_messages_data()
+    messages = get_messages_data(socket_user_id())
     emit("all_messages", messages, to=request.sid)
 
 
 @chat_bp.route("/api/chat/messages", methods=["GET"])
+@jwt_required()
 def get_messages():
-    messages = get_messages_data()
-    return Response(json.dumps(messages), mimetype="application/json")
-
-
-def get_messages_data():
-    messages_list = ChatHistory.query.order_by(ChatHistory.message_id.desc()).limit(100).all()
-    if messages_list:
-        messages_list = messages_list[::-1]
-        messages = []
-        for message in messages_list:
-            user = User.query.filter_by(user_id=message.user_id).first()
-            message_dict = {
-                "message_id": str(message.message_id),
-                "user": user.to_dict() if user else {"user_name": "Unknown", "avatar_src": "default.png"},
-                "text": message.text,
-                "datetime": message.datetime.isoformat() + "Z",
-                "files": message.files,
-            }
-            messages.append(message_dict)
-    else:
-        messages = []
-    return messages
+    """История беседы по страницам: ?limit=100&before=<next_before>&user_id=<автор>"""
+    try:
+        before = int(request.args["before"]) if request.args.get("before") else None
+        limit = max(1, min(int(request.args.get("limit", CHAT_HISTORY_LIMIT)), CHAT_HISTORY_MAX_LIMIT))
+    except ValueError:
+        return jsonify({"error": "Invalid before or limit"}), 400
+
+    messages = get_messages_data(current_user.id, before, limit, request.args.get("user_id"))
+    next_before = int(messages[0]["message_id"]) if len(messages) == limit else None
+    return jsonify({"messages": messages, "next_before": next_before})
+
+
+def get_messages_data(conversation_id, before=None, limit=CHAT_HISTORY_LIMIT, user_id=None):
+    """Последние сообщения беседы пользователя (от старых к новым), см. ChatHistory.history."""
+    return ChatHistory.history(str(conversation_id), before=before, limit=limit, user_id=user_id)
 
 
 @chat_bp.route("/chat/new_message", methods=["POST"])
@@ -63,18 +65,19 @@ def new_message():
     if not user_id or not text:
         return jsonify({"error": "Invalid data"}), 400
 
-    message, status_code = save_and_emit_message(user_id, text)
+    room_user_id = current_user.id
+    message, status_code = save_and_emit_message(user_id, text, room_user_id=room_user_id)
     result = {"messages": [message]}
 
     secretary_answer = answer_from_secretary(text, files)
     if secretary_answer:
-        message, status_code = save_and_emit_message("2", secretary_answer.get("text"))
+        message, status_code = save_and_emit_message("2", secretary_answer.get("text"), room_user_id=room_user_id)
         message["params"] = secretary_answer.get("params", None)
         message["context"] = secretary_answer.get("context", None)
         result["messages"].append(message)
         result["status_code"] = status_code
     else:
-        message, status_code = save_and_emit_message("2", "Уточните запрос")
+        message, status_code = save_and_emit_message("2", "Уточните запрос", room_user_id=room_user_id)
         result["messages"].append(message)
         result["status_code"] = status_code
     return jsonify(result), status_code
@@ -90,13 +93,14 @@ def handle_new_message(data):
         emit("error", {"error": "Invalid data"}, to=request.sid)
         return
 
-    save_and_emit_message(user_id, text)
+    room_user_id = socket_user_id()
+    save_and_emit_message(user_id, text, room_user_id=room_user_id)
 
     secretary_answer = answer_from_secretary(text, files)
     if secretary_answer:
-        save_and_emit_message("2", secretary_answer.get("text"))
+        save_and_emit_message("2", secretary_answer.get("text"), room_user_id=room_user_id)
     else:
-        save_and_emit_message("2", "Уточните запрос")
+        save_and_emit_message("2", "Уточните запрос", room_user_id=room_user_id)
 
 
 @socketio.on("new_transcript", namespace="/chat")
@@ -106,8 +110,9 @@ def handle_new_transcript(data):
     if "стоп стоп стоп" in text.lower() or "stop stop stop" in text.lower():
         emit("stop_listening", to=request.sid)
 
+    room_user_id = socket_user_id()
     if text.lower() == "секретарь привет":
-        save_and_emit_message(user_id="2", text="Здравствуйте")
+        save_and_emit_message(user_id="2", text="Здравствуйте", room_user_id=room_user_id)
         return
 
     current_app.logger.debug(f"{user_id}: {text}")
@@ -118,9 +123,9 @@ def handle_new_transcript(data):
 
     secretary_answer = answer_from_secretary(text)
     if secretary_answer:
-        save_and_emit_message(user_id=user_id, text=text)
+        save_and_emit_message(user_id=user_id, text=text, room_user_id=room_user_id)
         message, _ = save_and_emit_message(
-            user_id="2", text=secretary_answer.get("text")
+            user_id="2", text=secretary_answer.get("text"), room_user_id=room_user_id
         )
         message["params"] = secretary_answer.get("params", None)
         message["context"] = secretary_answer.get("context", None)
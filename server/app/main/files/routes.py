@@ -1,9 +1,12 @@
 import os
-from flask import current_app, send_from_directory, make_response, send_file, abort, request
+from flask import current_app, send_from_directory, make_response, send_file, abort, request, Response, \
+    stream_with_context
 from flask_jwt_extended import jwt_required, current_user
+from werkzeug.security import safe_join
 
 from ..models import ChatHistory
-from app.text_to_edge_tts import generate_tts, del_all_audio_files
+from app.text_to_edge_tts import generate_tts, stream_tts, submit_tts
+from app.tts_jobs import TTSQueueFull, get_tts_service
 
 from . import files_bp
 
@@ -72,47 +75,79 @@ def static_files(filename):
 @files_bp.route("/temp/<path:filename>", methods=["GET"])
 def get_temp_files(filename):
     base_dir = os.path.join(current_app.root_path, "temp")
-    file_path = os.path.join(base_dir, filename)
-    if not os.path.exists(file_path):
-        if filename.startswith("edge_audio_"):
-            record_id = filename.replace("edge_audio_", "").replace(".mp3", "")
-            message = ChatHistory.query.filter_by(message_id=record_id).first()
-            if not message:
-                abort(404, description="Message not found")
-            del_all_audio_files()
-            result = generate_tts(text=message.text, record_id=record_id)
-            if result:
-                return send_file(file_path)
-            else:
-                abort(404, description=result)
-    else:
+    file_path = safe_join(base_dir, filename)
+    if file_path and os.path.isfile(file_path):
         return send_file(file_path)
 
+    if filename.startswith("edge_audio_") and filename.endswith(".mp3"):
+        # Озвучка сообщения чата — из кэша по тексту сообщения (синтез только при промахе)
+        record_id = filename[len("edge_audio_"):-len(".mp3")]
+        if not record_id.isdigit():
+            abort(404, description="Message not found")
+        message = ChatHistory.query.filter_by(message_id=int(record_id)).first()
+        if not message or not message.text:
+            abort(404, description="Message not found")
+        result = generate_tts(text=message.text)
+        if result:
+            return send_file(result, mimetype="audio/mpeg")
+        abort(404, description="TTS generation failed")
+
     return "File not found", 404
 
 
+def _submit_tts_job():
+    """Задание озвучки без ожидания (wait=0): 202, пока не готово; затем опрос /tts_jobs/<job_id>."""
+    try:
+        job = submit_tts(request.form.get("text"), user_id=current_user.id if current_user else None)
+    except TTSQueueFull:
+        abort(503, description="TTS queue is full")
+    return job.to_dict(), 200 if job.done else 202
+
+
 @files_bp.route("/get_tts_audio", methods=["POST"])
+@jwt_required(optional=True)
 def get_tts_audio():
     text = request.form.get("text")
     if not text:
         abort(400, description="No text provided")
+    if request.form.get("wait") == "0":
+        return _submit_tts_job()
+    if request.form.get("stream") == "1":
+        try:
+            chunks = stream_tts(text)
+        except ValueError:
+            abort(400, description="Nothing to synthesize")
+        if chunks is not None:
+            return Response(stream_with_context(chunks), mimetype="audio/mpeg")
 
     result = generate_tts(text=text)
     if result:
-        return send_file(result)
+        return send_file(result, mimetype="audio/mpeg")
     else:
         abort(404, description="File not found")
 
 
 @files_bp.route("/get_tts_audio_filename", methods=["POST"])
+@jwt_required(optional=True)
 def get_tts_audio_filename():
     text = request.form.get("text")
     if not text:
         abort(400, description="No text provided")
+    if request.form.get("wait") == "0":
+        return _submit_tts_job()
 
     result = generate_tts(text=text)
-    if result and os.path.exists(result):
-        edge_filename = result.replace("\\", "/").split("/")[-1]
+    if result:
+        edge_filename = os.path.basename(result)
         return {"filename": edge_filename}, 200
     else:
         abort(404, description="File not found")
+
+
+@files_bp.route("/tts_jobs/<job_id>", methods=["GET"])
+def get_tts_job(job_id):
+    """Состояние задания озвучки; готовый файл — /temp/<filename>."""
+    job = get_tts_service().get(job_id)
+    if job is None:
+        abort(404, description="Job not found")
+    return job.to_dict(), 200
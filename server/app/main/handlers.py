@@ -5,6 +5,7 @@ from flask_jwt_extended import current_user
 from flask_socketio import emit
 
 from app import socketio, db
+from app.socketio_utils import user_room
 from .models import User, ChatHistory
 
 from app.journals.models import JournalEntry
@@ -58,19 +59,26 @@ def fetch_table_records(table_name, date_str, timezone_offset_ms):
     raise ValueError("Unsupported table")
 
 
-def save_and_emit_message(user_id, text, files=None):
-    """Save message to the database and emit it via SocketIO."""
+def save_and_emit_message(user_id, text, files=None, room_user_id=None):
+    """
+    Save message to the database and emit it via SocketIO.
+
+    The message is emitted only to the room of ``room_user_id`` — the owner of
+    the conversation (defaults to the author; secretary replies pass the user
+    they answer).
+    """
+    room = user_room(room_user_id or user_id)
     user = User.query.filter_by(user_id=user_id).first()
     if not user:
         error = {"error": "User not found"}
-        socketio.emit("error", error, namespace="/chat")
+        socketio.emit("error", error, namespace="/chat", to=room)
         return error, 404
 
-    message = ChatHistory(user_id=user.user_id, text=text, files=files)
+    message = ChatHistory(user_id=user.user_id, conversation_id=str(room_user_id or user.user_id),
+                          text=text, files=files)
     db.session.add(message)
     db.session.commit()
 
-    message_dict = message.to_dict()
-    socketio.emit("message", message_dict, namespace="/chat")
+    message_dict = message.to_dict(user)
+    socketio.emit("message", message_dict, namespace="/chat", to=room)
     return message_dict, 201
-
@@ -124,17 +124,44 @@ class User(db.Model):
 # Модель для таблицы chat_history
 class ChatHistory(db.Model):
     __tablename__ = 'chat_history'
-    __table_args__ = {'schema': 'communication'}
+    __table_args__ = (
+        db.Index('ix_chat_history_user_message', 'user_id', 'message_id'),
+        db.Index('ix_chat_history_conversation_message', 'conversation_id', 'message_id'),
+        {'schema': 'communication'}
+    )
     message_id = Column(Integer, primary_key=True)
     user_id = Column(String(36), ForeignKey('users.users.user_id'), nullable=False)
+    # Владелец беседы: пользователь, в чью комнату отправлено сообщение (ответы секретаря
+    # написаны от его имени, но относятся к беседе пользователя)
+    conversation_id = Column(String(36))
     datetime = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     text = Column(Text)
     files = Column(Text)
     position = Column(Text)
 
-    def to_dict(self):
-        # Получаем пользователя отдельно
-        user = User.query.filter_by(user_id=self.user_id).first()
+    @classmethod
+    def history(cls, conversation_id, before=None, limit=100, user_id=None):
+        """
+        Последние limit сообщений беседы с message_id < before (от старых к новым)
+        вместе с авторами — одним запросом с join. user_id оставляет только
+        сообщения этого автора.
+        """
+        query = (
+            db.session.query(cls, User)
+            .outerjoin(User, User.user_id == cls.user_id)
+            .filter(cls.conversation_id == conversation_id)
+        )
+        if user_id is not None:
+            query = query.filter(cls.user_id == user_id)
+        if before is not None:
+            query = query.filter(cls.message_id < before)
+        rows = query.order_by(cls.message_id.desc()).limit(limit).all()
+        return [message.to_dict(user) for message, user in reversed(rows)]
+
+    def to_dict(self, user=None):
+        # Автор, если не передан (загружен вместе с сообщением), запрашивается отдельно
+        if user is None:
+            user = db.session.get(User, self.user_id)
         return {
             'message_id': str(self.message_id),
             'user': user.to_dict() if user else {'user_name': 'Unknown', 'avatar_src': 'default.png'},
@@ -6,6 +6,7 @@ from flask import current_app, jsonify, abort, request
 from flask_jwt_extended import jwt_required, current_user
 
 from app import socketio
+from app.socketio_utils import authenticate_socket
 from . import main
 from .handlers import fetch_table_records
 from app.db_utils import save_to_base_modules
@@ -13,8 +14,9 @@ from ..tasks.task_handlers import create_daily_scenario
 
 
 @socketio.on("connect", namespace="/updates")
-def updates_ws_connect():
-    current_app.logger.info("Client connected to updates websocket")
+def updates_ws_connect(auth=None):
+    user_id = authenticate_socket(auth)
+    current_app.logger.info(f"Client connected to updates websocket (user {user_id})")
 
 
 @socketio.on("disconnect", namespace="/updates")
@@ -0,0 +1,60 @@
+"""
+Периодические фоновые задачи обслуживания БД.
+
+Задачи запускаются из ``run.py`` как фоновые задачи Socket.IO (eventlet),
+каждая в своём контексте приложения. Интервал в секундах задаётся
+конфигурацией; 0 отключает задачу. Те же задачи доступны CLI-командами.
+"""
+
+import time
+
+from app import db, socketio
+
+# (имя, ключ конфигурации с интервалом, функция)
+MAINTENANCE_JOBS = []
+
+
+def maintenance_job(name, interval_key):
+    """Регистрирует функцию как периодическую задачу обслуживания."""
+    def decorator(func):
+        MAINTENANCE_JOBS.append((name, interval_key, func))
+        return func
+    return decorator
+
+
+def run_job(app, name, func):
+    """Один запуск задачи; ошибка логируется и не останавливает цикл."""
+    with app.app_context():
+        started = time.perf_counter()
+        try:
+            result = func()
+            app.logger.info(f'maintenance job {name}: {result} in {time.perf_counter() - started:.2f}s')
+            return result
+        except Exception:
+            db.session.rollback()
+            app.logger.exception(f'maintenance job {name} failed')
+        finally:
+            db.session.remove()
+
+
+def _job_loop(app, name, func, interval):
+    while True:
+        socketio.sleep(interval)
+        run_job(app, name, func)
+
+
+def start_maintenance_jobs(app):
+    """Запускает все зарегистрированные задачи с ненулевым интервалом."""
+    _register_jobs()
+    for name, interval_key, func in MAINTENANCE_JOBS:
+        interval = app.config.get(interval_key, 0)
+        if interval:
+            socketio.start_background_task(_job_loop, app, name, func, interval)
+            app.logger.info(f'maintenance job {name} scheduled every {interval}s')
+
+
+def _register_jobs():
+    # Модули с задачами импортируются здесь, чтобы избежать циклических импортов
+    from .tasks.calendar import maintenance  # noqa: F401
+    from . import subscription_maintenance  # noqa: F401
+    from .journals import facets  # noqa: F401
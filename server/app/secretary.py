@@ -3,11 +3,10 @@ from app.command_utils import find_target_module, find_info, find_command_type
 
 from app.modules.MetaAIAPI import get_eden_ai_response
 
-from app.tasks.list_handlers import get_lists_and_groups_data, add_object
-from app.tasks.task_handlers import add_task, add_subtask, change_task_status, get_tasks
+from app.tasks.list_handlers import add_object
+from app.tasks.task_handlers import add_task, add_subtask, change_task_status
 from app.tasks.entity_handlers import delete_from_childes, link_task
-
-from rapidfuzz import fuzz, process
+from app.tasks.title_index import title_index
 
 
 def answer_from_secretary(text, files=None):
@@ -63,7 +62,7 @@ def answer_from_secretary(text, files=None):
     return result
 
 
-def task_module(command_type, data):
+def task_module(command_type, data, user_id):
     # print(f'task_module: data: {data}')
     subtask_title = data.get('subtask', None)
     task_name = data.get('task_name', None)
@@ -74,17 +73,18 @@ def task_module(command_type, data):
             object_type, object_title = get_creating_object_type(data)
             match object_type:
                 case 'subtask':
-                    task_id, list_id = get_best_task_and_list_id(task_name, list_name)
+                    task_id, list_id = get_best_task_and_list_id(task_name, list_name, user_id)
                     # print(f'task_id: {task_id}, list_id: {list_id}')
-                    return add_subtask({'title': subtask_title, 'parentTaskId': task_id, 'listId': list_id})
+                    return add_subtask({'title': subtask_title, 'parentTaskId': task_id, 'listId': list_id},
+                                       user_id=user_id)
                 case 'task':
-                    _, list_id = get_best_matching_lists(list_name)
-                    return add_task({'title': task_name, 'listId': list_id})
+                    _, list_id = get_best_matching_lists(list_name, user_id)
+                    return add_task({'title': task_name, 'listId': list_id}, user_id=user_id)
                 case 'list' | 'group' | 'project':
-                    return add_object({'title': object_title, 'type': object_type})
+                    return add_object({'title': object_title, 'type': object_type}, user_id=user_id)
         case 'mark':
-            task_id, _ = get_best_task_and_list_id(task_name, list_name)
-            mark_result, _ = change_task_status({'taskId': task_id})
+            task_id, _ = get_best_task_and_list_id(task_name, list_name, user_id)
+            mark_result, _ = change_task_status({'taskId': task_id, 'is_completed': True}, user_id=user_id)
             # print(f'mark_result: {mark_result}')
             if mark_result['success']:
                 result = {'message': f'Поздравляю с завершением задачи'}
@@ -93,28 +93,23 @@ def task_module(command_type, data):
             return result, 200
 
 
-def get_best_task_and_list_id(task_name, list_name):
+def get_best_task_and_list_id(task_name, list_name, user_id):
     best_list_id = None
     best_task_id = None
     highest_score = 0
     if not list_name:
-        task_id, task_score = get_best_matching_task_id(task_name, 'all')
+        task_id, task_score = get_best_matching_task_id(task_name, 'all', user_id)
         if task_id:
             return task_id, 'tasks'
         return None, None
-    lists = get_lists_and_groups_data().get('lists', [])
-    # print(f'get_best_task_and_list_id: list_name: {list_name}, task_name: {task_name},  lists: {lists}')
-    best_matching_lists, _ = get_best_matching_lists(list_name)
+    best_matching_lists, _ = get_best_matching_lists(list_name, user_id)
     # print(f'best_matching_lists: {best_matching_lists}')
-    for l_name, score, _ in best_matching_lists:
-        list_id = next((l['id'] for l in lists if l['title'].lower() == l_name.lower()), None)
-        # print(f'list_id: {list_id}')
-        if list_id:
-            task_id, task_score = get_best_matching_task_id(task_name, list_id)
-            if task_score > highest_score:
-                best_list_id = list_id
-                best_task_id = task_id
-                highest_score = task_score
+    for _, score, list_id in best_matching_lists:
+        task_id, task_score = get_best_matching_task_id(task_name, list_id, user_id)
+        if task_score > highest_score:
+            best_list_id = list_id
+            best_task_id = task_id
+            highest_score = task_score
 
     # print(f'best_task_id: {best_task_id}, best_list_id: {best_list_id}')
     return best_task_id, best_list_id
@@ -135,48 +130,23 @@ def get_creating_object_type(data):
     return None, None
 
 
-def get_best_matching_lists(list_name):
+def get_best_matching_lists(list_name, user_id):
     if not list_name:
-        return [{'tasks', 100}], 'tasks'
-
-    lists_data = get_lists_and_groups_data().get('lists', [])
-    list_names = [task_list['title'].lower() for task_list in lists_data]
+        return [('tasks', 100, 'tasks')], 'tasks'
 
-    # Использование rapidfuzz для поиска всех подходящих списков
-    list_matches = process.extract(list_name.lower(), list_names, scorer=fuzz.token_sort_ratio, limit=None,
-                                   score_cutoff=80)
+    # Все подходящие списки [(название, оценка, list_id)] по индексу названий пользователя
+    list_matches = title_index.match_lists(user_id, list_name)
 
     # Находим самый первый list_id для некоторых функций
-    list_id = None
-    if list_matches:
-        best_match_title = list_matches[0][0]
-        list_id = next((l['id'] for l in lists_data if l['title'].lower() == best_match_title), None)
-
+    list_id = list_matches[0][2] if list_matches else None
     return list_matches, list_id
 
 
-def get_best_matching_task_id(task_name, list_id='all'):
-    tasks_response, _ = get_tasks(list_id)
-    tasks_data = tasks_response.get('tasks', [])
-
-    if task_name:
-        # Преобразуем заголовки задач и искомое имя задачи в нижний регистр
-        tasks_names = [task['title'].lower() for task in tasks_data]
-
-        # print(f'get_best_matching_task_id: {task_name}, {tasks_names}')
-
-        # Использование fuzzywuzzy для поиска наиболее подходящей задачи
-        task_matches = process.extract(task_name.lower(), tasks_names, scorer=fuzz.token_sort_ratio, limit=1,
-                                       score_cutoff=80)
-        # print(f'task_matches: {task_matches}')
-
-        # Получение идентификаторов задач
-        if task_matches:
-            best_match_title, score, _ = task_matches[0]
-            best_match_id = next(task['id'] for task in tasks_data if task['title'].lower() == best_match_title)
-            return best_match_id, score
-
-    return None, 0
+def get_best_matching_task_id(task_name, list_id, user_id):
+    if not task_name:
+        return None, 0
+    # Сравнение по token_sort_ratio с заранее подготовленными названиями задач (app.tasks.title_index)
+    return title_index.match_task(user_id, task_name, list_id)
 
 
 if __name__ == '__main__':
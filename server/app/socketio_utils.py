@@ -1,14 +1,62 @@
 """Utility helpers for Socket.IO notifications."""
 
+from flask import request, session
+from flask_jwt_extended import decode_token
+from flask_socketio import ConnectionRefusedError, join_room
+
 from app import socketio
 
 
-def notify_data_update(**data):
-    """Emit update notifications to clients via Socket.IO."""
-    socketio.emit('data_updated', data, namespace='/updates')
+def user_room(user_id):
+    """Name of the Socket.IO room that holds every socket of the user."""
+    return f'user:{user_id}'
+
+
+def authenticate_socket(auth=None):
+    """
+    Authenticate a namespace connection with the JWT access token and join the user's room.
+
+    The token is taken from the Socket.IO ``auth`` payload (``{"token": ...}``),
+    the ``token`` query parameter or the ``Authorization: Bearer`` header.
+    Raises ``ConnectionRefusedError`` so Flask-SocketIO rejects the connection.
+    """
+    token = (auth or {}).get('token') if isinstance(auth, dict) else None
+    if not token:
+        token = request.args.get('token')
+    if not token:
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Bearer '):
+            token = header[len('Bearer '):]
+    if not token:
+        raise ConnectionRefusedError('unauthorized')
+
+    try:
+        user_id = str(decode_token(token)['sub'])
+    except Exception:
+        raise ConnectionRefusedError('unauthorized')
+
+    session['user_id'] = user_id
+    join_room(user_room(user_id))
+    return user_id
+
+
+def socket_user_id():
+    """Id of the user authenticated on the current socket connection."""
+    return session.get('user_id')
+
+
+def notify_data_update(user_id, **data):
+    """Emit update notifications to the user's clients via Socket.IO."""
+    socketio.emit('data_updated', data, namespace='/updates', to=user_room(user_id))
+
+
+def notify_task_change(user_id, action, task_data, list_id=None, lists_data=None, calendar_events=None, lists_delta=None):
+    """
+    Emit specific task change notifications to the user's clients, optionally with lists and calendar events.
 
-def notify_task_change(action, task_data, list_id=None, lists_data=None, calendar_events=None):
-    """Emit specific task change notifications, optionally with lists and calendar events."""
+    ``lists_delta`` is the compact sidebar patch from ``get_lists_delta``;
+    ``lists_data`` (the full sidebar) is kept for callers that still need it.
+    """
     payload = {
         'action': action,  # 'added', 'updated', 'deleted', 'status_changed'
         'task': task_data,
@@ -16,6 +64,8 @@ def notify_task_change(action, task_data, list_id=None, lists_data=None, calenda
     }
     if lists_data is not None:
         payload['lists_data'] = lists_data
+    if lists_delta is not None:
+        payload['lists_delta'] = lists_delta
     if calendar_events is not None:
         payload['calendar_events'] = calendar_events
-    socketio.emit('task_changed', payload, namespace='/updates')
+    socketio.emit('task_changed', payload, namespace='/updates', to=user_room(user_id))
@@ -0,0 +1,52 @@
+"""Периодическое истечение подписок."""
+
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import exists, or_, update
+
+from app import db
+from app.maintenance import maintenance_job
+from .main.models import User
+from .subscription_models import UserSubscription
+
+FREE_ACCESS_LEVEL = 1
+
+
+@maintenance_job('expire_subscriptions', 'SUBSCRIPTION_EXPIRY_INTERVAL')
+def expire_subscriptions(now=None):
+    """
+    Деактивирует все истёкшие подписки и возвращает их владельцев на Free —
+    два UPDATE в одной транзакции. Пользователь, у которого осталась другая
+    действующая подписка, не понижается. Кэш разрешений сбрасывать не нужно:
+    смена access_level_id меняет его ключ (см. app.access_control).
+    """
+    now = now or datetime.now()
+    expired_users = set(db.session.execute(
+        update(UserSubscription)
+        .where(UserSubscription.is_active == True,
+               UserSubscription.end_date != None,
+               UserSubscription.end_date < now)
+        .values(is_active=False)
+        .returning(UserSubscription.user_id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+
+    downgraded = 0
+    if expired_users:
+        still_active = exists().where(
+            UserSubscription.user_id == User.user_id,
+            UserSubscription.is_active == True,
+            or_(UserSubscription.end_date == None, UserSubscription.end_date >= now),
+        )
+        downgraded = db.session.execute(
+            update(User)
+            .where(User.user_id.in_(expired_users), ~still_active)
+            .values(access_level_id=FREE_ACCESS_LEVEL)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    db.session.commit()
+
+    stats = {'expired': len(expired_users), 'downgraded': downgraded}
+    current_app.logger.info(f'expire_subscriptions {stats}')
+    return stats
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify, g
-from .access_control import get_user_permissions
+from .access_control import current_permissions, permission_cache
 from .subscription_models import AccessLevel, SubscriptionPlan, UserSubscription
 from .main.models import User, db
 from datetime import datetime, timedelta
@@ -29,10 +29,7 @@ def get_subscription_plans():
 
 @subscription_bp.route('/user/permissions', methods=['GET'])
 def get_user_permissions_route():
-    user_level = getattr(g, 'user_access_level', 1)
-    user_id = getattr(g, 'user_id', None)
-    permissions = get_user_permissions(user_level, user_id)
-    return jsonify(permissions)
+    return jsonify(current_permissions())
 
 @subscription_bp.route('/user/subscription', methods=['GET'])
 def get_user_subscription():
@@ -96,5 +93,6 @@ def subscribe_to_plan(plan_id):
     
     db.session.add(subscription)
     db.session.commit()
+    permission_cache.invalidate(user_id)
     
     return jsonify({'message': 'Subscription activated', 'plan_id': plan_id})
\ No newline at end of file
@@ -15,7 +15,7 @@ from app.socketio_utils import notify_data_update, notify_task_change
 
 def make_cache_key(prefix):
     def _key():
-        version = DataVersion.get_version('tasksVersion')
+        version = DataVersion.get_version(current_user.id, 'tasksVersion')
         return f"{prefix}:{current_user.id}:{version}:{request.full_path}"
     return _key
 
@@ -28,10 +28,10 @@ def get_anti_schedule_route():
     user_id = current_user.id
     result, status_code = get_anti_schedule(user_id)
     if status_code == 200:
-        version = DataVersion.get_version('tasksVersion')
+        version = DataVersion.get_version(current_user.id, 'tasksVersion')
         response = jsonify(result)
-        response.set_etag(version)
-        if request.if_none_match and version in request.if_none_match:
+        response.set_etag(str(version))
+        if request.if_none_match and str(version) in request.if_none_match:
             return '', 304
         return response
     return jsonify(result), status_code
@@ -45,9 +45,9 @@ def add_anti_task_route():
     result, status_code = add_anti_task(data, user_id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
     return response, status_code
 
 
@@ -58,9 +58,9 @@ def edit_anti_task_route():
     result, status_code = edit_anti_task(data)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
     return response, status_code
 
 
@@ -71,8 +71,8 @@ def del_anti_task_route():
     result, status_code = del_anti_task(data)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
     return response, status_code
 
@@ -1,7 +1,9 @@
 from datetime import datetime, timezone, timedelta
+from types import MappingProxyType
 from flask import current_app
 from ..models import Task
 from .models import TaskOverride
+from .occurrences import occurrence_cache
 from app import db, socketio
 from datetime import datetime, timedelta, timezone
 from dateutil.rrule import rrule, WEEKLY, DAILY, MONTHLY, YEARLY, MO, TU, WE, TH, FR
@@ -40,14 +42,15 @@ def _is_task_in_range(task, start_dt, end_dt, is_events=False):
     return True
 
 
-def delete_redundant_override(override, task):
-    """Remove override if all data matches the parent task (start/end compare only time)."""
-    fields = [
-        'title', 'start', 'end', 'note', 'status_id', 'completed_at', 'color', 'priority_id', 'type_id'
-    ]
-    task_dict = task.to_dict()
-    override_data = override.data or {}
-    for field in fields:
+# Поля, по которым override сравнивается с родительской задачей
+OVERRIDE_COMPARED_FIELDS = (
+    'title', 'start', 'end', 'note', 'status_id', 'completed_at', 'color', 'priority_id', 'type_id'
+)
+
+
+def _is_redundant_override(override_data, task_dict):
+    """Override is redundant if all data matches the parent task (start/end compare only time)."""
+    for field in OVERRIDE_COMPARED_FIELDS:
         val_override = override_data.get(field)
         val_task = task_dict.get(field)
         if field in ('start', 'end'):
@@ -61,14 +64,46 @@ def delete_redundant_override(override, task):
                     return False
             elif val_override != val_task:
                 return False
-        else:
-            if val_override != val_task:
-                return False
-    db.session.delete(override)
-    db.session.commit()
+        elif val_override != val_task:
+            return False
     return True
 
 
+def _instance_template(task_dict):
+    """
+    Неизменяемый шаблон экземпляров серии: сериализованная родительская задача
+    и признаки экземпляра. Строится один раз на задачу, а не на каждое вхождение.
+    """
+    return MappingProxyType({
+        **task_dict,
+        'is_override': False,
+        'parent_task_id': task_dict['id'],
+        'is_instance': True,
+    })
+
+
+def _build_instance(template, occ, occ_end, instance_id, override=None):
+    """Экземпляр серии — поверхностная копия шаблона, в которой меняются только start/end/id/range."""
+    if override is None:
+        instance = dict(template)
+    else:
+        instance = {
+            **template,
+            **(override.data or {}),
+            'is_override': True,
+            'parent_task_id': template['parent_task_id'],
+            'is_instance': True,
+            'override_id': override.id,
+        }
+    start_iso = occ.isoformat() + 'Z'
+    end_iso = occ_end.isoformat() + 'Z'
+    instance['start'] = start_iso
+    instance['end'] = end_iso
+    instance['id'] = instance_id
+    instance['range'] = {'start': start_iso, 'end': end_iso}
+    return instance
+
+
 def get_calendar_events(start=None, end=None, user_id=None):
     if user_id is None:
         raise ValueError("user_id must be provided")
@@ -79,13 +114,6 @@ def get_calendar_events(start=None, end=None, user_id=None):
     if start_dt and end_dt and start_dt > end_dt:
         raise ValueError("start date must not be after end date")
 
-    load_options = [
-        db.joinedload(Task.lists),
-        db.joinedload(Task.status),
-        db.joinedload(Task.priority),
-        db.joinedload(Task.interval),
-    ]
-
     current_app.logger.info(f'get_calendar_events {start_dt} {end_dt}')
 
     # If caller provided a date range, limit tasks loaded to recurring tasks
@@ -95,12 +123,18 @@ def get_calendar_events(start=None, end=None, user_id=None):
     from sqlalchemy import or_, and_
     if start_dt and end_dt:
         tasks_query = (
-            Task.query.options(*load_options)
+            Task.query
             .filter(Task.user_id == user_id)
             .filter(
                 or_(
-                    Task.interval_id.isnot(None),
+                    # Серии отбираются по сохранённым границам (индекс ix_tasks_user_series)
                     and_(
+                        Task.interval_id.isnot(None),
+                        Task.series_start <= end_dt,
+                        or_(Task.series_end == None, Task.series_end >= start_dt),
+                    ),
+                    and_(
+                        Task.interval_id.is_(None),
                         Task.start != None,
                         or_(Task.end == None, Task.end >= start_dt),
                         Task.start <= end_dt,
@@ -112,9 +146,11 @@ def get_calendar_events(start=None, end=None, user_id=None):
     else:
         # When no date range is provided fall back to loading everything
         # (keeps existing behavior for endpoints that expect full data).
-        tasks_query = Task.query.options(*load_options).filter_by(user_id=user_id).all()
+        tasks_query = Task.query.filter_by(user_id=user_id).all()
     events = []
     parent_tasks = []
+    # Каждая задача сериализуется один раз; типы и списки подгружаются пакетно
+    task_dicts = dict(zip((task.id for task in tasks_query), Task.to_dict_many(tasks_query)))
 
     recurring_task_ids = [task.id for task in tasks_query if task.interval_id and task.start]
 
@@ -130,115 +166,50 @@ def get_calendar_events(start=None, end=None, user_id=None):
         overrides = []
     override_map = {(o.task_id, o.date): o for o in overrides}
 
-    # Collect overrides that are redundant and should be removed. We will
-    # delete them in a single batch commit after building the event list to
-    # avoid commits during the read loop which can cause spikes in latency.
-    overrides_to_delete = []
+    # Вхождения всех серий в окне разворачиваются одним пакетом
+    occurrences_by_task = {}
+    if start_dt and end_dt and recurring_task_ids:
+        recurring_tasks = [task for task in tasks_query if task.interval_id and task.start]
+        occurrences_by_task = dict(zip(
+            recurring_task_ids,
+            occurrence_cache.occurrences_many(
+                recurring_tasks, [start_dt - task.series_duration() for task in recurring_tasks], end_dt
+            ),
+        ))
 
     for task in tasks_query:
+        task_dict = task_dicts[task.id]
         if task.interval_id and task.start:
-            parent_tasks.append(task.to_dict())
+            parent_tasks.append(task_dict)
+            template = _instance_template(task_dict)
 
-            rule = task.build_rrule()
-            if task.end and task.start:
-                duration = task.end - task.start
-                if duration.total_seconds() <= 0:
-                    duration = timedelta(hours=1)
+            duration = task.series_duration()
+            if start_dt and end_dt:
+                occurrences = occurrences_by_task[task.id]
             else:
-                duration = timedelta(hours=1)
-
-            rng_start = start_dt or datetime.min.replace(tzinfo=None)
-            rng_end = end_dt or datetime.max.replace(tzinfo=None)
-            occurrences = rule.between(rng_start - duration, rng_end, inc=True) if rule else []
+                # Неограниченный диапазон не делится на окна — считаем напрямую
+                rule = task.build_rrule()
+                rng_start = start_dt or datetime.min.replace(tzinfo=None)
+                rng_end = end_dt or datetime.max.replace(tzinfo=None)
+                occurrences = rule.between(rng_start - duration, rng_end, inc=True) if rule else []
 
             for occ in occurrences:
-                occ_end = occ + duration
-                # occ_date = occ.date()
-                occ_date = datetime(occ.year, occ.month, occ.day).date()
-
-
+                occ_date = occ.date()
                 override = override_map.get((task.id, occ_date))
 
-                def build_instance(base_data, is_override=False, override_id=None):
-                    instance = dict(base_data)
-                    # Use start/end from override data if provided, otherwise fall back
-                    start_val = base_data.get('start')
-                    end_val = base_data.get('end')
-                    instance['start'] = occ.isoformat() + 'Z'
-                    instance['end'] = occ_end.isoformat() + 'Z'
-                    instance['is_override'] = is_override
-                    instance['parent_task_id'] = task.id
-                    instance['is_instance'] = True
-                    if override_id:
-                        instance['override_id'] = override_id
-                        instance['id'] = f"override_{override_id}"
-                    else:
-                        instance['id'] = f"instance_{task.id}_{occ_date.isoformat()}"
-                    instance['range'] = {
-                        'start': occ.isoformat() + 'Z' if occ else None,
-                        'end': occ_end.isoformat() + 'Z' if occ_end else None,
-                    }
-                    return instance
-
-                if override:
-                    # Check redundancy WITHOUT deleting. If redundant, mark
-                    # for deletion and treat as non-override instance.
-                    redundant = True
-                    fields = [
-                        'title', 'start', 'end', 'note', 'status_id', 'completed_at', 'color', 'priority_id', 'type_id'
-                    ]
-                    task_dict = task.to_dict()
-                    override_data = override.data or {}
-                    for field in fields:
-                        val_override = override_data.get(field)
-                        val_task = task_dict.get(field)
-                        if field in ('start', 'end'):
-                            if val_override and val_task:
-                                try:
-                                    t_override = datetime.fromisoformat(val_override.replace('Z', '')).time()
-                                    t_task = datetime.fromisoformat(val_task.replace('Z', '')).time()
-                                except Exception:
-                                    redundant = False
-                                    break
-                                if t_override != t_task:
-                                    redundant = False
-                                    break
-                            elif val_override != val_task:
-                                redundant = False
-                                break
-                        else:
-                            if val_override != val_task:
-                                redundant = False
-                                break
-
-                    if redundant:
-                        overrides_to_delete.append(override)
-                        events.append(build_instance(task.to_dict(), is_override=False))
-                        continue
-
+                # Избыточный override показывается как обычный экземпляр;
+                # удаляет его фоновая компактизация (maintenance.compact_overrides)
+                if override and not _is_redundant_override(override.data or {}, task_dict):
                     if override.type == 'skip':
                         continue
-                    elif override.type == 'modified':
-                        merged_data = {**task.to_dict(), **(override.data or {})}
-                        events.append(build_instance(merged_data, is_override=True, override_id=override.id))
+                    if override.type == 'modified':
+                        events.append(_build_instance(template, occ, occ + duration, f"override_{override.id}", override))
                         continue
 
-                events.append(build_instance(task.to_dict(), is_override=False))
+                events.append(_build_instance(template, occ, occ + duration, f"instance_{task.id}_{occ_date.isoformat()}"))
         else:
             if _is_task_in_range(task, start_dt, end_dt, is_events=True):
-                events.append(task.to_dict())
-
-
-    # Remove redundant overrides in a single batch commit to avoid
-    # write spikes during the read path.
-    if overrides_to_delete:
-        try:
-            for ov in overrides_to_delete:
-                db.session.delete(ov)
-            db.session.commit()
-        except Exception:
-            db.session.rollback()
-            current_app.logger.exception('Failed to delete redundant overrides')
+                events.append(task_dict)
 
     return {
         'events': events,
@@ -270,6 +241,7 @@ def patch_instance_handler(data, user_id):
     parent_task = Task.query.filter_by(id=task_id, user_id=user_id).first()
     if not parent_task:
         return {'success': False, 'message': 'Parent task not found'}, 404
+    occurrence_cache.invalidate(task_id)
     override = TaskOverride.query.filter_by(task_id=task_id, user_id=user_id, date=date).first()
     parent_data = parent_task.to_dict()
     # Только разрешённые поля (можно расширить список)
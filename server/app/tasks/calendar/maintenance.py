@@ -0,0 +1,85 @@
+"""Фоновая компактизация переопределений экземпляров повторяющихся задач."""
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.maintenance import maintenance_job
+from ..models import Task
+from .models import TaskOverride
+from .handlers import _is_redundant_override
+from .recurrence import expand_occurrences
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _orphaned_ids(overrides, tasks):
+    """
+    Override без действующей серии: родитель удалён, больше не повторяется
+    или дата override не является вхождением серии (вне её диапазона или
+    после смены правила).
+    """
+    orphaned = set()
+    checked, lows, highs, owners = [], [], [], []
+    for override in overrides:
+        task = tasks.get(override.task_id)
+        if task is None or task.user_id != override.user_id or not (task.interval_id and task.start):
+            orphaned.add(override.id)
+            continue
+        day = datetime(override.date.year, override.date.month, override.date.day)
+        checked.append(task)
+        lows.append(day)
+        highs.append(day + timedelta(days=1) - timedelta(microseconds=1))
+        owners.append(override.id)
+
+    for override_id, occurrences in zip(owners, expand_occurrences(checked, lows, highs)):
+        if not occurrences:
+            orphaned.add(override_id)
+    return orphaned
+
+
+@maintenance_job('compact_overrides', 'OVERRIDE_COMPACTION_INTERVAL')
+def compact_overrides(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Удаляет избыточные (совпадающие с родительской задачей) и осиротевшие
+    override. Таблица просматривается пакетами по id, каждый пакет — отдельная
+    транзакция, поэтому чтение календаря не блокируется надолго.
+    """
+    stats = {'scanned': 0, 'redundant': 0, 'orphaned': 0}
+    last_id = 0
+    while True:
+        overrides = (
+            TaskOverride.query
+            .filter(TaskOverride.id > last_id)
+            .order_by(TaskOverride.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not overrides:
+            break
+        last_id = overrides[-1].id
+        stats['scanned'] += len(overrides)
+
+        task_ids = {override.task_id for override in overrides}
+        task_list = Task.query.filter(Task.id.in_(task_ids)).all()
+        tasks = {task.id: task for task in task_list}
+        task_dicts = dict(zip((task.id for task in task_list), Task.to_dict_many(task_list)))
+
+        orphaned = _orphaned_ids(overrides, tasks)
+        redundant = {
+            override.id for override in overrides
+            if override.id not in orphaned and _is_redundant_override(override.data or {}, task_dicts[override.task_id])
+        }
+        stale_ids = orphaned | redundant
+        if stale_ids:
+            TaskOverride.query.filter(TaskOverride.id.in_(stale_ids)).delete(synchronize_session=False)
+        db.session.commit()
+        stats['orphaned'] += len(orphaned)
+        stats['redundant'] += len(redundant)
+
+        if len(overrides) < batch_size:
+            break
+
+    current_app.logger.info(f'compact_overrides {stats}')
+    return stats
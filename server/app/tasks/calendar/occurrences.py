@@ -0,0 +1,143 @@
+"""
+Кэш развёрнутых вхождений повторяющихся задач.
+
+Вхождения серии хранятся по месячным окнам с ключом
+``(task_id, revision, month)``, где ``revision`` — параметры правила
+повторения задачи. Изменение правила меняет ключ, поэтому устаревшие
+окна не используются даже в другом процессе, а в своём процессе
+``edit_task`` и ``patch_instance_handler`` дополнительно удаляют их явно.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from .recurrence import expand_occurrences
+
+DEFAULT_MAXSIZE = 16384
+
+
+def _month_start(dt):
+    return datetime(dt.year, dt.month, 1)
+
+
+def _next_month(month):
+    if month.month == 12:
+        return datetime(month.year + 1, 1, 1)
+    return datetime(month.year, month.month + 1, 1)
+
+
+def task_revision(task):
+    """Ревизия серии — всё, от чего зависят вхождения правила."""
+    return (task.interval_id, task.start, task.end, task.is_infinite)
+
+
+class OccurrenceCache:
+    """LRU-кэш вхождений серий по месячным окнам."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._keys_by_task = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        with self._lock:
+            occurrences = self._entries.get(key)
+            if occurrences is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return occurrences
+
+    def _put(self, key, occurrences):
+        with self._lock:
+            self._entries[key] = occurrences
+            self._entries.move_to_end(key)
+            self._keys_by_task.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, _ = self._entries.popitem(last=False)
+                task_keys = self._keys_by_task.get(old_key[0])
+                if task_keys is not None:
+                    task_keys.discard(old_key)
+                    if not task_keys:
+                        del self._keys_by_task[old_key[0]]
+
+    def invalidate(self, task_id):
+        """Удаляет все окна задачи."""
+        with self._lock:
+            for key in self._keys_by_task.pop(task_id, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_task.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def occurrences(self, task, range_start, range_end):
+        """
+        Вхождения серии в интервале [range_start, range_end] включительно —
+        то же, что ``task.build_rrule().between(range_start, range_end, inc=True)``.
+        """
+        return self.occurrences_many([task], [range_start], range_end)[0]
+
+    def occurrences_many(self, tasks, range_starts, range_end):
+        """
+        Вхождения нескольких серий: для tasks[i] — в [range_starts[i], range_end].
+        Недостающие окна всех задач разворачиваются одним пакетом.
+        """
+        plans = []
+        fill_plans, fill_tasks, fill_lows, fill_highs = [], [], [], []
+        for task, range_start in zip(tasks, range_starts):
+            revision = task_revision(task)
+            months = []
+            month = _month_start(range_start)
+            while month <= range_end:
+                months.append(month)
+                month = _next_month(month)
+            buckets = {month: self._get((task.id, revision, month)) for month in months}
+            plan = (task, revision, range_start, months, buckets)
+            plans.append(plan)
+
+            missing = [month for month in months if buckets[month] is None]
+            if missing:
+                fill_plans.append((plan, missing))
+                fill_tasks.append(task)
+                fill_lows.append(missing[0])
+                fill_highs.append(_next_month(missing[-1]))
+
+        if fill_tasks:
+            expanded = expand_occurrences(fill_tasks, fill_lows, fill_highs)
+            for (plan, missing), task_occurrences in zip(fill_plans, expanded):
+                task, revision, _, _, buckets = plan
+                fresh = {month: [] for month in missing}
+                for occ in task_occurrences:
+                    bucket = fresh.get(_month_start(occ))
+                    if bucket is not None:
+                        bucket.append(occ)
+                for month, bucket in fresh.items():
+                    buckets[month] = tuple(bucket)
+                    self._put((task.id, revision, month), buckets[month])
+
+        results = []
+        for task, revision, range_start, months, buckets in plans:
+            result = []
+            for month in months:
+                bucket = buckets[month]
+                if month >= range_start and _next_month(month) <= range_end:
+                    result.extend(bucket)
+                else:
+                    result.extend(occ for occ in bucket if range_start <= occ <= range_end)
+            results.append(result)
+        return results
+
+
+occurrence_cache = OccurrenceCache()
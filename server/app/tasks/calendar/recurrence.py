@@ -0,0 +1,131 @@
+"""
+Векторизованное разворачивание повторяющихся задач.
+
+Интервалы 1-5 из ``Task.build_rrule`` (день, неделя, месяц, год и рабочие
+дни ПН-ПТ) — арифметические последовательности, поэтому вхождения сразу
+для многих задач считаются на NumPy через ``datetime64``. Результат совпадает
+с ``task.build_rrule().between(low, high, inc=True)``; всё, что не укладывается
+в эти правила (или отсутствие NumPy), разворачивается через dateutil.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy указан в requirements.txt
+    np = None
+
+DAILY_ID, WEEKLY_ID, MONTHLY_ID, YEARLY_ID, WORKDAYS_ID = 1, 2, 3, 4, 5
+VECTORIZED_INTERVALS = (DAILY_ID, WEEKLY_ID, MONTHLY_ID, YEARLY_ID, WORKDAYS_ID)
+
+_US_PER_DAY = 86_400_000_000
+
+
+def _is_vectorizable(task):
+    return np is not None and task.interval_id in VECTORIZED_INTERVALS and task.start is not None
+
+
+def _until(task):
+    """Граница серии так же, как в ``Task.build_rrule``."""
+    return task.end if not task.is_infinite else None
+
+
+def _flat_ranges(first, counts):
+    """
+    Для каждой задачи i — последовательность first[i], first[i]+1, ... длиной counts[i].
+    Возвращает (индексы задач, значения) одним плоским массивом.
+    """
+    counts = np.maximum(counts, 0)
+    owners = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, first[owners] + offsets
+
+
+def _expand_step(start, low, high, step_days):
+    """Вхождения start + k * step_days дней, k >= 0, в [low, high]."""
+    step = step_days * _US_PER_DAY
+    first = np.maximum(0, -((start - low) // step))
+    last = (high - start) // step
+    owners, k = _flat_ranges(first, last - first + 1)
+    return owners, start[owners] + k * step
+
+
+def _expand_months(start, low, high, month_step):
+    """
+    Вхождения в тот же день месяца и время каждые month_step месяцев начиная
+    с месяца start; месяцы без такого дня пропускаются, как в rrule.
+    """
+    start_month = start.astype('datetime64[us]').astype('datetime64[M]')
+    day_offset = start - start_month.astype('datetime64[us]').astype(np.int64)
+    start_month = start_month.astype(np.int64)
+    low_month = low.astype('datetime64[us]').astype('datetime64[M]').astype(np.int64)
+    high_month = high.astype('datetime64[us]').astype('datetime64[M]').astype(np.int64)
+
+    first = np.maximum(0, -((start_month - low_month) // month_step))
+    last = (high_month - start_month) // month_step
+    owners, k = _flat_ranges(first, last - first + 1)
+    months = start_month[owners] + k * month_step
+
+    month_us = months.astype('datetime64[M]').astype('datetime64[us]').astype(np.int64)
+    next_month_us = (months + 1).astype('datetime64[M]').astype('datetime64[us]').astype(np.int64)
+    occurrences = month_us + day_offset[owners]
+    valid = (occurrences < next_month_us) & (occurrences >= low[owners]) & (occurrences <= high[owners])
+    return owners[valid], occurrences[valid]
+
+
+def _expand_group(interval_id, start, low, high):
+    if interval_id == DAILY_ID:
+        return _expand_step(start, low, high, 1)
+    if interval_id == WEEKLY_ID:
+        return _expand_step(start, low, high, 7)
+    if interval_id == MONTHLY_ID:
+        return _expand_months(start, low, high, 1)
+    if interval_id == YEARLY_ID:
+        return _expand_months(start, low, high, 12)
+    # Рабочие дни: ежедневная последовательность без субботы и воскресенья
+    owners, occurrences = _expand_step(start, low, high, 1)
+    weekday = (occurrences // _US_PER_DAY + 3) % 7  # 1970-01-01 — четверг
+    workday = weekday < 5
+    return owners[workday], occurrences[workday]
+
+
+def _to_us(values):
+    return np.array(values, dtype='datetime64[us]').astype(np.int64)
+
+
+def expand_occurrences(tasks, lows, highs):
+    """
+    Вхождения каждой задачи в её окне [lows[i], highs[i]] включительно.
+
+    Возвращает список списков ``datetime`` в порядке ``tasks``.
+    """
+    results = [None] * len(tasks)
+    groups = {}
+    for index, task in enumerate(tasks):
+        if _is_vectorizable(task):
+            groups.setdefault(task.interval_id, []).append(index)
+        else:
+            rule = task.build_rrule()
+            results[index] = rule.between(lows[index], highs[index], inc=True) if rule else []
+
+    for interval_id, indexes in groups.items():
+        # rrule отбрасывает микросекунды dtstart
+        start = _to_us([tasks[i].start.replace(microsecond=0) for i in indexes])
+        low = _to_us([lows[i] for i in indexes])
+        high = _to_us([highs[i] for i in indexes])
+        until = [_until(tasks[i]) for i in indexes]
+        has_until = np.array([value is not None for value in until])
+        if has_until.any():
+            until_us = _to_us([value if value is not None else highs[i] for value, i in zip(until, indexes)])
+            high = np.where(has_until, np.minimum(high, until_us), high)
+
+        owners, occurrences = _expand_group(interval_id, start, low, high)
+        # owners отсортированы, поэтому вхождения задачи — непрерывный срез
+        values = occurrences.astype('datetime64[us]').tolist()
+        bounds = np.searchsorted(owners, np.arange(len(indexes) + 1)).tolist()
+        for position, index in enumerate(indexes):
+            results[index] = values[bounds[position]:bounds[position + 1]]
+    return results
+
+
+def occurrences_between(task, low, high):
+    """Вхождения одной задачи в [low, high] — замена ``rule.between(low, high, inc=True)``."""
+    return expand_occurrences([task], [low], [high])[0]
@@ -16,7 +16,7 @@ from app import cache
 
 def make_cache_key(prefix):
     def _key():
-        version = DataVersion.get_version('tasksVersion')
+        version = DataVersion.get_version(current_user.id, 'tasksVersion')
         return f"{prefix}:{current_user.id}:{version}:{request.full_path}"
     return _key
 
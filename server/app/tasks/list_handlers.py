@@ -3,13 +3,24 @@ import time
 from datetime import datetime
 import pytz
 
-from .models import db, List, Group, Project, Task
-from sqlalchemy import func, and_
+from .models import (
+    db, List, Group, Project, Task,
+    task_list_relations, list_group_relations, list_project_relations, group_project_relations,
+)
+from sqlalchemy import func, and_, or_
 from .calendar.handlers import get_calendar_events
 from .utils import _parse_iso_datetime
 from .task_handlers import get_tasks
 
 
+DEFAULT_LIST_TITLES = {
+    'my_day': 'Мой день',
+    'tasks': 'Задачи',
+    'important': 'Важные',
+    'background': 'Фоновые задачи',
+}
+
+
 def get_lists_and_groups_data(client_timezone='UTC', user_id=None):
     start_time = time.perf_counter()
     # current_app.logger.info(f"PERF (user:{user_id}): get_lists_and_groups_data started.")
@@ -124,12 +135,14 @@ def get_lists_and_groups_data(client_timezone='UTC', user_id=None):
 
     # --- Default lists с использованием предварительно посчитанных значений
     default_lists = []
-    for list_id, title, task_ids in [
-        ('my_day', 'Мой день', [t.get('id') for t in my_day_tasks if t.get('id')]),
-        ('tasks', 'Задачи', tasks_without_lists_ids),
-        ('important', 'Важные', important_tasks_ids),
-        ('background', 'Фоновые задачи', background_tasks_ids),
-    ]:
+    default_lists_task_ids = {
+        'my_day': [t.get('id') for t in my_day_tasks if t.get('id')],
+        'tasks': tasks_without_lists_ids,
+        'important': important_tasks_ids,
+        'background': background_tasks_ids,
+    }
+    for list_id, title in DEFAULT_LIST_TITLES.items():
+        task_ids = default_lists_task_ids[list_id]
         unfinished = default_lists_unfinished_map.get(list_id, 0)
         if list_id == 'my_day':
             # Для "Мой день" по-прежнему нужны полные данные задач для подсчета незавершенных
@@ -197,6 +210,189 @@ def get_lists_and_groups_data(client_timezone='UTC', user_id=None):
     }
 
 
+def _my_day_window(client_timezone='UTC'):
+    """Границы текущего дня в часовом поясе клиента (naive UTC), как в get_tasks('my_day')."""
+    try:
+        tz = pytz.timezone(client_timezone or 'UTC')
+    except Exception:
+        tz = pytz.UTC
+    now = datetime.now(tz)
+    start_dt = tz.localize(datetime(now.year, now.month, now.day, 0, 0, 0))
+    end_dt = tz.localize(datetime(now.year, now.month, now.day, 23, 59, 59, 999999))
+    return (start_dt.astimezone(pytz.UTC).replace(tzinfo=None),
+            end_dt.astimezone(pytz.UTC).replace(tzinfo=None))
+
+
+def _default_lists_membership(start_dt, end_dt):
+    """
+    SQL-условия принадлежности задачи к стандартным спискам.
+    "Мой день" повторяет выборку get_calendar_events: повторяющиеся задачи
+    (родительские), чья серия пересекает текущий день, и обычные задачи,
+    пересекающие текущий день.
+    """
+    return {
+        'my_day': or_(
+            and_(
+                Task.interval_id.isnot(None),
+                Task.series_start <= end_dt,
+                or_(Task.series_end == None, Task.series_end >= start_dt),
+            ),
+            and_(
+                Task.interval_id.is_(None),
+                Task.start.isnot(None),
+                func.coalesce(Task.end, Task.start) >= start_dt,
+                Task.start <= end_dt,
+            ),
+        ),
+        'tasks': and_(~Task.lists.any(), ~Task.parent_tasks.any()),
+        'important': Task.is_important == True,
+        'background': Task.is_background == True,
+    }
+
+
+def get_default_lists_counts(user_id, client_timezone='UTC'):
+    """Количество незавершённых задач в стандартных списках одним запросом."""
+    membership = _default_lists_membership(*_my_day_window(client_timezone))
+    row = (
+        db.session.query(*[
+            func.count(Task.id).filter(and_(clause, Task.is_completed == False)).label(list_id)
+            for list_id, clause in membership.items()
+        ])
+        .filter(Task.user_id == user_id)
+        .first()
+    )
+    return {list_id: getattr(row, list_id) or 0 for list_id in membership}
+
+
+def get_default_list_data(list_id, user_id, client_timezone='UTC'):
+    """Стандартный список (счетчик и childes_order) без полного пересчета боковой панели."""
+    start_dt, end_dt = _my_day_window(client_timezone)
+    clause = _default_lists_membership(start_dt, end_dt)[list_id]
+    rows = (
+        db.session.query(Task.id, Task.is_completed)
+        .filter(Task.user_id == user_id, clause)
+        .order_by(Task.id.desc())
+        .all()
+    )
+    return {
+        'id': list_id,
+        'title': DEFAULT_LIST_TITLES[list_id],
+        'type': 'list',
+        'unfinished_tasks_count': sum(1 for row in rows if not row.is_completed),
+        'childes_order': [row.id for row in rows],
+    }
+
+
+def _containers_counts(list_ids):
+    """Пересчитанные счетчики групп и проектов, в которые входят списки list_ids."""
+    if not list_ids:
+        return {}, {}
+    group_ids = {
+        group_id for (group_id,) in db.session.query(list_group_relations.c.GroupID)
+        .filter(list_group_relations.c.ListID.in_(list_ids))
+    }
+    project_ids = {
+        project_id for (project_id,) in db.session.query(list_project_relations.c.ProjectID)
+        .filter(list_project_relations.c.ListID.in_(list_ids))
+    }
+    if group_ids:
+        project_ids |= {
+            project_id for (project_id,) in db.session.query(group_project_relations.c.ProjectID)
+            .filter(group_project_relations.c.GroupID.in_(group_ids))
+        }
+
+    groups_counts = {}
+    if group_ids:
+        groups_counts = dict.fromkeys(group_ids, 0)
+        groups_counts.update(
+            db.session.query(list_group_relations.c.GroupID, func.sum(List.unfinished_count))
+            .join(List, List.id == list_group_relations.c.ListID)
+            .filter(list_group_relations.c.GroupID.in_(group_ids))
+            .group_by(list_group_relations.c.GroupID)
+            .all()
+        )
+
+    projects_counts = {}
+    if project_ids:
+        projects_counts = dict.fromkeys(project_ids, 0)
+        direct_lists = (
+            db.session.query(list_project_relations.c.ProjectID, func.sum(List.unfinished_count))
+            .join(List, List.id == list_project_relations.c.ListID)
+            .filter(list_project_relations.c.ProjectID.in_(project_ids))
+            .group_by(list_project_relations.c.ProjectID)
+        )
+        via_groups = (
+            db.session.query(group_project_relations.c.ProjectID, func.sum(List.unfinished_count))
+            .join(list_group_relations, list_group_relations.c.GroupID == group_project_relations.c.GroupID)
+            .join(List, List.id == list_group_relations.c.ListID)
+            .filter(group_project_relations.c.ProjectID.in_(project_ids))
+            .group_by(group_project_relations.c.ProjectID)
+        )
+        for project_id, count in list(direct_lists) + list(via_groups):
+            projects_counts[project_id] += int(count or 0)
+
+    return ({group_id: int(count or 0) for group_id, count in groups_counts.items()},
+            projects_counts)
+
+
+def get_lists_delta(user_id, task_ids=(), list_ids=None, client_timezone='UTC'):
+    """
+    Компактный патч боковой панели после изменения задач task_ids.
+
+    Вместо полного пересчета get_lists_and_groups_data возвращает только то,
+    что могло измениться: затронутые списки (счетчики и childes_order),
+    счетчики их групп и проектов, счетчики стандартных списков и
+    принадлежность самих задач к стандартным спискам. Если list_ids не
+    переданы, затронутыми считаются списки, в которых сейчас лежат задачи.
+    """
+    if user_id is None:
+        raise ValueError("user_id must be provided for get_lists_delta")
+    task_ids = [task_id for task_id in task_ids if task_id]
+
+    if list_ids is None:
+        list_ids = [
+            list_id for (list_id,) in db.session.query(task_list_relations.c.ListID)
+            .filter(task_list_relations.c.TaskID.in_(task_ids))
+            .distinct()
+        ] if task_ids else []
+    list_ids = list(dict.fromkeys(list_ids))
+
+    lists = List.query.filter(List.id.in_(list_ids), List.user_id == user_id).all() if list_ids else []
+    groups_counts, projects_counts = _containers_counts([lst.id for lst in lists])
+    default_counts = get_default_lists_counts(user_id, client_timezone)
+
+    # Задачи, которых больше нет (удалены), не входят ни в один стандартный список
+    memberships = {task_id: [] for task_id in task_ids}
+    if task_ids:
+        membership = _default_lists_membership(*_my_day_window(client_timezone))
+        rows = (
+            db.session.query(Task.id, *[clause.label(list_id) for list_id, clause in membership.items()])
+            .filter(Task.id.in_(task_ids), Task.user_id == user_id)
+            .all()
+        )
+        for row in rows:
+            memberships[row.id] = [list_id for list_id in membership if getattr(row, list_id)]
+
+    return {
+        'lists': [
+            {
+                'id': lst.id,
+                'childes_order': lst.childes_order,
+                'unfinished_tasks_count': lst.unfinished_count,
+                'important_tasks_count': lst.important_count,
+                'background_tasks_count': lst.background_count,
+            }
+            for lst in lists
+        ],
+        'groups': [{'id': group_id, 'unfinished_tasks_count': count} for group_id, count in groups_counts.items()],
+        'projects': [{'id': project_id, 'unfinished_tasks_count': count} for project_id, count in projects_counts.items()],
+        'default_lists': [
+            {'id': list_id, 'unfinished_tasks_count': default_counts[list_id]} for list_id in DEFAULT_LIST_TITLES
+        ],
+        'memberships': memberships,
+    }
+
+
 def add_object(data, user_id=None):
     object_type = data.get('type', '')
     object_order = data.get('order', -1)
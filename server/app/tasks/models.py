@@ -3,12 +3,12 @@ from dateutil.rrule import rrule, rruleset, WEEKLY, DAILY, MONTHLY, YEARLY, MO,
 from flask import current_app
 from flask_jwt_extended import current_user
 from sqlalchemy.orm import joinedload
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
 import hashlib
 import json
 import random
 import uuid
-from sqlalchemy import or_, and_, Index
+from sqlalchemy import or_, and_, Index, select, text
 
 from app import db
 
@@ -17,18 +17,22 @@ print("Определяем task_subtasks_relations")
 task_subtasks_relations = db.Table('task_subtasks_relations',
                                    db.Column('TaskID', db.String(36), db.ForeignKey('productivity.tasks.TaskID'), primary_key=True),
                                    db.Column('SubtaskID', db.String(36), db.ForeignKey('productivity.tasks.TaskID'), primary_key=True),
+                                   # Обратная сторона связи: ~Task.parent_tasks.any()
+                                   Index('ix_task_subtasks_relations_subtask_task', 'SubtaskID', 'TaskID'),
                                    schema='productivity')
 
 # Вспомогательные таблицы для связи между задачами и проектами
 task_project_relations = db.Table('task_project_relations',
                                   db.Column('TaskID', db.String(36), db.ForeignKey('productivity.tasks.TaskID'), primary_key=True),
                                   db.Column('ProjectID', db.String(36), db.ForeignKey('productivity.projects.ProjectID'), primary_key=True),
+                                  Index('ix_task_project_relations_project_task', 'ProjectID', 'TaskID'),
                                   schema='productivity')
 
 # Вспомогательные таблицы для связи между списками и проектами
 list_project_relations = db.Table('list_project_relations',
                                   db.Column('ListID', db.String(36), db.ForeignKey('productivity.lists.ListID'), primary_key=True),
                                   db.Column('ProjectID', db.String(36), db.ForeignKey('productivity.projects.ProjectID'), primary_key=True),
+                                  Index('ix_list_project_relations_project_list', 'ProjectID', 'ListID'),
                                   schema='productivity')
 
 group_project_relations = db.Table('group_project_relations',
@@ -40,76 +44,76 @@ group_project_relations = db.Table('group_project_relations',
 task_list_relations = db.Table('task_list_relations',
                                db.Column('TaskID', db.String(36), db.ForeignKey('productivity.tasks.TaskID'), primary_key=True),
                                db.Column('ListID', db.String(36), db.ForeignKey('productivity.lists.ListID'), primary_key=True),
+                               # Задачи списка: первичный ключ начинается с TaskID
+                               Index('ix_task_list_relations_list_task', 'ListID', 'TaskID'),
                                schema='productivity')
 
 # Вспомогательные таблицы для связи между списками и группами
 list_group_relations = db.Table('list_group_relations',
                                 db.Column('ListID', db.String(36), db.ForeignKey('productivity.lists.ListID'), primary_key=True),
                                 db.Column('GroupID', db.String(36), db.ForeignKey('productivity.groups.GroupID'), primary_key=True),
+                                Index('ix_list_group_relations_group_list', 'GroupID', 'ListID'),
                                 schema='productivity')
 
 
 class DataVersion(db.Model):
+    """Монотонно растущие счётчики версий данных, отдельные для каждого пользователя и ключа."""
     __tablename__ = 'data_versions'
     __table_args__ = {'schema': 'productivity'}
-    
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    version_metadata = db.Column(db.JSON, default={})
+
+    user_id = db.Column(db.String(36), primary_key=True)
+    key = db.Column('version_key', db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     @classmethod
-    def get_version(cls, key='version'):
-        version_record = cls.query.first()
-        if not version_record:
-            version_record = cls(version_metadata={})
-            db.session.add(version_record)
-            db.session.commit()
-        # Исправление: если version_metadata None, сделать его словарём
-        if version_record.version_metadata is None:
-            version_record.version_metadata = {}
-        if key not in version_record.version_metadata:
-            version_record.version_metadata[key] = str(uuid.uuid4())
-            db.session.commit()
-        return version_record.version_metadata.get(key)
+    def get_version(cls, user_id, key='version'):
+        """Текущая версия ключа пользователя; 0, если данные ещё не менялись."""
+        version = db.session.execute(
+            select(cls.version).where(cls.user_id == str(user_id), cls.key == key)
+        ).scalar()
+        return version or 0
 
     @classmethod
-    def check_version(cls, key, client_version):
-        version_record = cls.query.first()
-        if not version_record:
-            version_record = cls(version_metadata={})
-            db.session.add(version_record)
-            db.session.commit()
-        if key not in version_record.version_metadata:
-            version_record.version_metadata[key] = str(uuid.uuid4())
-            db.session.commit()
-        current = version_record.version_metadata[key]
+    def get_versions(cls, user_id, keys):
+        """Версии нескольких ключей пользователя одним запросом."""
+        rows = db.session.execute(
+            select(cls.key, cls.version).where(cls.user_id == str(user_id), cls.key.in_(keys))
+        ).all()
+        versions = dict.fromkeys(keys, 0)
+        versions.update({key: version for key, version in rows})
+        return versions
+
+    @classmethod
+    def check_version(cls, user_id, key, client_version):
+        current = cls.get_version(user_id, key)
         return {
             'version': current,
-            'has_changed': current != client_version
+            'has_changed': str(current) != str(client_version)
         }
 
     @classmethod
-    def update_version(cls, key='version'):
-        version_record = cls.query.first()
-        if not version_record:
-            version_record = cls(version_metadata={})
-            db.session.add(version_record)
-        new_version = str(uuid.uuid4())
-        version_record.version_metadata[key] = new_version
-        from sqlalchemy.orm.attributes import flag_modified
-        flag_modified(version_record, "version_metadata")
+    def update_version(cls, user_id, key='version'):
+        """Атомарно увеличивает версию ключа пользователя (upsert одним запросом) и возвращает новое значение."""
+        now = datetime.utcnow()
+        stmt = pg_insert(cls).values(user_id=str(user_id), key=key, version=1, updated_at=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.user_id, cls.key],
+            set_={'version': cls.version + 1, 'updated_at': now},
+        ).returning(cls.version)
+        new_version = db.session.execute(stmt).scalar_one()
         db.session.commit()
         return new_version
 
     @classmethod
-    def get_version_info(cls, key='version'):
+    def get_version_info(cls, user_id, key='version'):
         """Get detailed version information for the key."""
-        version_record = cls.query.first()
+        version_record = db.session.get(cls, (str(user_id), key))
         if not version_record:
             return None
 
         return {
-            'version': version_record.version_metadata.get(key),
+            'version': version_record.version,
             'updated_at': version_record.updated_at,
         }
 
@@ -240,7 +244,10 @@ class Status(db.Model):
 
 class Project(db.Model):
     __tablename__ = 'projects'
-    __table_args__ = {'schema': 'productivity'}
+    __table_args__ = (
+        Index('ix_projects_user_id', 'user_id'),
+        {'schema': 'productivity'}
+    )
     id = db.Column('ProjectID', db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), nullable=False)
     title = db.Column('ProjectName', db.String(255))
@@ -270,7 +277,10 @@ class Project(db.Model):
 
 class Group(db.Model):
     __tablename__ = 'groups'
-    __table_args__ = {'schema': 'productivity'}
+    __table_args__ = (
+        Index('ix_groups_user_id', 'user_id'),
+        {'schema': 'productivity'}
+    )
     id = db.Column('GroupID', db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), nullable=False)
     title = db.Column('GroupName', db.String(255))
@@ -296,7 +306,10 @@ class Group(db.Model):
 
 class List(db.Model):
     __tablename__ = 'lists'
-    __table_args__ = {'schema': 'productivity'}
+    __table_args__ = (
+        Index('ix_lists_user_id', 'user_id'),
+        {'schema': 'productivity'}
+    )
     id = db.Column('ListID', db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), nullable=False)
     title = db.Column('ListName', db.String(255))
@@ -329,7 +342,16 @@ class List(db.Model):
 
 class Task(db.Model):
     __tablename__ = 'tasks'
-    __table_args__ = {'schema': 'productivity'}
+    __table_args__ = (
+        Index('ix_tasks_user_series', 'user_id', 'SeriesStart', 'SeriesEnd'),
+        Index('ix_tasks_user_start', 'user_id', 'Start'),
+        # Частичные индексы для стандартных списков «Важные» и «Фоновые»
+        Index('ix_tasks_user_important_open', 'user_id',
+              postgresql_where=text('"IsImportant" AND NOT "IsCompleted"')),
+        Index('ix_tasks_user_background_open', 'user_id',
+              postgresql_where=text('"IsBackground" AND NOT "IsCompleted"')),
+        {'schema': 'productivity'}
+    )
     id = db.Column('TaskID', db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), nullable=False)
     title = db.Column('Title', db.String(255))
@@ -348,6 +370,10 @@ class Task(db.Model):
     priority_id = db.Column('PriorityID', db.Integer, db.ForeignKey('productivity.priorities.PriorityID'))
     interval_id = db.Column('IntervalID', db.Integer, db.ForeignKey('productivity.intervals.IntervalID'))
     is_infinite = db.Column('IsInfinite', db.Boolean, default=False)
+    # Границы серии для отбора повторяющихся задач по окну календаря (ведутся в update_series_bounds):
+    # первое вхождение и конец последнего вхождения; NULL в конце — бесконечная серия
+    series_start = db.Column('SeriesStart', db.DateTime)
+    series_end = db.Column('SeriesEnd', db.DateTime)
 
     status = db.relationship('Status', backref='tasks', foreign_keys=[status_id])
     priority = db.relationship('Priority', backref='tasks', foreign_keys=[priority_id])
@@ -369,14 +395,60 @@ class Task(db.Model):
             if type_obj:
                 type_data = type_obj.to_dict()
 
+        return self._serialize(type_data, [lst.id for lst in self.lists])
+
+    @classmethod
+    def to_dict_many(cls, tasks):
+        """
+        Сериализует список задач так же, как to_dict, но без запросов на каждую строку:
+        типы задач и id списков подгружаются одним запросом каждый.
+        """
+        tasks = list(tasks)
+        if not tasks:
+            return []
+
+        type_ids = {task.type_id for task in tasks if task.type_id}
+        types_data = {}
+        if type_ids:
+            types_data = {
+                type_obj.id: type_obj.to_dict()
+                for type_obj in TaskType.query.filter(TaskType.id.in_(type_ids)).all()
+            }
+
+        lists_ids = {task.id: [] for task in tasks}
+        rows = db.session.query(task_list_relations.c.TaskID, task_list_relations.c.ListID).filter(
+            task_list_relations.c.TaskID.in_(list(lists_ids))
+        )
+        for task_id, list_id in rows:
+            lists_ids[task_id].append(list_id)
+
+        return [task._serialize(types_data.get(task.type_id), lists_ids[task.id]) for task in tasks]
+
+    @classmethod
+    def iter_dicts(cls, user_id, batch_size=1000):
+        """
+        Все задачи пользователя в виде to_dict по одной: строки читаются курсором
+        на сервере пачками по batch_size, каждая пачка сериализуется to_dict_many.
+        """
+        query = (select(cls)
+                 .where(cls.user_id == user_id)
+                 .order_by(cls.id)
+                 .execution_options(yield_per=batch_size))
+        for batch in db.session.scalars(query).partitions():
+            yield from cls.to_dict_many(batch)
+
+    def _serialize(self, type_data, lists_ids):
+        start_iso = self.start.isoformat() + 'Z' if self.start else None
+        end_iso = self.end.isoformat() + 'Z' if self.end else None
+
         task_dict = {
             'id': self.id,
             'title': self.title,
-            'end': self.end.isoformat() + 'Z' if self.end else None,
-            'start': self.start.isoformat() + 'Z' if self.start else None,
+            'end': end_iso,
+            'start': start_iso,
             'range': {
-                'start': self.start.isoformat() + 'Z' if self.start else None,
-                'end': self.end.isoformat() + 'Z' if self.end else None,
+                'start': start_iso,
+                'end': end_iso,
             },
             'completed_at': self.completed_at.isoformat() + 'Z' if self.completed_at else None,
             'is_completed': self.is_completed,
@@ -392,13 +464,13 @@ class Task(db.Model):
             'type_id': self.type_id,
             'type': type_data,
             'color': self.color,  # '#008000' if self.status_id == 2 else self.color,
-            'lists_ids': [lst.id for lst in self.lists],
+            'lists_ids': lists_ids,
             # 'subtasks': [subtask.to_dict() for subtask in self.subtasks],
         }
         if self.is_background:
             task_dict['display'] = 'background'
-        if self.interval:
-            task_dict['rrule'] = self.get_rrule()
+        if self.interval_id:
+            task_dict['rrule'] = self._rrule_params(start_iso, end_iso)
             if self.start and self.end:
                 start_time = self.start.time()
                 end_time = self.end.time()
@@ -447,7 +519,35 @@ class Task(db.Model):
         return rrule(**kwargs)
     
 
+    def series_duration(self):
+        """Длительность экземпляра серии; по умолчанию — час."""
+        if self.end and self.start:
+            duration = self.end - self.start
+            if duration.total_seconds() > 0:
+                return duration
+        return timedelta(hours=1)
+
+    def update_series_bounds(self):
+        """
+        Пересчитывает series_start/series_end из параметров правила.
+        Конец серии — until из build_rrule плюс длительность экземпляра,
+        чтобы вхождение, начавшееся до окна, но пересекающее его, не отсекалось.
+        """
+        if not self.interval_id or not self.start:
+            self.series_start = None
+            self.series_end = None
+            return
+        self.series_start = self.start
+        until = self.end if not self.is_infinite else None
+        self.series_end = until + self.series_duration() if until else None
+
     def get_rrule(self):
+        return self._rrule_params(
+            self.start.isoformat() + 'Z' if self.start else None,
+            self.end.isoformat() + 'Z' if self.end else None,
+        )
+
+    def _rrule_params(self, start_iso, end_iso):
         if not self.interval_id or not self.start:
             return None
 
@@ -460,11 +560,11 @@ class Task(db.Model):
 
         rule_params = {
             'freq': interval_mapping.get(self.interval_id),
-            'dtstart': self.start.isoformat() + 'Z',
+            'dtstart': start_iso,
         }
 
         if not self.is_infinite:
-            rule_params['until'] = self.end.isoformat() + 'Z'
+            rule_params['until'] = end_iso
 
         if self.interval_id == 5:  # Если рабочие дни
             rule_params['freq'] = 'WEEKLY'  # Используем WEEKLY
@@ -473,3 +573,8 @@ class Task(db.Model):
         # Возвращаем строковое представление rrule
         return rule_params
 
+
+@db.event.listens_for(Task, 'before_insert')
+@db.event.listens_for(Task, 'before_update')
+def _sync_task_series_bounds(mapper, connection, task):
+    task.update_series_bounds()
@@ -6,6 +6,7 @@ import uuid
 from flask_jwt_extended import jwt_required
 from .list_handlers import (
     get_lists_and_groups_data,
+    get_lists_delta,
     get_lists_tree_data,
     add_object,
     edit_list,
@@ -28,15 +29,16 @@ from .entity_handlers import (
     link_items,
     move_items,
 )
-from .models import DataVersion, TaskTypeGroup, TaskType
+from .models import DataVersion, Task, TaskTypeGroup, TaskType
 from app import db, cache
+from app.export_utils import EXPORT_BATCH_SIZE, export_response
 from flask_jwt_extended import current_user
 from app.socketio_utils import notify_data_update, notify_task_change
 
 
 def make_cache_key(prefix, version_key='tasksVersion'):
     def _key():
-        version = DataVersion.get_version(version_key)
+        version = DataVersion.get_version(current_user.id, version_key)
         return f"{prefix}:{current_user.id}:{version}:{request.full_path}"
     return _key
 
@@ -58,10 +60,10 @@ def etag(version_key):
             if status_code >= 300:
                 return jsonify(data), status_code
 
-            version = DataVersion.get_version(version_key)
+            version = DataVersion.get_version(current_user.id, version_key)
             response = jsonify(data)
             if version is not None:
-                response.set_etag(version)
+                response.set_etag(str(version))
             
             # make_conditional вернет 304 Not Modified, если ETag совпадает
             return response.make_conditional(request)
@@ -103,9 +105,9 @@ def add_object_route():
     result, status_code = add_object(data, user_id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
     return response, status_code
 
 
@@ -119,13 +121,13 @@ def add_task_route():
     result, status_code = add_task(data, user_id, client_timezone)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
         if 'task' in result:
-            lists_data = get_lists_and_groups_data(user_id=user_id)
+            lists_delta = get_lists_delta(user_id, task_ids=[result['task']['id']], client_timezone=client_timezone)
             calendar_events = [result['task']]
-            notify_task_change('added', result['task'], data.get('listId'), lists_data=lists_data, calendar_events=calendar_events)
+            notify_task_change(user_id, 'added', result['task'], data.get('listId'), lists_delta=lists_delta, calendar_events=calendar_events)
     return response, status_code
 
 
@@ -149,9 +151,9 @@ def edit_list_route():
     result, status_code = edit_list(data, user_id=current_user.id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
     return response, status_code
 
 
@@ -163,9 +165,9 @@ def add_subtask_route():
     result, status_code = add_subtask(data, user_id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
     return response, status_code
 
 
@@ -177,13 +179,14 @@ def edit_task_route():
     result, status_code = edit_task(data, user_id=user_id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
         if 'task' in result:
-            lists_data = get_lists_and_groups_data(user_id=user_id)
+            client_timezone = request.headers.get('Time-Zone', 'UTC')
+            lists_delta = get_lists_delta(user_id, task_ids=[result['task']['id']], client_timezone=client_timezone)
             calendar_events = [result['task']]
-            notify_task_change('updated', result['task'], data.get('listId'), lists_data=lists_data, calendar_events=calendar_events)
+            notify_task_change(user_id, 'updated', result['task'], data.get('listId'), lists_delta=lists_delta, calendar_events=calendar_events)
     return response, status_code
 
 
@@ -195,20 +198,22 @@ def change_task_status_route():
     result, status_code = change_task_status(data, user_id=user_id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
-        lists_data = get_lists_and_groups_data(user_id=user_id)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
+        client_timezone = request.headers.get('Time-Zone', 'UTC')
         # Для календаря: если есть changed_ids, отправляем задачи по этим id
         calendar_events = None
         if 'changed_ids' in result:
             from .models import Task
             changed_tasks = Task.query.filter(Task.id.in_(result['changed_ids'])).all()
-            calendar_events = [t.to_dict() for t in changed_tasks]
-            notify_task_change('status_changed', {'changed_ids': result['changed_ids'], 'status_id': data.get('status_id'), 'completed_at': data.get('completed_at')}, data.get('listId'), lists_data=lists_data, calendar_events=calendar_events)
+            calendar_events = Task.to_dict_many(changed_tasks)
+            lists_delta = get_lists_delta(user_id, task_ids=result['changed_ids'], client_timezone=client_timezone)
+            notify_task_change(user_id, 'status_changed', {'changed_ids': result['changed_ids'], 'status_id': data.get('status_id'), 'completed_at': data.get('completed_at')}, data.get('listId'), lists_delta=lists_delta, calendar_events=calendar_events)
         elif 'task' in result:
             calendar_events = [result['task']]
-            notify_task_change('status_changed', result['task'], data.get('listId'), lists_data=lists_data, calendar_events=calendar_events)
+            lists_delta = get_lists_delta(user_id, task_ids=[result['task']['id']], client_timezone=client_timezone)
+            notify_task_change(user_id, 'status_changed', result['task'], data.get('listId'), lists_delta=lists_delta, calendar_events=calendar_events)
     return response, status_code
 
 
@@ -265,6 +270,25 @@ def get_tasks_by_ids_route():
     return result
 
 
+# Столбцы CSV-выгрузки задач; range, type и rrule записываются как JSON
+TASK_EXPORT_COLUMNS = [
+    'id', 'title', 'start', 'end', 'completed_at', 'is_completed', 'is_important', 'is_background',
+    'status_id', 'priority_id', 'interval_id', 'is_infinite', 'type_id', 'color', 'attachments', 'note',
+    'lists_ids', 'childes_order', 'rrule',
+]
+
+
+@to_do_app.route('/tasks/export', methods=['GET'])
+@jwt_required()
+def export_tasks_route():
+    """Потоковая выгрузка всех задач со списками: ?format=ndjson|csv"""
+    try:
+        return export_response(Task.iter_dicts(current_user.id, EXPORT_BATCH_SIZE),
+                               request.args.get('format', 'ndjson'), 'tasks', TASK_EXPORT_COLUMNS)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+
 @to_do_app.route('/tasks/del_task', methods=['DELETE'])
 @jwt_required()
 def del_task_route():
@@ -276,12 +300,14 @@ def del_task_route():
     result, status_code = del_task(data, user_id=user_id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
-        lists_data = get_lists_and_groups_data(user_id=user_id)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
+        client_timezone = request.headers.get('Time-Zone', 'UTC')
+        lists_delta = get_lists_delta(user_id, task_ids=[data.get('taskId')], list_ids=result.get('lists_ids', []),
+                                      client_timezone=client_timezone)
         calendar_events = [{'id': data.get('taskId'), 'deleted': True}]
-        notify_task_change('deleted', {'id': data.get('taskId')}, data.get('listId'), lists_data=lists_data, calendar_events=calendar_events)
+        notify_task_change(user_id, 'deleted', {'id': data.get('taskId')}, data.get('listId'), lists_delta=lists_delta, calendar_events=calendar_events)
     return response, status_code
 
 
@@ -293,9 +319,9 @@ def delete_from_childes_route():
     result, status_code = delete_from_childes(data, user_id=user_id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
     return response, status_code
 
 
@@ -307,9 +333,9 @@ def link_task_route():
     result, status_code = link_task(data, user_id=user_id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
     return response, status_code
 
 
@@ -323,9 +349,9 @@ def sort_items_route():
     result, status_code = sort_items(data, user_id=user_id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
     return response, status_code
 
 @to_do_app.route('/tasks/sort_items_in_container', methods=['PUT'])
@@ -336,9 +362,9 @@ def sort_items_in_container_route():
     result, status_code = sort_items_in_container(data, user_id=user_id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
     return response, status_code
 
 @to_do_app.route('/tasks/link_items', methods=['PUT'])
@@ -349,9 +375,9 @@ def link_items_route():
     result, status_code = link_items(data, user_id=user_id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
     return response, status_code
 
 @to_do_app.route('/tasks/move_items', methods=['PUT'])
@@ -362,9 +388,9 @@ def move_items_route():
     result, status_code = move_items(data, user_id=user_id)
     response = jsonify(result)
     if status_code == 200:
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
-        response.set_etag(new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
+        response.set_etag(str(new_version))
     return response, status_code
 
 
@@ -388,10 +414,10 @@ def add_to_general_list_route():
         db.session.add(entity)
         db.session.commit()
         
-        new_version = DataVersion.update_version('tasksVersion')
-        notify_data_update(tasksVersion=new_version)
+        new_version = DataVersion.update_version(current_user.id, 'tasksVersion')
+        notify_data_update(current_user.id, tasksVersion=new_version)
         response = jsonify({'success': True})
-        response.set_etag(new_version)
+        response.set_etag(str(new_version))
         return response, 200
     
     except Exception as e:
@@ -502,9 +528,9 @@ def add_task_type_group():
     )
     db.session.add(group)
     db.session.commit()
-    new_version = DataVersion.update_version('taskTypesVersion')
-    notify_data_update(taskTypesVersion=new_version)
-    return jsonify(group.to_dict()), 201, {'ETag': new_version}
+    new_version = DataVersion.update_version(current_user.id, 'taskTypesVersion')
+    notify_data_update(current_user.id, taskTypesVersion=new_version)
+    return jsonify(group.to_dict()), 201, {'ETag': str(new_version)}
 
 
 @to_do_app.route('/tasks/task_type_groups/<string:group_id>', methods=['PUT'])
@@ -520,9 +546,9 @@ def edit_task_type_group(group_id):
     group.is_active = data.get('is_active', group.is_active)
     group.description = data.get('description', group.description)
     db.session.commit()
-    new_version = DataVersion.update_version('taskTypesVersion')
-    notify_data_update(taskTypesVersion=new_version)
-    return jsonify(group.to_dict()), 200, {'ETag': new_version}
+    new_version = DataVersion.update_version(current_user.id, 'taskTypesVersion')
+    notify_data_update(current_user.id, taskTypesVersion=new_version)
+    return jsonify(group.to_dict()), 200, {'ETag': str(new_version)}
 
 
 @to_do_app.route('/tasks/task_type_groups/<string:group_id>', methods=['DELETE'])
@@ -533,9 +559,9 @@ def delete_task_type_group(group_id):
         return jsonify({'error': 'Not found'}), 404
     db.session.delete(group)
     db.session.commit()
-    new_version = DataVersion.update_version('taskTypesVersion')
-    notify_data_update(taskTypesVersion=new_version)
-    return jsonify({'result': 'deleted'}), 200, {'ETag': new_version}
+    new_version = DataVersion.update_version(current_user.id, 'taskTypesVersion')
+    notify_data_update(current_user.id, taskTypesVersion=new_version)
+    return jsonify({'result': 'deleted'}), 200, {'ETag': str(new_version)}
 
 
 @to_do_app.route('/tasks/task_types', methods=['GET'])
@@ -570,9 +596,9 @@ def add_task_type_route():
     )
     db.session.add(task_type)
     db.session.commit()
-    new_version = DataVersion.update_version('taskTypesVersion')
-    notify_data_update(taskTypesVersion=new_version)
-    return jsonify(task_type.to_dict()), 201, {'ETag': new_version}
+    new_version = DataVersion.update_version(current_user.id, 'taskTypesVersion')
+    notify_data_update(current_user.id, taskTypesVersion=new_version)
+    return jsonify(task_type.to_dict()), 201, {'ETag': str(new_version)}
 
 
 @to_do_app.route('/tasks/task_types/<string:type_id>', methods=['PUT'])
@@ -594,9 +620,9 @@ def edit_task_type_route(type_id):
     task_type.group_id = group_id
     task_type.is_active = data.get('is_active', task_type.is_active)
     db.session.commit()
-    new_version = DataVersion.update_version('taskTypesVersion')
-    notify_data_update(taskTypesVersion=new_version)
-    return jsonify(task_type.to_dict()), 200, {'ETag': new_version}
+    new_version = DataVersion.update_version(current_user.id, 'taskTypesVersion')
+    notify_data_update(current_user.id, taskTypesVersion=new_version)
+    return jsonify(task_type.to_dict()), 200, {'ETag': str(new_version)}
 
 
 @to_do_app.route('/tasks/task_types/<string:type_id>', methods=['DELETE'])
@@ -617,9 +643,9 @@ def delete_task_type_route(type_id):
 
     db.session.delete(task_type)
     db.session.commit()
-    new_version = DataVersion.update_version('taskTypesVersion')
-    notify_data_update(taskTypesVersion=new_version)
-    return jsonify({'result': 'deleted'}), 200, {'ETag': new_version}
+    new_version = DataVersion.update_version(current_user.id, 'taskTypesVersion')
+    notify_data_update(current_user.id, taskTypesVersion=new_version)
+    return jsonify({'result': 'deleted'}), 200, {'ETag': str(new_version)}
 
 
 @to_do_app.route('/tasks/get_subtasks', methods=['GET'])
@@ -3,6 +3,7 @@ from datetime import datetime, timezone, timedelta
 
 from .models import db, Task, Status, List, task_list_relations, task_subtasks_relations
 from .calendar.models import TaskOverride
+from .calendar.occurrences import occurrence_cache
 from .utils import _parse_iso_datetime, _is_task_in_range, is_valid_uuid
 import pytz
 
@@ -42,28 +43,20 @@ def get_tasks(list_id, client_timezone='UTC', start=None, end=None, user_id=None
 
     from .models import Task
     from .calendar.models import TaskOverride
-    tasks_data = []
     tz_name = client_timezone or 'UTC'
     try:
         tz = pytz.timezone(tz_name)
     except Exception:
         tz = pytz.UTC
 
-    load_options = [
-        db.joinedload(Task.lists),
-        db.joinedload(Task.status),
-        db.joinedload(Task.priority),
-        db.joinedload(Task.interval),
-    ]
-
     start_dt = _parse_iso_datetime(start) if start else None
     end_dt = _parse_iso_datetime(end) if end else None
 
     if list_id == 'all':
-        tasks_query = Task.query.options(*load_options).filter_by(user_id=user_id).all()
+        tasks_query = Task.query.filter_by(user_id=user_id).all()
     elif list_id == 'tasks':
         tasks_query = (
-            Task.query.options(*load_options)
+            Task.query
             .filter(
                 Task.user_id == user_id,
                 ~Task.lists.any(),
@@ -73,9 +66,9 @@ def get_tasks(list_id, client_timezone='UTC', start=None, end=None, user_id=None
         )
         # current_app.logger.info(f'get_tasks: tasks_query: {tasks_query}')
     elif list_id == 'important':
-        tasks_query = Task.query.options(*load_options).filter(Task.is_important == True, Task.user_id == user_id).all()
+        tasks_query = Task.query.filter(Task.is_important == True, Task.user_id == user_id).all()
     elif list_id == 'background':
-        tasks_query = Task.query.options(*load_options).filter(Task.is_background, Task.user_id == user_id).all()
+        tasks_query = Task.query.filter(Task.is_background, Task.user_id == user_id).all()
     else:
         try:
             # Попытка преобразовать в UUID, чтобы отсечь системные имена
@@ -91,15 +84,14 @@ def get_tasks(list_id, client_timezone='UTC', start=None, end=None, user_id=None
                 .join(task_list_relations, Task.id == task_list_relations.c.TaskID)
                 .join(List, List.id == task_list_relations.c.ListID)
                 .filter(List.id == list_id, Task.user_id == user_id)
-                .options(*load_options)
                 .all()
             )
         else:
             # Если это не UUID, значит, это системное имя, которое не было обработано выше
             return {'error': f'Invalid or unsupported list_id: {list_id}'}, 400
 
-    for task in tasks_query:
-        tasks_data.append(task.to_dict())
+    # Типы задач и id списков подгружаются одним запросом на всю выборку
+    tasks_data = Task.to_dict_many(tasks_query)
 
     return {'tasks': tasks_data}, 200
 
@@ -112,19 +104,12 @@ def get_tasks_by_ids(task_ids, user_id=None):
     if not task_ids:
         return {'tasks': []}, 200
 
-    load_options = [
-        db.joinedload(Task.lists),
-        db.joinedload(Task.status),
-        db.joinedload(Task.priority),
-        db.joinedload(Task.interval),
-    ]
-
     tasks = (
-        Task.query.options(*load_options)
+        Task.query
         .filter(Task.id.in_(task_ids), Task.user_id == user_id)
         .all()
     )
-    return {'tasks': [t.to_dict() for t in tasks]}, 200
+    return {'tasks': Task.to_dict_many(tasks)}, 200
 
 
 def add_task(data, user_id=None, client_timezone='UTC'):
@@ -205,14 +190,9 @@ def add_task(data, user_id=None, client_timezone='UTC'):
         db.session.refresh(updated_list)
         updated_list_dict = updated_list.to_dict()
     elif not is_uuid: # It's a system list
-        from .list_handlers import get_lists_and_groups_data
-        all_lists_data = get_lists_and_groups_data(user_id=user_id)
-        for lst in all_lists_data.get('default_lists', []):
-            if lst['id'] == list_id:
-                updated_list_dict = lst
-                break
-        # If it's a system list, and it's not found in default_lists, it means it's a new system list
-        # or an edge case. For now, we assume it's found.
+        from .list_handlers import DEFAULT_LIST_TITLES, get_default_list_data
+        if list_id in DEFAULT_LIST_TITLES:
+            updated_list_dict = get_default_list_data(list_id, user_id, tz_name)
 
     return {'success': True, 'message': 'Задача добавлена', 'task': new_task.to_dict(),
                 'task_list': updated_list_dict}, 200
@@ -280,6 +260,7 @@ def edit_task(data, user_id=None):
 
     db.session.add(task)
     db.session.commit()
+    occurrence_cache.invalidate(task_id)
     return {'success': True, 'task': task.to_dict()}, 200
 
 
@@ -398,6 +379,8 @@ def del_task(data, user_id=None):
     from sqlalchemy.dialects.postgresql import JSONB
     from sqlalchemy import cast
     lists = List.query.filter(List.childes_order.op('@>')(cast([task_id], JSONB)), List.user_id == user_id).all()
+    # Списки, которых касается удаление, — для дельты боковой панели
+    lists_ids = list(dict.fromkeys([lst.id for lst in task.lists] + [lst.id for lst in lists]))
 
     for list_item in lists:
         if task_id in list_item.childes_order:
@@ -409,8 +392,9 @@ def del_task(data, user_id=None):
     db.session.commit()
     db.session.delete(task)
     db.session.commit()
+    occurrence_cache.invalidate(task_id)
 
-    return {'success': True, 'message': 'Subtask deleted successfully'}, 200
+    return {'success': True, 'message': 'Subtask deleted successfully', 'lists_ids': lists_ids}, 200
 
 
 def get_subtasks_by_parent_id(parent_task_id, user_id=None):
@@ -425,7 +409,7 @@ def get_subtasks_by_parent_id(parent_task_id, user_id=None):
     subtasks = Task.query.filter(Task.id.in_(parent_task.childes_order), Task.user_id == user_id).all()
     subtasks_map = {t.id: t for t in subtasks}
     subtasks_sorted = [subtasks_map[tid] for tid in parent_task.childes_order if tid in subtasks_map]
-    return {'subtasks': [t.to_dict() for t in subtasks_sorted]}, 200
+    return {'subtasks': Task.to_dict_many(subtasks_sorted)}, 200
 
 
 def create_daily_scenario():
@@ -0,0 +1,185 @@
+"""
+Индекс названий списков и задач пользователя для нечёткого поиска секретаря.
+
+Названия хранятся уже приведёнными к виду, в котором их сравнивает
+``fuzz.token_sort_ratio`` (нижний регистр, слова по алфавиту), поэтому запрос
+сводится к ``process.extract`` со ``fuzz.ratio`` по готовому словарю
+{id: название}. Индекс пользователя строится тремя запросами по столбцам и
+дальше ведётся по изменениям ORM: сессия собирает их при flush и применяет
+после commit (после rollback — отбрасывает). Изменения из других процессов
+становятся видны не позже, чем через TITLE_INDEX_TTL секунд.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from rapidfuzz import fuzz, process
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app import db
+from .models import List, Task, task_list_relations
+
+TITLE_INDEX_TTL = 60
+TITLE_INDEX_SIZE = 1024
+DEFAULT_SCORE_CUTOFF = 80
+
+
+def title_key(title):
+    """Название в виде, в котором его сравнивает token_sort_ratio."""
+    return ' '.join(sorted((title or '').lower().split()))
+
+
+class _UserTitles:
+    __slots__ = ('lists', 'tasks', 'list_tasks', 'loaded_at')
+
+    def __init__(self, lists, tasks, list_tasks):
+        self.lists = lists
+        self.tasks = tasks
+        self.list_tasks = list_tasks
+        self.loaded_at = time.monotonic()
+
+
+class TitleIndex:
+    """LRU-кэш индексов названий по пользователям."""
+
+    def __init__(self, ttl=TITLE_INDEX_TTL, maxsize=TITLE_INDEX_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._users = OrderedDict()
+        # Счётчик применённых изменений: индекс, собранный во время коммита, не кэшируется
+        self._changes = 0
+        self._lock = threading.Lock()
+
+    def _load(self, user_id):
+        lists = {list_id: title_key(title) for list_id, title in db.session.execute(
+            select(List.id, List.title).where(List.user_id == user_id))}
+        tasks = {task_id: title_key(title) for task_id, title in db.session.execute(
+            select(Task.id, Task.title).where(Task.user_id == user_id))}
+        list_tasks = {list_id: set() for list_id in lists}
+        for task_id, list_id in db.session.execute(
+                select(task_list_relations.c.TaskID, task_list_relations.c.ListID)
+                .join(List, List.id == task_list_relations.c.ListID)
+                .where(List.user_id == user_id)):
+            list_tasks[list_id].add(task_id)
+        return _UserTitles(lists, tasks, list_tasks)
+
+    def _entry(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and time.monotonic() - entry.loaded_at < self.ttl:
+                self._users.move_to_end(user_id)
+                return entry
+            changes = self._changes
+
+        entry = self._load(user_id)
+        with self._lock:
+            if changes == self._changes:
+                self._users[user_id] = entry
+                self._users.move_to_end(user_id)
+                while len(self._users) > self.maxsize:
+                    self._users.popitem(last=False)
+        return entry
+
+    def match_lists(self, user_id, name, score_cutoff=DEFAULT_SCORE_CUTOFF, limit=None):
+        """Подходящие списки по убыванию сходства: [(название, оценка, list_id)]."""
+        entry = self._entry(user_id)
+        with self._lock:
+            return process.extract(title_key(name), entry.lists, scorer=fuzz.ratio, processor=None,
+                                   limit=limit, score_cutoff=score_cutoff)
+
+    def match_task(self, user_id, name, list_id='all', score_cutoff=DEFAULT_SCORE_CUTOFF):
+        """Самая похожая задача пользователя (или списка list_id): (task_id, оценка) либо (None, 0)."""
+        entry = self._entry(user_id)
+        with self._lock:
+            if list_id == 'all':
+                choices = entry.tasks
+            else:
+                choices = {task_id: entry.tasks[task_id]
+                           for task_id in entry.list_tasks.get(list_id, ()) if task_id in entry.tasks}
+            match = process.extractOne(title_key(name), choices, scorer=fuzz.ratio, processor=None,
+                                       score_cutoff=score_cutoff)
+        if match is None:
+            return None, 0
+        _, score, task_id = match
+        return task_id, score
+
+    def apply(self, changes):
+        """Применяет изменения [(вид, user_id, *аргументы)], собранные при flush."""
+        with self._lock:
+            self._changes += 1
+            for kind, user_id, *args in changes:
+                entry = self._users.get(user_id)
+                if entry is None:
+                    continue
+                if kind == 'task':
+                    entry.tasks[args[0]] = args[1]
+                elif kind == 'list':
+                    entry.lists[args[0]] = args[1]
+                    entry.list_tasks.setdefault(args[0], set())
+                elif kind == 'del_task':
+                    entry.tasks.pop(args[0], None)
+                    for task_ids in entry.list_tasks.values():
+                        task_ids.discard(args[0])
+                elif kind == 'del_list':
+                    entry.lists.pop(args[0], None)
+                    entry.list_tasks.pop(args[0], None)
+                elif kind == 'link':
+                    entry.list_tasks.setdefault(args[0], set()).add(args[1])
+                elif kind == 'unlink':
+                    entry.list_tasks.get(args[0], set()).discard(args[1])
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._changes += 1
+            self._users.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._changes += 1
+            self._users.clear()
+
+
+title_index = TitleIndex()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_title_changes(session, flush_context):
+    changes = []
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, (Task, List)):
+            continue
+        state = inspect(obj)
+        user_id = str(obj.user_id)
+        if obj in session.new or state.attrs.title.history.has_changes():
+            changes.append(('task' if isinstance(obj, Task) else 'list', user_id, obj.id, title_key(obj.title)))
+        # Связь задачи со списком меняется с любой стороны (Task.lists или List.tasks)
+        if isinstance(obj, Task):
+            history = state.attrs.lists.history
+            changes += [('link', user_id, lst.id, obj.id) for lst in history.added]
+            changes += [('unlink', user_id, lst.id, obj.id) for lst in history.deleted]
+        else:
+            history = state.attrs.tasks.history
+            changes += [('link', user_id, obj.id, task.id) for task in history.added]
+            changes += [('unlink', user_id, obj.id, task.id) for task in history.deleted]
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            changes.append(('del_task', str(obj.user_id), obj.id))
+        elif isinstance(obj, List):
+            changes.append(('del_list', str(obj.user_id), obj.id))
+    if changes:
+        session.info.setdefault('title_index_changes', []).extend(changes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_title_changes(session):
+    changes = session.info.pop('title_index_changes', None)
+    if changes:
+        title_index.apply(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_title_changes(session):
+    session.info.pop('title_index_changes', None)
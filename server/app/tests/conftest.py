@@ -28,6 +28,18 @@ def pytest_addoption(parser):
     parser.addoption(
         "--docs", action="store_true", default=False, help="Generate API documentation"
     )
+    parser.addoption(
+        "--benchmark", action="store_true", default=False, help="Run performance benchmarks"
+    )
+
+def pytest_collection_modifyitems(config, items):
+    """Бенчмарки (@pytest.mark.benchmark) выполняются только с --benchmark."""
+    if config.getoption("benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmark: run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
 
 def pytest_sessionfinish(session):
     """
@@ -246,12 +258,13 @@ def add_initial_test_data(session):
     
     # Добавляем интервалы, если их нет
     if not session.query(Interval).first():
+        # Явные id: Task.build_rrule и fields_config опираются на IntervalID 1-5
         intervals = [
-            Interval(name="DAILY", title="День"),
-            Interval(name="WEEKLY", title="Неделя"),
-            Interval(name="MONTHLY", title="Месяц"),
-            Interval(name="YEARLY", title="Год"),
-            Interval(name="WORK", title="Рабочие дни"),
+            Interval(id=1, name="DAILY", title="День"),
+            Interval(id=2, name="WEEKLY", title="Неделя"),
+            Interval(id=3, name="MONTHLY", title="Месяц"),
+            Interval(id=4, name="YEARLY", title="Год"),
+            Interval(id=5, name="WORK", title="Рабочие дни"),
         ]
         for interval in intervals:
             session.add(interval)
@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.access_control import PermissionCache, permission_cache
+from app.subscription_models import AccessLevel, SubscriptionPlan, UserSubscription
+
+
+@pytest.fixture
+def access_levels(db_session):
+    for level_id, name, features in ((1, 'Free', ['tasks', 'calendar']),
+                                     (3, 'Premium', ['tasks', 'calendar', 'memory', 'chat'])):
+        if not db.session.get(AccessLevel, level_id):
+            db_session.add(AccessLevel(id=level_id, name=name, max_containers=5, features=features))
+    db_session.commit()
+    permission_cache.clear()
+
+
+@pytest.fixture
+def reset_user(db_session, test_user):
+    """Пользователь без модулей на тарифе Free; исходное состояние восстанавливается"""
+    modules, level = test_user.modules, test_user.access_level_id
+    test_user.modules = []
+    test_user.access_level_id = 1
+    db_session.commit()
+    yield test_user
+    UserSubscription.query.filter_by(user_id=test_user.user_id).delete()
+    test_user.access_level_id = level
+    test_user.modules = modules
+    db_session.commit()
+    permission_cache.clear()
+
+
+def _count_selects(func):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return result, [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+
+
+def test_warm_request_loads_only_user(auth_client, access_levels, reset_user):
+    """Повторный запрос читает из БД только пользователя (JWT), права берутся из кэша"""
+    first, cold = _count_selects(lambda: auth_client.get('/api/user/permissions'))
+    second, warm = _count_selects(lambda: auth_client.get('/api/user/permissions'))
+
+    assert first.status_code == second.status_code == 200
+    assert first.get_json() == second.get_json()
+    assert first.get_json()['features'] == ['tasks', 'calendar']
+    assert any('access_levels' in s for s in cold)
+    # Не больше одного запроса — загрузка пользователя по JWT
+    assert len(warm) <= 1 and all('users.users' in s for s in warm)
+
+
+def test_user_changes_produce_new_permissions(auth_client, access_levels, reset_user):
+    """Изменение модулей или уровня доступа меняет ключ кэша без явного сброса"""
+    user = reset_user
+    assert auth_client.get('/api/user/permissions').get_json()['features'] == ['tasks', 'calendar']
+
+    user.modules = ['tasks', 'memory']
+    db.session.commit()
+    assert auth_client.get('/api/user/permissions').get_json()['features'] == ['tasks', 'memory']
+
+    user.modules = []
+    user.access_level_id = 3
+    db.session.commit()
+    assert auth_client.get('/api/user/permissions').get_json()['features'] == ['tasks', 'calendar', 'memory', 'chat']
+
+
+def test_subscribe_invalidates_cache(auth_client, access_levels, reset_user):
+    """Оформление подписки сбрасывает кэш пользователя"""
+    plan = SubscriptionPlan(name='Premium test', price=0, access_level_id=3, duration_days=30)
+    db.session.add(plan)
+    db.session.commit()
+    auth_client.get('/api/user/permissions')
+
+    response = auth_client.post(f'/api/subscribe/{plan.id}')
+
+    assert response.status_code == 200
+    assert not [key for key in permission_cache._entries if key[0] == str(reset_user.user_id)]
+    assert 'memory' in auth_client.get('/api/user/permissions').get_json()['features']
+    UserSubscription.query.filter_by(plan_id=plan.id).delete()
+    db.session.delete(plan)
+    db.session.commit()
+
+
+def test_permission_cache_ttl_and_lru():
+    cache = PermissionCache(ttl=0)
+    cache.put(('u1', (1,)), {'access_level': 1})
+    assert cache.get(('u1', (1,))) is None
+
+    cache = PermissionCache(maxsize=2)
+    cache.put(('u1', (1,)), 1)
+    cache.put(('u2', (1,)), 2)
+    cache.get(('u1', (1,)))
+    cache.put(('u3', (1,)), 3)
+    assert cache.get(('u2', (1,))) is None
+    assert cache.get(('u1', (1,))) == 1
+
+    cache.invalidate('u1')
+    assert cache.get(('u1', (1,))) is None
+    assert cache.get(('u3', (1,))) == 3
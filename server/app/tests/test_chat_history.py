@@ -0,0 +1,120 @@
+import importlib.util
+import os
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import event, text
+
+from app import db
+from app.main.handlers import save_and_emit_message
+from app.main.models import ChatHistory, User
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'migrations', 'versions')
+
+
+@pytest.fixture
+def conversations(app, test_user, test_user2, db_session):
+    """Беседа test_user (его сообщения и ответы «секретаря» test_user2) и беседа test_user2"""
+    ids = []
+    for i in range(7):
+        ids.append(save_and_emit_message(test_user.id, f'вопрос {i}')[0]['message_id'])
+        ids.append(save_and_emit_message(test_user2.id, f'ответ {i}', room_user_id=test_user.id)[0]['message_id'])
+        save_and_emit_message(test_user2.id, f'чужое {i}')
+    yield ids
+    ChatHistory.query.filter(ChatHistory.user_id.in_([test_user.id, test_user2.id])).delete()
+    db_session.commit()
+
+
+def test_history_pages_by_message_id(auth_client, conversations):
+    """Страницы истории от новых к старым по курсору before; внутри страницы — от старых к новым"""
+    pages, before = [], None
+    while True:
+        response = auth_client.get('/api/chat/messages', query_string={'limit': 5, 'before': before or ''})
+        assert response.status_code == 200
+        data = response.get_json()
+        pages.append([message['message_id'] for message in data['messages']])
+        before = data['next_before']
+        if before is None:
+            break
+
+    assert [len(page) for page in pages] == [5, 5, 4]
+    assert [message_id for page in reversed(pages) for message_id in page] == conversations
+    first = auth_client.get('/api/chat/messages', query_string={'limit': 1}).get_json()['messages'][0]
+    assert first['text'] == 'ответ 6' and first['user']['user_name'] == 'Test User 2'
+
+
+def test_history_filters_by_author(auth_client, test_user, conversations):
+    data = auth_client.get('/api/chat/messages', query_string={'user_id': test_user.id}).get_json()
+    assert [message['text'] for message in data['messages']] == [f'вопрос {i}' for i in range(7)]
+    assert data['next_before'] is None
+
+
+def test_history_errors(client, auth_client):
+    assert client.get('/api/chat/messages').status_code == 401
+    assert auth_client.get('/api/chat/messages', query_string={'before': 'x'}).status_code == 400
+
+
+def test_history_loads_authors_in_one_query(app, test_user, conversations):
+    user_id = test_user.id
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        messages = ChatHistory.history(user_id)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert len(messages) == 14
+    assert len(statements) == 1
+
+
+def test_history_uses_conversation_index(app, test_user, conversations):
+    db.session.execute(text('SET LOCAL enable_seqscan = off'))
+    plan = '\n'.join(row[0] for row in db.session.execute(text(
+        'EXPLAIN SELECT * FROM communication.chat_history WHERE conversation_id = :conversation '
+        'AND message_id < :before ORDER BY message_id DESC LIMIT 100'),
+        {'conversation': test_user.id, 'before': 10 ** 9}))
+    db.session.rollback()
+    assert 'ix_chat_history_conversation_message' in plan
+
+
+def _run_migration(filename, direction='upgrade'):
+    spec = importlib.util.spec_from_file_location(filename, os.path.join(MIGRATIONS, filename))
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with db.engine.begin() as connection, Operations.context(MigrationContext.configure(connection)):
+        getattr(migration, direction)()
+
+
+def test_secretary_replies_are_moved_to_the_conversation_they_answer(app, test_user, test_user2, db_session):
+    """Ответы секретаря, отнесённые миграцией f4b8c2d7a913 к его беседе, переходят в беседу собеседника"""
+    secretary = User(user_id='2', user_name='Секретарь', email='secretary@example.com')
+    db_session.add(secretary)
+    # Состояние после f4b8c2d7a913: conversation_id = user_id у всех прежних сообщений
+    rows = [
+        ('2', 'Здравствуйте'), (test_user.id, 'вопрос 1'), ('2', 'ответ 1'),
+        (test_user2.id, 'вопрос 2'), ('2', 'ответ 2'), ('2', 'ещё ответ 2'),
+        (test_user.id, 'вопрос 3'), ('2', 'ответ 3'),
+    ]
+    for user_id, message_text in rows:
+        db_session.add(ChatHistory(user_id=user_id, conversation_id=user_id, text=message_text))
+        db_session.flush()
+    # Ответ, записанный уже с conversation_id, не меняется
+    db_session.add(ChatHistory(user_id='2', conversation_id=test_user2.id, text='новый ответ 2'))
+    db_session.commit()
+
+    _run_migration('c8f2a5e1d7b4_chat_history_secretary_conversations.py')
+    db_session.expire_all()
+
+    conversations = {m.text: m.conversation_id for m in ChatHistory.query.order_by(ChatHistory.message_id)}
+    assert conversations == {
+        'Здравствуйте': test_user.id, 'вопрос 1': test_user.id, 'ответ 1': test_user.id,
+        'вопрос 2': test_user2.id, 'ответ 2': test_user2.id, 'ещё ответ 2': test_user2.id,
+        'вопрос 3': test_user.id, 'ответ 3': test_user.id, 'новый ответ 2': test_user2.id,
+    }
+    assert [m['text'] for m in ChatHistory.history(test_user2.id)] == \
+        ['вопрос 2', 'ответ 2', 'ещё ответ 2', 'новый ответ 2']
+
+    _run_migration('c8f2a5e1d7b4_chat_history_secretary_conversations.py', 'downgrade')
+    db_session.expire_all()
+    assert {m.conversation_id for m in ChatHistory.query.filter_by(user_id='2')} == {'2'}
@@ -0,0 +1,255 @@
+import json
+import os
+import random
+import re
+import time
+
+import pytest
+
+from app.command_grammar import CommandGrammar, KeywordAutomaton
+from app.command_utils import parse_time
+
+SETTINGS = os.path.join(os.path.dirname(__file__), '..', 'static', 'default_settings', 'settings')
+
+
+def _settings(name):
+    with open(os.path.join(SETTINGS, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+MODULES = _settings('modules.json')
+COMMANDS = _settings('commands_list.json')
+INFO = _settings('command_information.json')
+NUM_INFO = _settings('command_num_information.json')
+GRAMMAR = CommandGrammar(MODULES, COMMANDS, INFO, NUM_INFO, time_parser=parse_time)
+VOCABULARY = [
+    'утром', 'рынок', 'пробой', 'уровня', 'вход', 'выход', 'быстро', 'тихо', 'зеленый', 'красный',
+    'книга', 'роман', 'дом', 'работа', 'вечер', 'кофе', 'чай', 'лес', 'море', 'город', 'план',
+    'ошибка', 'спешка', 'скука', 'радость', 'фантастика', 'история', 'понедельник', 'флаг', 'клин',
+]
+
+
+# Прежняя реализация command_utils (поиск через str.find) — эталон для сравнения
+def _legacy_command_type(message):
+    first_word = message.split()[0].lower().replace(',', '')
+    for commands_types, commands in COMMANDS.items():
+        if first_word in commands:
+            return commands_types
+    return None
+
+
+def _legacy_target_module(command, modules=MODULES):
+    target_module = None
+    earliest_occurrence = len(command) + 1
+    for key, values in modules.items():
+        for module_command in values['words']:
+            position = command.lower().find(module_command)
+            if position != -1 and position < earliest_occurrence:
+                earliest_occurrence = position
+                target_module = key
+    if target_module is None:
+        return None, None
+    return target_module, modules[target_module]
+
+
+def _legacy_find_info(module_info, text):
+    delimiter = "||"
+    replacements_made = False
+    result = {}
+    command_info_dict = INFO | NUM_INFO
+    comment_start = len(text)
+    if 'comment' in module_info:
+        for value in command_info_dict['comment']:
+            comment_start = text.lower().find(value)
+            if comment_start != -1:
+                end = text.find(' ', comment_start)
+                if end == -1:
+                    end = len(text)
+                text = text[:comment_start] + delimiter + 'comment' + text[end:]
+                replacements_made = True
+                break
+    for info_type in module_info:
+        if info_type == 'time':
+            result = {'time': parse_time(text)}
+            continue
+        if info_type == 'comment':
+            continue
+        for value in command_info_dict[info_type]:
+            start = text.lower().find(value, 0, comment_start)
+            if start != -1:
+                end = text.find(' ', start)
+                if end == -1:
+                    end = comment_start
+                text = text[:start] + delimiter + info_type + text[end:]
+                replacements_made = True
+                break
+    if not replacements_made:
+        return result
+    for segment in text.split(delimiter)[1:]:
+        key = segment.split()[0]
+        if key in NUM_INFO:
+            found_numbers = re.findall(r'\d+', segment)
+            if found_numbers:
+                result[key] = found_numbers[0]
+                continue
+        result[key] = ' '.join(segment.split()[1:])
+    return result
+
+
+def _keywords_in(text):
+    words = [w for module in MODULES.values() for w in module['words']] + \
+            [w for words in (INFO | NUM_INFO).values() for w in words]
+    return {word for word in words if word in text.lower()}
+
+
+def _transcript(rng):
+    """Случайная фраза и ожидаемый разбор: команда, слово модуля, маркеры полей со значениями"""
+    vocabulary = [word for word in VOCABULARY if not _keywords_in(word)]
+    while True:
+        command_word = rng.choice([word for words in COMMANDS.values() for word in words])
+        module = rng.choice([name for name, config in MODULES.items() if config.get('info')])
+        config = MODULES[module]
+        fields = [f for f in config['info'] if f in INFO or f in NUM_INFO]
+        chosen = rng.sample(fields, rng.randint(0, len(fields)))
+        if 'comment' in chosen:
+            chosen = [f for f in chosen if f != 'comment'] + ['comment']
+
+        words = [command_word, rng.choice(config['words'])]
+        expected = {}
+        if 'time' in config['info']:
+            minutes = rng.randint(1, 59)
+            words += ['на', str(minutes), 'минут']
+        for field in chosen:
+            marker = rng.choice((INFO | NUM_INFO)[field])
+            words.append(marker + rng.choice(['', 'а', 'у']) if ' ' not in marker else marker)
+            if field in NUM_INFO:
+                number = str(rng.randint(0, 200))
+                words += [rng.choice(vocabulary), number]
+                expected[field] = number
+            else:
+                value = rng.sample(vocabulary, rng.randint(1, 3))
+                words += value
+                expected[field] = ' '.join(value)
+        text = ' '.join(words)
+
+        # Фраза годится, если в ней нет случайных вхождений маркеров (кроме слова модуля и команды)
+        head = ' '.join(words[:2])
+        markers = {w for f in config['info'] if f in INFO or f in NUM_INFO for w in (INFO | NUM_INFO)[f]}
+        if _legacy_target_module(text)[0] != module or (_keywords_in(head) & markers) or any(
+                text.lower().count(marker) > 1 for marker in markers if marker in text.lower()):
+            continue
+        return text, _legacy_command_type(text), expected
+
+
+CORPUS = [_transcript(random.Random(seed)) for seed in range(2000)]
+
+
+def test_automaton_finds_all_overlapping_occurrences():
+    rng = random.Random(3)
+    for _ in range(300):
+        keywords = list({''.join(rng.choice('abc') for _ in range(rng.randint(1, 4))) for _ in range(8)})
+        text = ''.join(rng.choice('abcd') for _ in range(40))
+        expected = {}
+        for index, keyword in enumerate(keywords):
+            positions = [i for i in range(len(text)) if text.startswith(keyword, i)]
+            if positions:
+                expected[index] = positions
+        assert KeywordAutomaton(keywords).find_all(text) == expected
+
+
+def test_module_and_command_type_match_legacy():
+    """Модуль и тип команды совпадают с прежним поиском на всём корпусе"""
+    for text, _, _ in CORPUS:
+        assert GRAMMAR.target_module(text) == _legacy_target_module(text)
+        assert GRAMMAR.command_type(text) == _legacy_command_type(text)
+    assert GRAMMAR.target_module('ничего подходящего') == (None, None)
+
+
+def test_parse_extracts_fields():
+    """Разбор за один проход находит модуль, тип команды и все поля фразы"""
+    for text, command_type, expected in CORPUS:
+        parsed = GRAMMAR.parse(text)
+        assert parsed.command_type == command_type
+        assert (parsed.module, parsed.module_config) == _legacy_target_module(text)
+        fields = {key: value for key, value in parsed.fields.items() if key != 'time'}
+        assert fields == expected, text
+        for field, start, end in parsed.spans:
+            assert text[start:end].split()[0] in text.split()
+
+
+def test_find_info_matches_legacy_where_legacy_is_consistent():
+    """
+    Совпадение с прежним find_info, кроме его известных ошибок: прежний код
+    не сдвигал границу поиска после замен и терял маркеры у конца фразы
+    """
+    matches = 0
+    for text, _, expected in CORPUS:
+        module_info = _legacy_target_module(text)[1].get('info', [])
+        try:
+            legacy = _legacy_find_info(module_info, text)
+        except KeyError:
+            continue
+        legacy.pop('time', None)
+        if legacy == expected:
+            matches += 1
+            assert {k: v for k, v in GRAMMAR.find_info(module_info, text).items() if k != 'time'} == legacy
+    assert matches > len(CORPUS) // 2
+
+
+def test_fields_near_the_end_and_without_markers():
+    text = 'запиши в трейд сегодня понедельник инструмент газ коммент тихо'
+    assert GRAMMAR.parse(text).fields == {'trading_day': 'понедельник', 'instrument': 'газ', 'comment': 'тихо'}
+    # Прежняя реализация теряла инструмент перед комментарием: граница поиска не сдвигалась после замен
+    assert 'instrument' not in _legacy_find_info(MODULES['trading_journal']['info'], text)
+
+    # Поля без маркеров (схемы журналов пользователя) пропускаются, а не роняют разбор
+    assert GRAMMAR.find_info(['content', 'comment'], 'запиши заметка текст') == {'comment': 'текст'}
+    parsed = GRAMMAR.parse('поставь таймер на 5 минут назови чай')
+    assert parsed.fields['name'] == 'чай'
+    assert parsed.fields['time']['time'] == ['00', '05', '00']
+
+
+def _user_journals(count):
+    """Настройки с count журналами пользователя, у каждого свои слова вызова"""
+    modules = dict(MODULES)
+    for i in range(count):
+        name = f'{VOCABULARY[i % len(VOCABULARY)]}{i}'
+        modules[f'user_journal_{i}'] = {'words': [f'журнал {name}', f'дневник {name}'], 'info': ['comment']}
+    return modules
+
+
+@pytest.mark.benchmark
+def test_grammar_benchmark(record_property):
+    """Бенчмарк: разбор корпуса прежним поиском и скомпилированной грамматикой на настройках с журналами пользователя"""
+    modules = _user_journals(300)
+    rng = random.Random(20)
+    texts = [text for text, _, _ in CORPUS[:1000]] + [
+        f"запиши в журнал {VOCABULARY[i % len(VOCABULARY)]}{i} коммент {' '.join(rng.sample(VOCABULARY, 3))}"
+        for i in rng.sample(range(300), 200)
+    ]
+
+    started = time.perf_counter()
+    grammar = CommandGrammar(modules, COMMANDS, INFO, NUM_INFO, time_parser=parse_time)
+    build_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    legacy_modules = []
+    for text in texts:
+        _legacy_command_type(text)
+        module, config = _legacy_target_module(text, modules)
+        legacy_modules.append(module)
+        try:
+            _legacy_find_info(config.get('info', []), text)
+        except KeyError:
+            pass
+    legacy_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    compiled_modules = [grammar.parse(text).module for text in texts]
+    compiled_elapsed = time.perf_counter() - started
+
+    record_property('legacy_s', round(legacy_elapsed, 3))
+    record_property('compiled_s', round(compiled_elapsed, 3))
+    record_property('build_ms', round(build_elapsed * 1000, 1))
+    assert compiled_modules[-200:] == legacy_modules[-200:]
+    assert compiled_elapsed < legacy_elapsed
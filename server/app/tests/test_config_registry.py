@@ -0,0 +1,120 @@
+import json
+import os
+
+import pytest
+from flask_jwt_extended import verify_jwt_in_request
+from sqlalchemy import event
+
+from app import db
+from app.command_utils import ConfigRegistry, config_registry, get_modules, load_json
+from app.journals.models import JournalSchema
+
+JOURNAL = 'registry_test_journal'
+
+
+@pytest.fixture
+def settings_dir(app, tmp_path, monkeypatch):
+    """Отдельная папка настроек с modules.json"""
+    settings = tmp_path / 'default_settings' / 'settings'
+    settings.mkdir(parents=True)
+    (settings / 'modules.json').write_text(json.dumps({'diary': {'type': 'journal', 'words': ['дневник']}}))
+    monkeypatch.setattr(app, 'static_folder', str(tmp_path))
+    config_registry.clear()
+    yield settings / 'modules.json'
+    config_registry.clear()
+
+
+@pytest.fixture
+def user_request(app, auth_client, test_user, db_session):
+    modules = test_user.modules
+    test_user.modules = []
+    db_session.commit()
+    with app.test_request_context(headers={'Authorization': f'Bearer {auth_client.__access_token__}'}):
+        verify_jwt_in_request()
+        yield test_user
+    JournalSchema.query.filter_by(name=JOURNAL).delete()
+    test_user.modules = modules
+    db_session.commit()
+
+
+def _rewrite(path, data):
+    stat = os.stat(path)
+    path.write_text(json.dumps(data))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def _count_statements(func):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return result, [s for s in statements if 'journal_schemas' in s]
+
+
+def test_static_files_are_read_once_and_reloaded_on_change(app, settings_dir):
+    with app.app_context():
+        first = load_json('modules.json')
+        assert load_json('modules.json') is first
+
+        _rewrite(settings_dir, {'books': {'type': 'journal', 'words': ['книга']}})
+        assert list(load_json('modules.json')) == ['books']
+
+
+def test_user_modules_are_cached_until_schema_changes(user_request, settings_dir, db_session):
+    modules, statements = _count_statements(get_modules)
+    assert set(modules) == {'diary'} | {s.name for s in JournalSchema.query.filter_by(user_id=user_request.id)}
+    assert len(statements) == 1
+
+    cached, statements = _count_statements(get_modules)
+    assert cached is modules and statements == []
+
+    # Новая схема журнала видна сразу после коммита
+    db_session.add(JournalSchema(user_id=user_request.id, name=JOURNAL, display_name='Registry',
+                                 fields=[{'name': 'title', 'type': 'text'}]))
+    db_session.commit()
+    modules = get_modules()
+    assert modules[JOURNAL]['info'] == ['title']
+
+    schema = JournalSchema.query.filter_by(user_id=user_request.id, name=JOURNAL).one()
+    schema.display_name = 'Renamed'
+    db_session.commit()
+    assert get_modules()[JOURNAL]['name'] == 'Renamed'
+
+    db_session.delete(schema)
+    db_session.commit()
+    assert JOURNAL not in get_modules()
+
+
+def test_user_modules_follow_modules_file_and_user_module_list(user_request, settings_dir, db_session):
+    assert 'diary' in get_modules()
+    _rewrite(settings_dir, {'books': {'type': 'journal', 'words': ['книга']}})
+    assert 'books' in get_modules() and 'diary' not in get_modules()
+
+    user_request.modules = ['books']
+    db_session.commit()
+    assert get_modules() == {'books': {'type': 'journal', 'words': ['книга']}}
+
+
+def test_rolled_back_schema_is_not_cached(user_request, settings_dir, db_session):
+    db_session.add(JournalSchema(user_id=user_request.id, name=JOURNAL, display_name='Registry', fields=[]))
+    db_session.flush()
+    assert JOURNAL in get_modules()
+    db_session.rollback()
+    assert JOURNAL not in get_modules()
+
+
+def test_expired_entries_are_rebuilt(app, settings_dir):
+    registry = ConfigRegistry(ttl=0)
+    calls = []
+
+    def build(base):
+        calls.append(1)
+        return dict(base), True
+
+    with app.app_context():
+        registry.user_modules('u', None, build)
+        registry.user_modules('u', None, build)
+    assert len(calls) == 2
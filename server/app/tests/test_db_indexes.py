@@ -0,0 +1,131 @@
+import uuid
+import datetime
+
+import pytest
+from sqlalchemy import and_, func, insert, or_, text
+
+from app import db
+from app.tasks.models import Task, List, task_list_relations, task_subtasks_relations
+from app.tasks.list_handlers import _default_lists_membership
+from app.journals.models import JournalEntry
+from app.main.models import ChatHistory
+
+USERS = 1000
+TASKS_PER_USER = 100
+LISTS_PER_USER = 5
+# Таблицы, на которых последовательное сканирование недопустимо
+LARGE_TABLES = {'tasks', 'task_list_relations', 'task_subtasks_relations', 'lists', 'journal_entries'}
+
+
+@pytest.fixture(scope='module')
+def seeded_user(app):
+    """1000 пользователей по 100 задач (100k), со списками, подзадачами и журналами"""
+    with app.app_context():
+        user_ids = [str(uuid.uuid4()) for _ in range(USERS)]
+        base = datetime.datetime(2025, 1, 1, 9, 0)
+        tasks, lists, list_links, subtask_links, entries = [], [], [], [], []
+        for user_id in user_ids:
+            user_lists = [str(uuid.uuid4()) for _ in range(LISTS_PER_USER)]
+            lists += [{'id': list_id, 'title': 'List', 'user_id': user_id, 'order': i} for i, list_id in enumerate(user_lists)]
+            task_ids = [str(uuid.uuid4()) for _ in range(TASKS_PER_USER)]
+            for i, task_id in enumerate(task_ids):
+                start = base + datetime.timedelta(hours=i) if i % 2 else None
+                tasks.append({
+                    'id': task_id, 'user_id': user_id, 'title': f'Task {i}',
+                    'start': start, 'end': start + datetime.timedelta(hours=1) if start else None,
+                    'series_start': start if i % 50 == 1 else None,
+                    'is_important': i % 10 == 0, 'is_background': i % 15 == 0, 'is_completed': i % 3 == 0,
+                    'interval_id': (i % 5) + 1 if i % 50 == 1 else None,
+                })
+                if i % 3 == 1:
+                    list_links.append({'TaskID': task_id, 'ListID': user_lists[i % LISTS_PER_USER]})
+                if i % 10 == 2:
+                    subtask_links.append({'TaskID': task_ids[i - 1], 'SubtaskID': task_id})
+            entries += [{'id': str(uuid.uuid4()), 'user_id': user_id, 'journal_type': f'journal{i % 5}', 'data': {}}
+                        for i in range(20)]
+
+        db.session.execute(insert(Task), tasks)
+        db.session.execute(insert(List), lists)
+        db.session.execute(insert(task_list_relations), list_links)
+        db.session.execute(insert(task_subtasks_relations), subtask_links)
+        db.session.execute(insert(JournalEntry), entries)
+        db.session.commit()
+        for table in ('productivity.tasks', 'productivity.lists', 'productivity.task_list_relations',
+                      'productivity.task_subtasks_relations', 'content.journal_entries'):
+            db.session.execute(text(f'ANALYZE {table}'))
+        db.session.commit()
+
+        user_id = user_ids[0]
+        list_id = lists[0]['id']
+        yield user_id, list_id
+
+        seeded_tasks = Task.query.with_entities(Task.id).filter(Task.user_id.in_(user_ids)).subquery()
+        db.session.execute(task_subtasks_relations.delete().where(task_subtasks_relations.c.TaskID.in_(seeded_tasks.select())))
+        db.session.execute(task_list_relations.delete().where(task_list_relations.c.TaskID.in_(seeded_tasks.select())))
+        Task.query.filter(Task.user_id.in_(user_ids)).delete(synchronize_session=False)
+        List.query.filter(List.user_id.in_(user_ids)).delete(synchronize_session=False)
+        JournalEntry.query.filter(JournalEntry.user_id.in_(user_ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def _seq_scans(statement):
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    plan = db.session.execute(text('EXPLAIN (FORMAT JSON) ' + sql)).scalar()
+    found = []
+
+    def walk(node):
+        if node['Node Type'] == 'Seq Scan' and node['Relation Name'] in LARGE_TABLES:
+            found.append(node['Relation Name'])
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan[0]['Plan'])
+    return found
+
+
+def _hot_queries(user_id, list_id):
+    day_start, day_end = datetime.datetime(2025, 1, 10), datetime.datetime(2025, 1, 11)
+    membership = _default_lists_membership(day_start, day_end)
+    return {
+        'all': Task.query.filter_by(user_id=user_id),
+        'tasks': Task.query.filter(Task.user_id == user_id, ~Task.lists.any(), ~Task.parent_tasks.any()),
+        'important': Task.query.filter(Task.is_important == True, Task.user_id == user_id),
+        'important_open': db.session.query(Task.id).filter(
+            Task.user_id == user_id, Task.is_important == True, Task.is_completed == False),
+        'background_open': db.session.query(Task.id).filter(
+            Task.user_id == user_id, Task.is_background == True, Task.is_completed == False),
+        'default_counts': db.session.query(*[
+            func.count(Task.id).filter(and_(clause, Task.is_completed == False)) for clause in membership.values()
+        ]).filter(Task.user_id == user_id),
+        'list_tasks': Task.query
+            .join(task_list_relations, Task.id == task_list_relations.c.TaskID)
+            .join(List, List.id == task_list_relations.c.ListID)
+            .filter(List.id == list_id, Task.user_id == user_id),
+        'calendar_window': Task.query.filter(Task.user_id == user_id).filter(or_(
+            and_(Task.interval_id.isnot(None), Task.series_start <= day_end,
+                 or_(Task.series_end == None, Task.series_end >= day_start)),
+            and_(Task.interval_id.is_(None), Task.start != None,
+                 or_(Task.end == None, Task.end >= day_start), Task.start <= day_end),
+        )),
+        'lists': List.query.filter_by(user_id=user_id),
+        'journal': JournalEntry.query.filter_by(user_id=user_id, journal_type='journal1'),
+        'chat': ChatHistory.query.filter_by(user_id=user_id).order_by(ChatHistory.message_id.desc()).limit(100),
+    }
+
+
+def test_hot_queries_use_indexes(seeded_user):
+    """EXPLAIN горячих пользовательских запросов на 100k задач: без последовательного сканирования"""
+    user_id, list_id = seeded_user
+    seq_scans = {name: _seq_scans(query.statement) for name, query in _hot_queries(user_id, list_id).items()}
+    assert {name: tables for name, tables in seq_scans.items() if tables} == {}
+
+
+def test_partial_indexes_are_used(seeded_user):
+    """Открытые важные и фоновые задачи читаются по частичным индексам"""
+    user_id, list_id = seeded_user
+    queries = _hot_queries(user_id, list_id)
+    for name, index in (('important_open', 'ix_tasks_user_important_open'),
+                        ('background_open', 'ix_tasks_user_background_open')):
+        sql = str(queries[name].statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+        plan = '\n'.join(row[0] for row in db.session.execute(text('EXPLAIN ' + sql)))
+        assert index in plan
@@ -0,0 +1,158 @@
+import csv
+import gc
+import io
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.journals.models import JournalEntry, JournalFile, JournalSchema
+from app.tasks.models import List, Task
+
+JOURNAL = 'export_test_journal'
+FIELDS = [{'name': 'title', 'type': 'text'}, {'name': 'mood', 'type': 'number'}]
+
+
+@pytest.fixture
+def journal(db_session, test_user):
+    schema = JournalSchema(user_id=test_user.id, name=JOURNAL, display_name='Export', fields=FIELDS)
+    db_session.add(schema)
+    db_session.commit()
+    yield test_user
+    JournalFile.query.filter(JournalFile.entry_id.in_(
+        db.session.query(JournalEntry.id).filter_by(journal_type=JOURNAL))).delete(synchronize_session=False)
+    JournalEntry.query.filter_by(journal_type=JOURNAL).delete()
+    db_session.delete(schema)
+    db_session.commit()
+
+
+def _add_entries(user_id, count):
+    start = datetime(2025, 1, 1)
+    rows = [dict(id=str(uuid.uuid4()), user_id=user_id, journal_type=JOURNAL, created_at=start + timedelta(seconds=i),
+                 data={'title': f'запись {i}', 'mood': i % 5, 'comment': 'x' * 100})
+            for i in range(count)]
+    for i in range(0, count, 10000):
+        db.session.execute(JournalEntry.__table__.insert(), rows[i:i + 10000])
+    db.session.commit()
+
+
+def test_journal_export_ndjson_and_csv(auth_client, journal):
+    """NDJSON совпадает с to_dict, CSV — поля схемы и метаданные файлов"""
+    _add_entries(journal.id, 5)
+    entry = JournalEntry.query.filter_by(journal_type=JOURNAL).order_by(JournalEntry.created_at).first()
+    entry.files.append(JournalFile(user_id=journal.id, field_name='photo', filename='a.png',
+                                   original_filename='a.png', file_path='a.png'))
+    db.session.commit()
+
+    response = auth_client.get(f'/api/journals/{JOURNAL}/export')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    entries = JournalEntry.query.filter_by(journal_type=JOURNAL).order_by(JournalEntry.created_at).all()
+    assert lines == [e.to_dict() for e in entries]
+    assert lines[0]['files'][0]['filename'] == 'a.png'
+
+    response = auth_client.get(f'/api/journals/{JOURNAL}/export', query_string={'format': 'csv'})
+    assert response.mimetype == 'text/csv'
+    assert f'filename="{JOURNAL}.csv"' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert list(rows[0]) == ['id', 'created_at', 'title', 'mood', 'files']
+    assert [row['id'] for row in rows] == [e.id for e in entries]
+    assert rows[1]['title'] == 'запись 1' and rows[1]['mood'] == '1'
+    assert json.loads(rows[0]['files'])[0]['filename'] == 'a.png'
+
+
+def test_export_errors(auth_client, journal):
+    assert auth_client.get(f'/api/journals/{JOURNAL}/export', query_string={'format': 'xml'}).status_code == 400
+    assert auth_client.get('/api/journals/missing_journal/export').status_code == 404
+    assert auth_client.get('/api/tasks/export', query_string={'format': 'xml'}).status_code == 400
+
+
+def test_tasks_export_includes_list_memberships(auth_client, db_session, test_user):
+    lst = List(title='Export list', user_id=test_user.id)
+    tasks = [Task(title=f'export task {i}', user_id=test_user.id) for i in range(3)]
+    lst.tasks.extend(tasks[:2])
+    db_session.add_all([lst, *tasks])
+    db_session.commit()
+    try:
+        response = auth_client.get('/api/tasks/export')
+        exported = {task['id']: task for task in map(json.loads, response.get_data(as_text=True).splitlines())}
+        assert set(exported) == {task.id for task in Task.query.filter_by(user_id=test_user.id)}
+        assert exported[tasks[0].id] == tasks[0].to_dict()
+        assert exported[tasks[0].id]['lists_ids'] == [lst.id]
+        assert exported[tasks[2].id]['lists_ids'] == []
+
+        response = auth_client.get('/api/tasks/export', query_string={'format': 'csv'})
+        rows = {row['id']: row for row in csv.DictReader(io.StringIO(response.get_data(as_text=True)))}
+        assert json.loads(rows[tasks[1].id]['lists_ids']) == [lst.id]
+        assert rows[tasks[1].id]['title'] == 'export task 1'
+    finally:
+        lst.tasks.clear()
+        for task in tasks:
+            db_session.delete(task)
+        db_session.delete(lst)
+        db_session.commit()
+
+
+def test_export_streams_while_reading_entries(auth_client, journal, monkeypatch):
+    """Первый кусок ответа уходит клиенту до того, как прочитаны все записи"""
+    count = 3000
+    _add_entries(journal.id, count)
+    iter_dicts = JournalEntry.iter_dicts
+    read = []
+
+    def counting_iter_dicts(*args, **kwargs):
+        for entry in iter_dicts(*args, **kwargs):
+            read.append(entry['id'])
+            yield entry
+
+    monkeypatch.setattr(JournalEntry, 'iter_dicts', counting_iter_dicts)
+
+    response = auth_client.get(f'/api/journals/{JOURNAL}/export', buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks)
+    assert 0 < len(read) < count
+    body = first + b''.join(chunks)
+    response.close()
+
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert [line['id'] for line in lines] == read and len(read) == count
+    assert [line['data']['title'] for line in lines[:2]] == ['запись 0', 'запись 1']
+
+
+def _rss():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(not os.path.exists('/proc/self/status'), reason='RSS читается из /proc')
+def test_large_export_streams_with_bounded_memory(auth_client, journal, record_property):
+    """Бенчмарк: 200 тыс. записей выгружаются потоком, память процесса почти не растёт"""
+    count = 200_000
+    _add_entries(journal.id, count)
+
+    for export_format in ('ndjson', 'csv'):
+        db.session.expunge_all()
+        gc.collect()
+        baseline = peak = _rss()
+
+        response = auth_client.get(f'/api/journals/{JOURNAL}/export', query_string={'format': export_format},
+                                   buffered=False)
+        lines = size = 0
+        for chunk in response.response:
+            lines += chunk.count(b'\n')
+            size += len(chunk)
+            peak = max(peak, _rss())
+        response.close()
+
+        assert lines == count + (export_format == 'csv')
+        # Выгрузка занимает десятки мегабайт, а в памяти находится только текущая пачка
+        assert size > count * 50
+        record_property(f'{export_format}_rss_growth', peak - baseline)
+        assert peak - baseline < 48 * 1024 * 1024
@@ -0,0 +1,167 @@
+import random
+from collections import Counter
+
+import pytest
+from flask_jwt_extended import verify_jwt_in_request
+from sqlalchemy import event
+
+from app import db, db_utils
+from app.get_records_utils import get_all_filters
+from app.journals import facets, routes
+from app.journals.models import JournalEntry, JournalFacet, JournalFacetConfig, JournalSchema
+from app.maintenance import MAINTENANCE_JOBS, run_job
+
+JOURNAL = 'facet_test_journal'
+DROPDOWNS = ['reason', 'tags']
+MODULES = {JOURNAL: {'type': 'journal', 'filter_config': {'dropdown': DROPDOWNS}}}
+VALUES = ['a', 'b', 'a, b', ' c ,a', '', ',', 5, 2.5, True, None, ['x']]
+
+
+@pytest.fixture
+def journal(app, db_session, test_user, monkeypatch):
+    monkeypatch.setattr(facets, 'get_modules', lambda: MODULES)
+    monkeypatch.setattr(db_utils, 'get_modules', lambda: MODULES)
+    schema = JournalSchema(user_id=test_user.id, name=JOURNAL, display_name='Facets', fields=[])
+    db_session.add(schema)
+    db_session.commit()
+    yield test_user
+    JournalEntry.query.filter_by(journal_type=JOURNAL).delete()
+    JournalFacet.query.filter_by(journal_type=JOURNAL).delete()
+    db_session.delete(schema)
+    db_session.commit()
+
+
+@pytest.fixture
+def user_request(app, auth_client, journal):
+    def request_context(method='GET', json=None):
+        return app.test_request_context(method=method, json=json,
+                                        headers={'Authorization': f'Bearer {auth_client.__access_token__}'})
+    return request_context
+
+
+def _scanned_counts(user_id):
+    """Прежний способ: перебор всех записей журнала"""
+    counts = Counter()
+    for entry in JournalEntry.query.filter_by(user_id=user_id, journal_type=JOURNAL).all():
+        for col in DROPDOWNS:
+            raw = (entry.data or {}).get(col)
+            if raw is None:
+                continue
+            if isinstance(raw, str):
+                counts.update({(col, part) for part in (item.strip() for item in raw.split(',')) if part})
+            else:
+                counts[(col, str(raw))] += 1
+    return counts
+
+
+def _facet_counts(user_id):
+    rows = JournalFacet.query.filter_by(user_id=user_id, journal_type=JOURNAL).all()
+    return Counter({(row.field, row.value): row.count for row in rows})
+
+
+def _random_data(rng):
+    return {col: rng.choice(VALUES) for col in DROPDOWNS + ['comment'] if rng.random() < 0.8}
+
+
+def test_journal_routes_maintain_facets(auth_client, user_request, journal):
+    """Создание, изменение и удаление записей через маршруты журналов обновляют счётчики"""
+    rng = random.Random(5)
+    for _ in range(20):
+        response = auth_client.post(f'/api/journals/{JOURNAL}', json=_random_data(rng))
+        assert response.status_code == 201
+    assert _facet_counts(journal.id) == _scanned_counts(journal.id)
+
+    # id записей — строки, а маршруты изменения объявлены с <int:entry_id>, поэтому вызываем их напрямую
+    entries = JournalEntry.query.filter_by(user_id=journal.id, journal_type=JOURNAL).all()
+    for entry in entries[:10]:
+        with user_request('PUT', json=_random_data(rng)):
+            routes.update_journal(JOURNAL, entry.id)
+    for entry in entries[10:15]:
+        with user_request('DELETE'):
+            routes.delete_journal(JOURNAL, entry.id)
+
+    assert _facet_counts(journal.id) == _scanned_counts(journal.id)
+    assert all(count > 0 for count in _facet_counts(journal.id).values())
+
+
+def test_save_to_base_modules_maintains_facets(user_request, journal):
+    """create и update в save_to_base_modules обновляют счётчики и сохраняют данные"""
+    with user_request('POST'):
+        verify_jwt_in_request()
+        created = db_utils.save_to_base_modules(JOURNAL, 'create', {'reason': 'a, b', 'tags': 'x'})
+        db_utils.save_to_base_modules(JOURNAL, 'create', {'reason': 'b'})
+        entry_id = created['params']['id']
+        db_utils.save_to_base_modules(JOURNAL, 'update', {'id': entry_id, 'reason': 'c'})
+
+    db.session.expire_all()
+    assert db.session.get(JournalEntry, entry_id).data == {'reason': 'c', 'tags': 'x'}
+    assert _facet_counts(journal.id) == Counter({('reason', 'b'): 1, ('reason', 'c'): 1, ('tags', 'x'): 1})
+    assert _facet_counts(journal.id) == _scanned_counts(journal.id)
+
+
+def test_get_all_filters_reads_facets_only(user_request, journal):
+    """get_all_filters — один запрос к индексу, без перебора записей"""
+    with user_request('POST'):
+        verify_jwt_in_request()
+        for data in ({'reason': 'b, a', 'tags': 5}, {'reason': 'a'}, {'tags': True}):
+            db_utils.save_to_base_modules(JOURNAL, 'create', data)
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response, status = get_all_filters(JOURNAL)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        counts, _ = get_all_filters(JOURNAL, with_counts=True)
+
+    assert status == 200
+    assert response.get_json() == {'reason': ['a', 'b'], 'tags': ['5', 'True']}
+    assert counts.get_json() == {'reason': {'a': 2, 'b': 1}, 'tags': {'5': 1, 'True': 1}}
+    assert [s for s in statements if 'content.' in s] == [s for s in statements if 'journal_facets' in s]
+    assert len([s for s in statements if 'journal_facets' in s]) == 1
+
+
+def test_rebuild_matches_incremental(app, auth_client, journal):
+    """Пересчёт с нуля даёт те же счётчики, что и инкрементальное обновление"""
+    rng = random.Random(11)
+    for _ in range(30):
+        auth_client.post(f'/api/journals/{JOURNAL}', json=_random_data(rng))
+    incremental = _facet_counts(journal.id)
+    JournalFacet.query.filter_by(user_id=journal.id).update({'count': 100})
+    db.session.commit()
+
+    assert facets.rebuild_facets(journal.id) == 1
+    assert _facet_counts(journal.id) == incremental == _scanned_counts(journal.id)
+
+    result = app.test_cli_runner().invoke(args=['rebuild-journal-facets'])
+    assert result.exit_code == 0
+    assert 'Пересчитано журналов' in result.output
+
+
+def test_sync_rebuilds_journals_with_changed_filter_config(app, auth_client, journal, monkeypatch):
+    """Счётчики пересчитываются, пока не построены и после изменения filter_config"""
+    rng = random.Random(17)
+    for _ in range(10):
+        auth_client.post(f'/api/journals/{JOURNAL}', json=_random_data(rng))
+    incremental = _facet_counts(journal.id)
+    JournalFacet.query.delete()
+    db.session.commit()
+
+    # Таблица после миграции пуста: журнал считается устаревшим и пересчитывается
+    jobs = {name: func for name, _, func in MAINTENANCE_JOBS}
+    assert run_job(app, 'sync_journal_facets', jobs['sync_journal_facets']) == {'stale': 1, 'journals': 1}
+    assert _facet_counts(journal.id) == incremental
+    assert facets.sync_facets() == {'stale': 0, 'journals': 0}
+
+    monkeypatch.setattr(facets, 'get_modules',
+                        lambda: {JOURNAL: {'type': 'journal', 'filter_config': {'dropdown': ['tags']}}})
+    assert facets.stale_journal_types() == {JOURNAL}
+    result = app.test_cli_runner().invoke(args=['rebuild-journal-facets', '--stale'])
+    assert result.exit_code == 0 and 'Пересчитано журналов: 1' in result.output
+    assert _facet_counts(journal.id) == Counter({key: count for key, count in incremental.items() if key[0] == 'tags'})
+
+    # Журнал убран из filter_config: его счётчики удаляются
+    monkeypatch.setattr(facets, 'get_modules', lambda: {})
+    assert facets.sync_facets() == {'stale': 1, 'journals': 0}
+    assert _facet_counts(journal.id) == Counter() and JournalFacetConfig.query.count() == 0
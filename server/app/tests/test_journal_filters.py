@@ -0,0 +1,147 @@
+import json
+import math
+import random
+
+import pytest
+from flask_jwt_extended import verify_jwt_in_request
+from hypothesis import HealthCheck, given, settings, strategies as st
+from sqlalchemy import text
+
+from app import db
+from app import get_records_utils
+from app.get_records_utils import _record_matches, fetch_filtered_records
+from app.journals.models import JournalEntry
+
+JOURNAL = 'filter_test_journal'
+FILTER_CONFIG = {
+    'date': ['publish_date', 'created_at'],
+    'range': ['score'],
+    'dropdown': ['reason', 'score', 'tags'],
+    'text': ['comment', 'tags'],
+}
+FIELDS = ('publish_date', 'score', 'reason', 'tags', 'comment')
+VALUES = [
+    '', 'a', 'abc', 'ABC', 'Abc def', 'bca', 'ä', 'я', 'яблоко', '日本',
+    '2025-01-01', '2025-01-10', '2025-1-5', '2025-01-10T12:00', '2025-02-01',
+    '0', '1', '2', '10', ' 3 ', '-1.5', '1e2', '1_0', '1__0', 'inf', '-inf', 'nan', 'NaN',
+    '.5', '1e100', '-1e400', '2' * 150,
+    0, 1, 2.5, -3, 10, True, False, None,
+    [], ['a'], ['a', 'b'], ['abc', 1], {}, {'a': 1}, {'abc': 'x'},
+]
+
+
+@pytest.fixture
+def journal(app, db_session, test_user, monkeypatch):
+    """Журнал из 300 записей со смешанными типами значений в полях фильтров"""
+    monkeypatch.setattr(get_records_utils, 'get_modules',
+                        lambda: {JOURNAL: {'type': 'journal', 'filter_config': FILTER_CONFIG}})
+    rng = random.Random(13)
+    for _ in range(300):
+        data = {field: rng.choice(VALUES) for field in FIELDS if rng.random() < 0.85}
+        db_session.add(JournalEntry(user_id=test_user.id, journal_type=JOURNAL, data=data))
+    db_session.add(JournalEntry(user_id=test_user.id, journal_type=JOURNAL, data=None))
+    db_session.commit()
+    yield test_user
+    JournalEntry.query.filter_by(journal_type=JOURNAL).delete()
+    db_session.commit()
+
+
+@pytest.fixture
+def user_request(app, auth_client, journal):
+    with app.test_request_context(headers={'Authorization': f'Bearer {auth_client.__access_token__}'}):
+        verify_jwt_in_request()
+        yield
+
+
+def _legacy_ids(filters):
+    """Прежняя семантика: все записи загружаются и фильтруются в Python.
+    Возвращает (подходящие id, id записей, на которых прежний код падал)."""
+    matched, failed = set(), set()
+    for entry in JournalEntry.query.filter_by(journal_type=JOURNAL).all():
+        record = {**(entry.data or {}), 'id': entry.id, 'created_at': entry.created_at.isoformat(), 'files': []}
+        try:
+            if _record_matches(record, filters, FILTER_CONFIG['date'], FILTER_CONFIG['range'],
+                               FILTER_CONFIG['dropdown'], FILTER_CONFIG['text']):
+                matched.add(entry.id)
+        except TypeError:
+            failed.add(entry.id)
+    return matched, failed
+
+
+dates = st.sampled_from(['', '2025', '2025-01-05', '2025-01-10', '2025-01-10T12:00', 'a', 'я', '1'])
+bounds = st.sampled_from([None, '', '0', '1', '2.5', '-1', '10', 'inf', '-inf', 'nan', 1, 10])
+options = st.sampled_from([v for v in VALUES if not isinstance(v, dict)])
+choices = st.one_of(st.sampled_from(['', 'a', 'abc', 'я', '1', '10']), st.lists(options, max_size=3))
+needles = st.sampled_from(['', 'a', 'b', 'A', 'abc', 'bc', 'я', '2025', '1'])
+
+filter_sets = st.fixed_dictionaries({}, optional={
+    'publish_date_from': dates, 'publish_date_to': dates,
+    'created_at_from': st.sampled_from(['', '2000', '2100']),
+    'score_min': bounds, 'score_max': bounds,
+    'reason': choices, 'score': choices, 'tags': choices,
+    'comment': needles,
+})
+
+
+@given(filters=filter_sets)
+@settings(max_examples=300, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+def test_sql_filters_match_python_semantics(user_request, filters):
+    """SQL-фильтры отбирают те же записи, что и прежняя фильтрация в Python"""
+    matched, failed = _legacy_ids(filters)
+    try:
+        records, columns = fetch_filtered_records(JOURNAL, filters)
+    except TypeError:
+        # Фильтр, который проверяется в Python, падает так же, как раньше
+        assert failed
+        return
+    ids = {record['id'] for record in records}
+
+    assert ids - failed == matched
+    # Там, где прежний код падал на сравнении разных типов, запись не проходит фильтр
+    assert not ids & failed
+
+
+def test_journal_number_follows_python_float(app, db_session):
+    """journal_number разбирает строки и числа JSON так же, как float(); не число — NaN"""
+    values = ['1_0', '1_000.000_1e1_0', '1__0', '_1', 'inf', '-Infinity', ' nan ', '1e100', '1e400', '-1e400',
+              '1e-400', '1e99999', '1.7976931348623159e308', '5e-324', '9' * 400, '0.' + '0' * 400 + '1e300',
+              '0x10', ' 2.5 ', '-.5e-3', '5.', '.', '1e', 7, 1.5e99, 1.5e300, -0.0, True, False]
+    numbers = [db.session.execute(text('SELECT content.journal_number(CAST(:value AS json))'),
+                                  {'value': json.dumps(value)}).scalar() for value in values]
+
+    def python_float(value):
+        try:
+            return float(value)
+        except ValueError:
+            return math.nan
+
+    expected = [python_float(value) for value in values]
+    assert [str(n) for n in numbers] == [str(n) for n in expected]
+
+
+def test_text_filter_is_substring_for_strings_and_membership_for_lists(user_request):
+    """Текстовый фильтр: подстрока в строке, элемент списка или ключ объекта"""
+    records, _ = fetch_filtered_records(JOURNAL, {'comment': 'a'})
+    for record in records:
+        assert 'a' in record['comment']
+    assert {type(record['comment']) for record in records} == {str, list, dict}
+
+
+def test_unknown_journal_is_rejected(user_request):
+    with pytest.raises(ValueError):
+        fetch_filtered_records('missing_journal', {})
+
+
+@pytest.mark.parametrize('filters, index', [
+    ({'publish_date_from': '2025-01-05', 'publish_date_to': '2025-01-31'}, 'ix_journal_entries_publish_date'),
+    ({'score_min': '1', 'score_max': '5'}, 'ix_journal_entries_score'),
+])
+def test_filters_use_expression_indexes(journal, filters, index):
+    """Предикаты даты и диапазона совпадают с выражениями индексов"""
+    clauses = get_records_utils._date_clauses('publish_date', filters) + get_records_utils._range_clauses('score', filters)
+    query = JournalEntry.query.filter(JournalEntry.user_id == journal.id, JournalEntry.journal_type == JOURNAL, *clauses)
+    sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    db.session.execute(text('SET LOCAL enable_seqscan = off'))
+    plan = '\n'.join(row[0] for row in db.session.execute(text('EXPLAIN ' + sql)))
+    db.session.rollback()
+    assert index in plan
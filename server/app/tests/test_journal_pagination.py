@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, text
+
+from app import db
+from app.journals.models import JournalEntry, JournalFile, JournalSchema
+
+JOURNAL = 'pagination_test_journal'
+
+
+@pytest.fixture
+def journal(db_session, test_user, test_user2):
+    """25 записей, по три с одинаковым created_at, у каждой по файлу"""
+    schema = JournalSchema(user_id=test_user.id, name=JOURNAL, display_name='Pages', fields=[])
+    db_session.add(schema)
+    start = datetime(2025, 1, 1)
+    for i in range(25):
+        entry = JournalEntry(user_id=test_user.id, journal_type=JOURNAL, created_at=start + timedelta(hours=i // 3),
+                             data={'title': f'запись {i}', 'mood': i % 5} if i % 4 else {'title': f'запись {i}'})
+        entry.files.append(JournalFile(user_id=test_user.id, field_name='photo', filename=f'{i}.png',
+                                       original_filename=f'{i}.png', file_path=f'{i}.png'))
+        db_session.add(entry)
+    db_session.add(JournalEntry(user_id=test_user2.id, journal_type=JOURNAL, data={'title': 'чужая'}))
+    db_session.commit()
+    yield test_user
+    JournalFile.query.filter(JournalFile.entry_id.in_(
+        db.session.query(JournalEntry.id).filter_by(journal_type=JOURNAL))).delete(synchronize_session=False)
+    JournalEntry.query.filter_by(journal_type=JOURNAL).delete()
+    db_session.delete(schema)
+    db_session.commit()
+
+
+def _pages(client, **params):
+    cursor, pages = None, []
+    while True:
+        response = client.get(f'/api/journals/{JOURNAL}', query_string={**params, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append(response.get_json()['results'])
+        cursor = response.get_json()['next_cursor']
+        if not cursor:
+            return pages
+
+
+def test_pages_cover_journal_in_order(auth_client, journal):
+    """Страницы по ключу (created_at, id) без пропусков и повторов, только свои записи"""
+    pages = _pages(auth_client, limit=4)
+    assert [len(page) for page in pages] == [4] * 6 + [1]
+
+    entries = [entry for page in pages for entry in page]
+    expected = (JournalEntry.query.filter_by(user_id=journal.id, journal_type=JOURNAL)
+                .order_by(JournalEntry.created_at, JournalEntry.id).all())
+    assert [entry['id'] for entry in entries] == [entry.id for entry in expected]
+    assert all(len(entry['files']) == 1 for entry in entries)
+
+
+def test_files_are_loaded_in_one_query(auth_client, journal):
+    """Файлы всех записей страницы загружаются одним запросом, а не по запросу на запись"""
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = auth_client.get(f'/api/journals/{JOURNAL}', query_string={'limit': 20})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert len(response.get_json()['results']) == 20
+    assert len([s for s in statements if 'FROM content.journal_files' in s]) == 1
+
+
+def test_field_projection(auth_client, journal):
+    """fields оставляет в data только выбранные ключи"""
+    pages = _pages(auth_client, limit=10, fields='mood, missing')
+    entries = [entry for page in pages for entry in page]
+    assert len(entries) == 25
+    assert all(set(entry['data']) <= {'mood'} for entry in entries)
+    assert sum(1 for entry in entries if entry['data'] == {}) == 7
+    assert all(entry['files'] for entry in entries)
+
+
+def test_invalid_cursor_and_missing_journal(auth_client, journal):
+    response = auth_client.get(f'/api/journals/{JOURNAL}', query_string={'cursor': 'broken'})
+    assert response.status_code == 400
+    assert auth_client.get('/api/journals/missing_journal').status_code == 404
+
+
+def test_page_query_uses_created_index(journal):
+    """Страница читается из индекса в нужном порядке, без сортировки всего журнала"""
+    db.session.execute(text('SET LOCAL enable_seqscan = off'))
+    db.session.execute(text('SET LOCAL enable_sort = off'))
+    plan = '\n'.join(row[0] for row in db.session.execute(text(
+        "EXPLAIN SELECT id FROM content.journal_entries WHERE user_id = :user_id AND journal_type = :journal_type "
+        "AND (created_at, id) > (:created_at, '') ORDER BY created_at, id LIMIT 21"),
+        {'user_id': journal.id, 'journal_type': JOURNAL, 'created_at': datetime(2025, 1, 1, 4)}))
+    db.session.rollback()
+    assert 'ix_journal_entries_created' in plan
@@ -0,0 +1,112 @@
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.journals.models import SEARCH_CONFIG, JournalEntry, JournalSchema
+
+JOURNAL = 'search_test_journal'
+ENTRIES = [
+    {'content': 'гуляли в парке с собакой, собака довольна', 'mood': 'хорошо'},
+    {'content': 'весь день работал над отчётом', 'comment': 'собака спала'},
+    {'content': 'парк закрыт на ремонт', 'tags': ['прогулка', 'собака']},
+    {'content': 'читал книгу про собак и парки, собаки в парке', 'score': 5},
+    {'content': 'ничего интересного'},
+]
+
+
+@pytest.fixture
+def journal(db_session, auth_client, auth_client2, test_user, test_user2):
+    schemas = [JournalSchema(user_id=user.id, name=JOURNAL, display_name='Search', fields=[])
+               for user in (test_user, test_user2)]
+    db_session.add_all(schemas)
+    db_session.commit()
+    for data in ENTRIES:
+        assert auth_client.post(f'/api/journals/{JOURNAL}', json=data).status_code == 201
+    auth_client2.post(f'/api/journals/{JOURNAL}', json={'content': 'чужая собака в парке'})
+    yield test_user
+    JournalEntry.query.filter_by(journal_type=JOURNAL).delete()
+    for schema in schemas:
+        db_session.delete(schema)
+    db_session.commit()
+
+
+def _search(client, **params):
+    response = client.get(f'/api/journals/{JOURNAL}/search', query_string=params)
+    return response.status_code, response.get_json()
+
+
+def test_search_ranks_and_highlights(auth_client, journal):
+    """Совпадения упорядочены по релевантности, фрагменты подсвечены по полям"""
+    status, data = _search(auth_client, q='собака парк')
+
+    assert status == 200
+    contents = [result['data']['content'] for result in data['results']]
+    # Обе формы слова находятся через стемминг, чужие записи не видны
+    assert set(contents) == {ENTRIES[0]['content'], ENTRIES[2]['content'], ENTRIES[3]['content']}
+    ranks = [result['rank'] for result in data['results']]
+    assert ranks == sorted(ranks, reverse=True)
+    assert contents[0] == ENTRIES[3]['content']
+
+    first = data['results'][0]
+    assert set(first['highlights']) == {'content'}
+    assert '<mark>собак</mark>' in first['highlights']['content']
+    assert data['next_cursor'] is None
+
+
+def test_search_covers_all_string_fields(auth_client, journal):
+    status, data = _search(auth_client, q='спала')
+    assert [result['data']['comment'] for result in data['results']] == ['собака спала']
+    assert data['results'][0]['highlights'] == {'comment': 'собака <mark>спала</mark>'}
+
+    # Строки во вложенных списках тоже индексируются
+    status, data = _search(auth_client, q='прогулка')
+    assert [result['data']['content'] for result in data['results']] == [ENTRIES[2]['content']]
+
+
+def test_search_keyset_pagination(auth_client, journal):
+    """Страницы по ключу (rank, id) без пропусков и повторов"""
+    _, full = _search(auth_client, q='собака', limit=100)
+    seen, cursor = [], None
+    while True:
+        params = {'q': 'собака', 'limit': 2}
+        if cursor:
+            params['cursor'] = cursor
+        status, page = _search(auth_client, **params)
+        assert status == 200 and len(page['results']) <= 2
+        seen += [result['id'] for result in page['results']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert len(full['results']) == 4
+    assert seen == [result['id'] for result in full['results']]
+
+
+def test_search_vector_follows_updates(auth_client, journal):
+    """Вектор поиска пересчитывается базой при изменении записи"""
+    entry = JournalEntry.query.filter_by(user_id=journal.id, journal_type=JOURNAL).filter(
+        JournalEntry.data['content'].as_string() == 'ничего интересного').one()
+    entry.data = {'content': 'вечером пришёл кот'}
+    db.session.commit()
+
+    _, data = _search(auth_client, q='кот')
+    assert [result['id'] for result in data['results']] == [entry.id]
+    _, data = _search(auth_client, q='интересного')
+    assert data['results'] == []
+
+
+def test_search_uses_gin_index(journal):
+    """Поиск идёт по GIN-индексу вектора, без перебора записей"""
+    db.session.execute(text('SET LOCAL enable_seqscan = off'))
+    plan = '\n'.join(row[0] for row in db.session.execute(text(
+        "EXPLAIN SELECT id FROM content.journal_entries "
+        "WHERE search_vector @@ websearch_to_tsquery(CAST(:config AS regconfig), :q)"),
+        {'config': SEARCH_CONFIG, 'q': 'собака'}))
+    db.session.rollback()
+    assert 'ix_journal_entries_search' in plan
+
+
+def test_search_errors(auth_client, journal):
+    assert _search(auth_client, q='')[0] == 400
+    assert _search(auth_client, q='собака', cursor='not-a-cursor')[0] == 400
+    response = auth_client.get('/api/journals/missing_journal/search', query_string={'q': 'собака'})
+    assert response.status_code == 404
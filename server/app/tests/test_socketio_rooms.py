@@ -0,0 +1,95 @@
+import json
+import time
+import uuid
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import socketio
+from app.socketio_utils import notify_data_update, notify_task_change
+
+
+def _connect(app, namespace, user_id):
+    with app.app_context():
+        token = create_access_token(identity=str(user_id))
+    return socketio.test_client(app, namespace=namespace, auth={'token': token})
+
+
+def _received_bytes(client, namespace):
+    return sum(len(json.dumps(packet['args'])) for packet in client.get_received(namespace))
+
+
+def test_connect_requires_token(app):
+    """Подключение к /updates и /chat без JWT отклоняется"""
+    for namespace in ('/updates', '/chat'):
+        client = socketio.test_client(app, namespace=namespace)
+        assert not client.is_connected(namespace)
+
+        client = socketio.test_client(app, namespace=namespace, auth={'token': 'not-a-jwt'})
+        assert not client.is_connected(namespace)
+
+
+def test_updates_are_scoped_to_user_room(app):
+    """Уведомления получают только сокеты пользователя, чьи данные изменились"""
+    owner = _connect(app, '/updates', 'owner')
+    owner_second_tab = _connect(app, '/updates', 'owner')
+    stranger = _connect(app, '/updates', 'stranger')
+    for client in (owner, owner_second_tab, stranger):
+        assert client.is_connected('/updates')
+        client.get_received('/updates')
+
+    notify_data_update('owner', tasksVersion=7)
+    notify_task_change('owner', 'added', {'id': 'task'}, lists_delta={'lists': []})
+
+    for client in (owner, owner_second_tab):
+        events = [packet['name'] for packet in client.get_received('/updates')]
+        assert events == ['data_updated', 'task_changed']
+    assert stranger.get_received('/updates') == []
+
+
+def test_chat_messages_are_scoped_to_user_room(app, auth_client, test_user, test_user2):
+    """Сообщения чата отправляются только в комнату владельца беседы"""
+    owner = _connect(app, '/chat', test_user.id)
+    stranger = _connect(app, '/chat', test_user2.id)
+    owner.get_received('/chat')
+    stranger.get_received('/chat')
+
+    from app.main.handlers import save_and_emit_message
+    with app.app_context():
+        save_and_emit_message(test_user.id, 'hello')
+
+    assert [packet['name'] for packet in owner.get_received('/chat')] == ['message']
+    assert stranger.get_received('/chat') == []
+
+
+@pytest.mark.parametrize('events', [200])
+def test_emit_cost_independent_of_connected_users(app, events):
+    """
+    Нагрузочный тест: CPU и объем отправленных данных на одно событие
+    не растут с числом подключенных пользователей.
+    """
+    payload = {'id': str(uuid.uuid4()), 'title': 'x' * 200}
+    results = {}
+    for users_count in (5, 100):
+        clients = [_connect(app, '/updates', f'load-user-{users_count}-{i}') for i in range(users_count)]
+        for client in clients:
+            client.get_received('/updates')
+        target = f'load-user-{users_count}-0'
+
+        cpu_samples = []
+        for _ in range(3):
+            started = time.process_time()
+            for _ in range(events):
+                notify_task_change(target, 'updated', payload)
+            cpu_samples.append((time.process_time() - started) / events)
+
+        sent_bytes = sum(_received_bytes(client, '/updates') for client in clients)
+        results[users_count] = (min(cpu_samples), sent_bytes / (3 * events))
+        for client in clients:
+            client.disconnect('/updates')
+
+    cpu_small, bytes_small = results[5]
+    cpu_large, bytes_large = results[100]
+    assert bytes_small == bytes_large
+    # 20x больше пользователей: при рассылке всем стоимость выросла бы в ~20 раз
+    assert cpu_large < cpu_small * 4 + 1e-4
@@ -0,0 +1,109 @@
+import uuid
+import datetime
+
+import pytest
+from sqlalchemy import event, insert
+
+from app import db
+from app.main.models import User
+from app.maintenance import MAINTENANCE_JOBS, run_job
+from app.subscription_models import UserSubscription
+from app.subscription_maintenance import expire_subscriptions
+
+USERS = 300
+NOW = datetime.datetime(2025, 6, 1, 12, 0)
+
+
+@pytest.fixture
+def subscribers(app, db_session):
+    """300 пользователей Premium с подписками, истекающими в течение 30 дней"""
+    user_ids = [str(uuid.uuid4()) for _ in range(USERS)]
+    db.session.execute(insert(User), [
+        {'user_id': user_id, 'user_name': f'Subscriber {i}', 'access_level_id': 3, 'modules': []}
+        for i, user_id in enumerate(user_ids)
+    ])
+    db.session.execute(insert(UserSubscription), [
+        {'id': str(uuid.uuid4()), 'user_id': user_id, 'start_date': NOW, 'is_active': True,
+         'end_date': NOW + datetime.timedelta(days=i % 30 + 1)}
+        for i, user_id in enumerate(user_ids)
+    ])
+    db.session.commit()
+    yield user_ids
+    UserSubscription.query.filter(UserSubscription.user_id.in_(user_ids)).delete(synchronize_session=False)
+    User.query.filter(User.user_id.in_(user_ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _levels(user_ids):
+    rows = db.session.query(User.access_level_id, db.func.count()).filter(
+        User.user_id.in_(user_ids)).group_by(User.access_level_id).all()
+    return dict(rows)
+
+
+def test_expiry_follows_the_clock(subscribers):
+    """Перемотка часов: с каждым запуском истекают ровно подписки с прошедшей датой"""
+    assert expire_subscriptions(now=NOW) == {'expired': 0, 'downgraded': 0}
+
+    assert expire_subscriptions(now=NOW + datetime.timedelta(days=10, hours=1)) == {'expired': 100, 'downgraded': 100}
+    db.session.expire_all()
+    assert _levels(subscribers) == {1: 100, 3: 200}
+
+    # Повторный запуск в тот же момент ничего не меняет
+    assert expire_subscriptions(now=NOW + datetime.timedelta(days=10, hours=1)) == {'expired': 0, 'downgraded': 0}
+
+    assert expire_subscriptions(now=NOW + datetime.timedelta(days=40)) == {'expired': 200, 'downgraded': 200}
+    db.session.expire_all()
+    assert _levels(subscribers) == {1: USERS}
+    assert UserSubscription.query.filter(UserSubscription.user_id.in_(subscribers),
+                                         UserSubscription.is_active == True).count() == 0
+
+
+def test_expiry_keeps_other_access(subscribers):
+    """Не понижаются пользователи без истёкшей подписки и с другой действующей подпиской"""
+    renewed, manual = subscribers[0], str(uuid.uuid4())
+    db.session.add(UserSubscription(user_id=renewed, start_date=NOW, end_date=None, is_active=True))
+    db.session.add(User(user_id=manual, user_name='Manual', access_level_id=2, modules=[]))
+    db.session.commit()
+
+    stats = expire_subscriptions(now=NOW + datetime.timedelta(days=40))
+
+    assert stats == {'expired': USERS, 'downgraded': USERS - 1}
+    db.session.expire_all()
+    assert db.session.get(User, renewed).access_level_id == 3
+    assert db.session.get(User, manual).access_level_id == 2
+    UserSubscription.query.filter_by(user_id=renewed).delete()
+    User.query.filter_by(user_id=manual).delete()
+    db.session.commit()
+
+
+def test_request_path_is_read_only(auth_client, db_session, test_user):
+    """Запрос пользователя с истёкшей подпиской ничего не пишет в БД"""
+    subscription = UserSubscription(user_id=test_user.user_id, start_date=NOW, is_active=True,
+                                    end_date=NOW + datetime.timedelta(days=1))
+    db_session.add(subscription)
+    db_session.commit()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = auth_client.get('/api/user/permissions')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert response.status_code == 200
+    assert all(statement.lstrip().upper().startswith('SELECT') for statement in statements)
+    assert db.session.get(UserSubscription, subscription.id).is_active is True
+    db_session.delete(subscription)
+    db_session.commit()
+
+
+def test_expiry_job_is_registered(app):
+    """Истечение подписок зарегистрировано как периодическая задача и доступно из CLI"""
+    jobs = {name: (interval_key, func) for name, interval_key, func in MAINTENANCE_JOBS}
+    assert jobs['expire_subscriptions'] == ('SUBSCRIPTION_EXPIRY_INTERVAL', expire_subscriptions)
+    assert run_job(app, 'expire_subscriptions', expire_subscriptions) is not None
+
+    result = app.test_cli_runner().invoke(args=['expire-subscriptions'])
+    assert result.exit_code == 0
+    assert 'Истекло подписок' in result.output
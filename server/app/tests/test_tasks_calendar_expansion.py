@@ -0,0 +1,115 @@
+import time
+import datetime
+
+import pytest
+
+from app.tasks.models import Task
+from app.tasks.calendar.models import TaskOverride
+from app.tasks.calendar.handlers import get_calendar_events
+
+
+def _seed_recurring(db_session, user_id, count, start=datetime.datetime(2025, 1, 1, 9, 0)):
+    tasks = []
+    for i in range(count):
+        task_start = start + datetime.timedelta(days=i % 7, minutes=i)
+        tasks.append(Task(
+            title=f'Series {i}',
+            user_id=user_id,
+            start=task_start,
+            end=task_start + datetime.timedelta(hours=1),
+            interval_id=(i % 5) + 1,
+            is_infinite=True,
+            color='#00ff00' if i % 2 else None,
+        ))
+    db_session.add_all(tasks)
+    db_session.commit()
+    return tasks
+
+
+def _reference_events(tasks, overrides, start_dt, end_dt):
+    """Прежнее разворачивание: to_dict() на каждое вхождение, override поверх него"""
+    override_map = {(o.task_id, o.date): o for o in overrides}
+    compared = ('title', 'note', 'status_id', 'completed_at', 'color', 'priority_id', 'type_id')
+    events = {}
+    for task in tasks:
+        duration = task.end - task.start
+        for occ in task.build_rrule().between(start_dt - duration, end_dt, inc=True):
+            base = task.to_dict()
+            override = override_map.get((task.id, occ.date()))
+            data = (override.data or {}) if override else {}
+            redundant = override is not None and all(data.get(f) == base.get(f) for f in compared) and all(
+                datetime.datetime.fromisoformat(data[f].replace('Z', '')).time()
+                == datetime.datetime.fromisoformat(base[f].replace('Z', '')).time()
+                for f in ('start', 'end'))
+            if override and not redundant and override.type == 'skip':
+                continue
+            instance = dict(base)
+            if override and not redundant:
+                instance.update(data)
+                instance.update(is_override=True, override_id=override.id, id=f'override_{override.id}')
+            else:
+                instance.update(is_override=False, id=f'instance_{task.id}_{occ.date().isoformat()}')
+            start_iso, end_iso = occ.isoformat() + 'Z', (occ + duration).isoformat() + 'Z'
+            instance.update(start=start_iso, end=end_iso, parent_task_id=task.id, is_instance=True,
+                            range={'start': start_iso, 'end': end_iso})
+            events[instance['id']] = instance
+    return events
+
+
+@pytest.mark.parametrize('with_overrides', [False, True])
+def test_instances_match_per_occurrence_serialization(db_session, test_user, with_overrides):
+    """Экземпляры из общего шаблона совпадают с поштучной сериализацией to_dict() прежнего кода"""
+    tasks = _seed_recurring(db_session, test_user.id, 15)
+    start_dt, end_dt = datetime.datetime(2025, 1, 1), datetime.datetime(2025, 2, 1)
+    overrides = []
+    if with_overrides:
+        for i, task in enumerate(tasks[:10]):
+            occurrences = task.build_rrule().between(start_dt, end_dt, inc=True)
+            date = occurrences[min(i % 3, len(occurrences) - 1)].date()
+            task_dict = task.to_dict()
+            if i % 4 == 0:
+                data = {'title': f'Moved {i}', 'start': '2025-01-01T15:30:00Z', 'color': '#ff0000'}
+            elif i % 4 == 1:
+                data = {}
+            else:
+                # Избыточный override: данные совпадают с задачей
+                data = {field: task_dict.get(field) for field in
+                        ('title', 'start', 'end', 'note', 'status_id', 'completed_at', 'color', 'priority_id', 'type_id')}
+            overrides.append(TaskOverride(task_id=task.id, user_id=test_user.id, date=date,
+                                          type='skip' if i % 4 == 1 or i % 4 == 3 else 'modified', data=data))
+        db_session.add_all(overrides)
+        db_session.commit()
+
+    data, status = get_calendar_events('2025-01-01T00:00:00Z', '2025-02-01T00:00:00Z', user_id=test_user.id)
+    expected = _reference_events(tasks, overrides, start_dt, end_dt)
+
+    assert status == 200
+    events = {event['id']: event for event in data['events']}
+    assert len(events) == len(data['events'])
+    assert events == expected
+    if with_overrides:
+        assert sum(event['is_override'] for event in events.values()) == 3
+        assert len(events) < len(_reference_events(tasks, [], start_dt, end_dt))
+
+
+@pytest.mark.benchmark
+def test_recurring_expansion_benchmark(db_session, test_user, record_property):
+    """Бенчмарк: разворачивание 500 повторяющихся задач на год общим шаблоном и поштучным to_dict()"""
+    tasks = _seed_recurring(db_session, test_user.id, 500)
+    start_dt, end_dt = datetime.datetime(2025, 1, 1), datetime.datetime(2026, 1, 1)
+
+    started = time.perf_counter()
+    expected = _reference_events(tasks, [], start_dt, end_dt)
+    reference_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    data, status = get_calendar_events('2025-01-01T00:00:00Z', '2026-01-01T00:00:00Z', user_id=test_user.id)
+    elapsed = time.perf_counter() - started
+
+    record_property('occurrences', len(data['events']))
+    record_property('per_occurrence_to_dict_s', round(reference_elapsed, 3))
+    record_property('template_s', round(elapsed, 3))
+    assert status == 200
+    assert len(data['parent_tasks']) == 500
+    assert len(data['events']) == len(expected)
+    assert elapsed < reference_elapsed
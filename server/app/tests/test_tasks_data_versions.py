@@ -0,0 +1,48 @@
+from app.tasks.models import DataVersion
+
+
+def test_versions_are_per_user(auth_client, auth_client2, test_user, test_user2):
+    """Изменение данных одним пользователем не меняет версию другого"""
+    before_other = DataVersion.get_version(test_user2.id, 'tasksVersion')
+
+    response = auth_client.post('/api/tasks/add_task', json={'title': 'Versioned task'})
+    assert response.status_code == 200
+
+    assert DataVersion.get_version(test_user.id, 'tasksVersion') == 1
+    assert DataVersion.get_version(test_user2.id, 'tasksVersion') == before_other
+
+
+def test_update_version_is_monotonic(db_session, test_user):
+    """Версия ключа растёт на единицу при каждом обновлении, ключи независимы"""
+    assert DataVersion.get_version(test_user.id, 'tasksVersion') == 0
+
+    versions = [DataVersion.update_version(test_user.id, 'tasksVersion') for _ in range(3)]
+
+    assert versions == [1, 2, 3]
+    assert DataVersion.get_versions(test_user.id, ['tasksVersion', 'taskTypesVersion']) == {
+        'tasksVersion': 3,
+        'taskTypesVersion': 0,
+    }
+
+
+def test_etag_matches_user_version(auth_client, test_user):
+    """ETag ответа на изменение совпадает с новой версией пользователя"""
+    response = auth_client.post('/api/tasks/task_types', json={'name': 'Work'})
+    assert response.status_code == 201
+
+    version = DataVersion.get_version(test_user.id, 'taskTypesVersion')
+    assert response.headers['ETag'] == str(version)
+
+
+def test_calendar_not_modified_for_other_users_change(auth_client, auth_client2):
+    """ETag календаря пользователя не сбрасывается изменениями другого пользователя"""
+    params = '?start=2025-01-01T00:00:00Z&end=2025-02-01T00:00:00Z'
+    first = auth_client.get('/api/tasks/get_calendar_events' + params)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    response = auth_client2.post('/api/tasks/add_task', json={'title': 'Other user task'})
+    assert response.status_code == 200
+
+    second = auth_client.get('/api/tasks/get_calendar_events' + params, headers={'If-None-Match': etag})
+    assert second.status_code == 304
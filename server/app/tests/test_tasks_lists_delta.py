@@ -0,0 +1,99 @@
+import json
+import datetime
+
+from app.tasks.list_handlers import get_lists_and_groups_data, get_lists_delta
+
+
+def _full_counts(user_id):
+    full = get_lists_and_groups_data(user_id=user_id)
+    lists = {item['id']: item for item in full['lists'] if item['type'] == 'list'}
+    groups = {item['id']: item for item in full['lists'] if item['type'] == 'group'}
+    default_lists = {item['id']: item for item in full['default_lists']}
+    return lists, groups, default_lists
+
+
+def test_delta_matches_full_recompute(auth_client, test_user, test_list, test_group):
+    """Счетчики из дельты совпадают с полным пересчетом боковой панели"""
+    test_group.lists.append(test_list)
+    from app import db
+    db.session.commit()
+
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    response = auth_client.post('/api/tasks/add_task', json={'title': 'In list', 'listId': test_list.id})
+    assert response.status_code == 200
+    task_id = json.loads(response.data)['task']['id']
+    auth_client.post('/api/tasks/add_task', json={'title': 'Today', 'listId': 'tasks', 'start': now, 'end': now})
+    auth_client.post('/api/tasks/add_task', json={'title': 'Important', 'listId': 'important'})
+
+    delta = get_lists_delta(test_user.id, task_ids=[task_id])
+    lists, groups, default_lists = _full_counts(test_user.id)
+
+    assert [item['id'] for item in delta['lists']] == [test_list.id]
+    assert delta['lists'][0]['unfinished_tasks_count'] == lists[test_list.id]['unfinished_tasks_count'] == 1
+    assert delta['lists'][0]['childes_order'] == lists[test_list.id]['childes_order']
+    assert delta['groups'] == [{'id': test_group.id, 'unfinished_tasks_count': groups[test_group.id]['unfinished_tasks_count']}]
+    for item in delta['default_lists']:
+        assert item['unfinished_tasks_count'] == default_lists[item['id']]['unfinished_tasks_count']
+    assert delta['memberships'] == {task_id: []}
+
+
+def test_delta_memberships(auth_client, test_user):
+    """Дельта сообщает, в какие стандартные списки входит задача"""
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    response = auth_client.post('/api/tasks/add_task', json={
+        'title': 'Important today', 'listId': 'tasks', 'is_important': True, 'start': now, 'end': now,
+    })
+    task_id = json.loads(response.data)['task']['id']
+
+    delta = get_lists_delta(test_user.id, task_ids=[task_id, 'missing'])
+
+    assert sorted(delta['memberships'][task_id]) == ['important', 'my_day', 'tasks']
+    assert delta['memberships']['missing'] == []
+
+
+def test_task_changed_emits_delta(auth_client, test_list, monkeypatch):
+    """task_changed содержит компактную дельту вместо полного lists_data"""
+    emitted = []
+    from app import socketio
+    monkeypatch.setattr(socketio, 'emit', lambda event, payload, **kwargs: emitted.append((event, payload)))
+
+    response = auth_client.post('/api/tasks/add_task', json={'title': 'Task', 'listId': test_list.id})
+    task_id = json.loads(response.data)['task']['id']
+    response = auth_client.delete('/api/tasks/del_task', json={'taskId': task_id, 'listId': test_list.id})
+    assert response.status_code == 200
+
+    payloads = [payload for event, payload in emitted if event == 'task_changed']
+    assert [p['action'] for p in payloads] == ['added', 'deleted']
+    for payload in payloads:
+        assert 'lists_data' not in payload
+        assert [item['id'] for item in payload['lists_delta']['lists']] == [test_list.id]
+    assert payloads[0]['lists_delta']['lists'][0]['unfinished_tasks_count'] == 1
+    assert payloads[1]['lists_delta']['lists'][0]['unfinished_tasks_count'] == 0
+    assert payloads[1]['lists_delta']['memberships'] == {task_id: []}
+
+
+def test_delta_skips_series_outside_today(db_session, test_user):
+    """Завершившаяся и ещё не начавшаяся серии не входят в «Мой день» ни в дельте, ни в полном пересчете"""
+    from app.tasks.models import Task
+    now = datetime.datetime.utcnow()
+    day = datetime.timedelta(days=1)
+    series = {
+        'finished': Task(title='Finished', user_id=test_user.id, interval_id=1,
+                         start=now - 60 * day, end=now - 40 * day),
+        'future': Task(title='Future', user_id=test_user.id, interval_id=1,
+                       start=now + 30 * day, end=now + 31 * day),
+        'current': Task(title='Current', user_id=test_user.id, interval_id=1, is_infinite=True,
+                        start=now - 2 * day, end=now - 2 * day + datetime.timedelta(hours=1)),
+    }
+    db_session.add_all(series.values())
+    db_session.commit()
+    task_ids = {name: task.id for name, task in series.items()}
+
+    delta = get_lists_delta(test_user.id, task_ids=list(task_ids.values()))
+    _, _, default_lists = _full_counts(test_user.id)
+
+    my_day = next(item for item in delta['default_lists'] if item['id'] == 'my_day')
+    assert my_day['unfinished_tasks_count'] == default_lists['my_day']['unfinished_tasks_count'] == 1
+    assert 'my_day' not in delta['memberships'][task_ids['finished']]
+    assert 'my_day' not in delta['memberships'][task_ids['future']]
+    assert 'my_day' in delta['memberships'][task_ids['current']]
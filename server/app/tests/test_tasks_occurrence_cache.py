@@ -0,0 +1,107 @@
+import time
+import random
+import datetime
+
+import pytest
+
+from app.tasks.models import Task
+from app.tasks.calendar.handlers import get_calendar_events
+from app.tasks.calendar.occurrences import OccurrenceCache, occurrence_cache
+
+
+def _make_task(db_session, user_id, interval_id, start, is_infinite=True, end=None):
+    task = Task(
+        title=f'Series {interval_id}',
+        user_id=user_id,
+        start=start,
+        end=end or start + datetime.timedelta(hours=1),
+        interval_id=interval_id,
+        is_infinite=is_infinite,
+    )
+    db_session.add(task)
+    db_session.commit()
+    return task
+
+
+def _event_starts(user_id, start, end):
+    data, status = get_calendar_events(start, end, user_id=user_id)
+    assert status == 200
+    return sorted(event['start'] for event in data['events'] if event.get('is_instance'))
+
+
+def test_cached_occurrences_match_rrule(db_session, test_user):
+    """Вхождения из кэша совпадают с rule.between для произвольных окон"""
+    rnd = random.Random(6)
+    cache = OccurrenceCache()
+    base = datetime.datetime(2025, 1, 31, 23, 30)
+    tasks = [
+        _make_task(db_session, test_user.id, interval_id, base + datetime.timedelta(days=interval_id))
+        for interval_id in range(1, 6)
+    ]
+    tasks.append(_make_task(db_session, test_user.id, 1, base, is_infinite=False, end=base + datetime.timedelta(days=40)))
+
+    for _ in range(100):
+        task = rnd.choice(tasks)
+        range_start = base + datetime.timedelta(days=rnd.randint(-60, 400), minutes=rnd.randint(0, 1440))
+        range_end = range_start + datetime.timedelta(days=rnd.randint(0, 120), minutes=rnd.randint(0, 1440))
+        expected = task.build_rrule().between(range_start, range_end, inc=True)
+        assert cache.occurrences(task, range_start, range_end) == expected
+    assert cache.hits > 0
+
+
+def test_edit_task_invalidates_cached_occurrences(auth_client, db_session, test_user):
+    """Изменение правила через edit_task сразу отражается в календаре"""
+    occurrence_cache.clear()
+    task_id = _make_task(db_session, test_user.id, 1, datetime.datetime(2025, 3, 3, 9, 0)).id
+
+    window = ('2025-03-01T00:00:00Z', '2025-04-01T00:00:00Z')
+    assert len(_event_starts(test_user.id, *window)) == 29
+    assert len(_event_starts(test_user.id, *window)) == 29
+    assert occurrence_cache.hits > 0
+
+    response = auth_client.put('/api/tasks/edit_task', json={'taskId': task_id, 'interval_id': 2})
+    assert response.status_code == 200
+    assert all(key[0] != task_id for key in occurrence_cache._entries)
+    assert _event_starts(test_user.id, *window) == [
+        '2025-03-03T09:00:00Z', '2025-03-10T09:00:00Z', '2025-03-17T09:00:00Z',
+        '2025-03-24T09:00:00Z', '2025-03-31T09:00:00Z',
+    ]
+
+
+def test_cache_is_bounded_lru(db_session, test_user):
+    """Кэш вытесняет давно не использованные окна"""
+    cache = OccurrenceCache(maxsize=3)
+    task = _make_task(db_session, test_user.id, 1, datetime.datetime(2025, 1, 1, 9, 0))
+
+    cache.occurrences(task, datetime.datetime(2025, 1, 1), datetime.datetime(2025, 3, 31))
+    assert len(cache) == 3
+    cache.occurrences(task, datetime.datetime(2025, 1, 1), datetime.datetime(2025, 1, 31))
+    cache.occurrences(task, datetime.datetime(2025, 4, 1), datetime.datetime(2025, 4, 30))
+
+    months = sorted(key[2].month for key in cache._entries)
+    assert months == [1, 3, 4]
+    cache.invalidate(task.id)
+    assert len(cache) == 0
+
+
+@pytest.mark.benchmark
+def test_occurrence_cache_benchmark(db_session, test_user, record_property):
+    """Бенчмарк: повторный запрос календаря на год с холодным и прогретым кэшем"""
+    start = datetime.datetime(2025, 1, 1, 9, 0)
+    for i in range(300):
+        _make_task(db_session, test_user.id, (i % 5) + 1, start + datetime.timedelta(days=i % 7, minutes=i))
+    occurrence_cache.clear()
+    window = ('2025-01-01T00:00:00Z', '2026-01-01T00:00:00Z')
+
+    started = time.perf_counter()
+    cold = get_calendar_events(*window, user_id=test_user.id)[0]
+    cold_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    warm = get_calendar_events(*window, user_id=test_user.id)[0]
+    warm_elapsed = time.perf_counter() - started
+
+    record_property('cold_s', round(cold_elapsed, 3))
+    record_property('warm_s', round(warm_elapsed, 3))
+    assert warm == cold
+    assert warm_elapsed < cold_elapsed
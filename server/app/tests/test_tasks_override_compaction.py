@@ -0,0 +1,97 @@
+import datetime
+
+from sqlalchemy import event
+
+from app import db
+from app.maintenance import MAINTENANCE_JOBS, run_job
+from app.tasks.models import Task
+from app.tasks.calendar.models import TaskOverride
+from app.tasks.calendar.handlers import get_calendar_events, OVERRIDE_COMPARED_FIELDS
+from app.tasks.calendar.maintenance import compact_overrides
+
+
+def _series(db_session, user_id, **kwargs):
+    start = datetime.datetime(2025, 3, 3, 9, 0)
+    params = dict(title='Daily', user_id=user_id, start=start, end=start + datetime.timedelta(hours=1),
+                  interval_id=1, is_infinite=True)
+    params.update(kwargs)
+    task = Task(**params)
+    db_session.add(task)
+    db_session.commit()
+    return task
+
+
+def _override(db_session, task, date, type='modified', data=None):
+    override = TaskOverride(task_id=task.id, user_id=task.user_id, date=date, type=type, data=data or {})
+    db_session.add(override)
+    db_session.commit()
+    return override.id
+
+
+def _redundant_data(task):
+    task_dict = task.to_dict()
+    return {field: task_dict.get(field) for field in OVERRIDE_COMPARED_FIELDS}
+
+
+def test_calendar_read_path_has_no_writes(db_session, test_user):
+    """Чтение календаря не удаляет избыточные override и не пишет в БД"""
+    task = _series(db_session, test_user.id)
+    override_id = _override(db_session, task, datetime.date(2025, 3, 4), data=_redundant_data(task))
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        data, status = get_calendar_events('2025-03-01T00:00:00Z', '2025-03-08T00:00:00Z', user_id=test_user.id)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert status == 200
+    assert all(statement.lstrip().upper().startswith('SELECT') for statement in statements)
+    assert db.session.get(TaskOverride, override_id) is not None
+    # Избыточный override отображается как обычный экземпляр
+    assert 'instance_%s_2025-03-04' % task.id in {event['id'] for event in data['events']}
+
+
+def test_compaction_removes_redundant_and_orphaned(db_session, test_user):
+    """Компактизация удаляет избыточные и осиротевшие override и сохраняет действующие"""
+    task = _series(db_session, test_user.id)
+    bounded = _series(db_session, test_user.id, is_infinite=False,
+                      end=datetime.datetime(2025, 3, 10, 10, 0))
+    one_off = _series(db_session, test_user.id, interval_id=None)
+
+    kept = [
+        _override(db_session, task, datetime.date(2025, 3, 5), data={'note': 'changed'}),
+        _override(db_session, task, datetime.date(2025, 3, 6), type='skip'),
+        _override(db_session, bounded, datetime.date(2025, 3, 9), data={'color': '#ff0000'}),
+    ]
+    removed = [
+        _override(db_session, task, datetime.date(2025, 3, 4), data=_redundant_data(task)),
+        # до начала серии
+        _override(db_session, task, datetime.date(2025, 3, 1), data={'note': 'before'}),
+        # после окончания ограниченной серии
+        _override(db_session, bounded, datetime.date(2025, 3, 20), data={'note': 'after'}),
+        # родитель больше не повторяется
+        _override(db_session, one_off, datetime.date(2025, 3, 4), data={'note': 'one-off'}),
+    ]
+
+    stats = compact_overrides(batch_size=2)
+
+    assert stats == {'scanned': 7, 'redundant': 1, 'orphaned': 3}
+    db_session.expire_all()
+    assert sorted(o.id for o in TaskOverride.query.all()) == sorted(kept)
+    assert compact_overrides()['scanned'] == len(kept)
+
+
+def test_compaction_job_is_registered(app, db_session, test_user):
+    """Компактизация зарегистрирована как периодическая задача и доступна из CLI"""
+    jobs = {name: (interval_key, func) for name, interval_key, func in MAINTENANCE_JOBS}
+    assert jobs['compact_overrides'] == ('OVERRIDE_COMPACTION_INTERVAL', compact_overrides)
+
+    task = _series(db_session, test_user.id)
+    _override(db_session, task, datetime.date(2025, 3, 4), data=_redundant_data(task))
+    assert run_job(app, 'compact_overrides', compact_overrides)['redundant'] == 1
+
+    result = app.test_cli_runner().invoke(args=['compact-overrides'])
+    assert result.exit_code == 0
+    assert 'Проверено: 0' in result.output
@@ -0,0 +1,84 @@
+import time
+import datetime
+
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from app.tasks.models import Task
+from app.tasks.calendar.recurrence import expand_occurrences, occurrences_between
+
+
+starts = st.datetimes(min_value=datetime.datetime(1995, 1, 1), max_value=datetime.datetime(2035, 12, 31))
+offsets = st.timedeltas(min_value=datetime.timedelta(days=-400), max_value=datetime.timedelta(days=1500))
+windows = st.timedeltas(min_value=datetime.timedelta(0), max_value=datetime.timedelta(days=400))
+
+
+@st.composite
+def series(draw):
+    start = draw(starts)
+    end = draw(st.one_of(st.none(), st.builds(lambda delta: start + delta, offsets)))
+    return Task(
+        id=str(draw(st.uuids())),
+        title='Series',
+        start=start,
+        end=end,
+        interval_id=draw(st.integers(min_value=1, max_value=5)),
+        is_infinite=draw(st.booleans()),
+    )
+
+
+@given(task=series(), low_offset=offsets, window=windows, duration=st.timedeltas(min_value=datetime.timedelta(minutes=1), max_value=datetime.timedelta(days=3)))
+@settings(max_examples=400, deadline=None)
+def test_matches_rrule_between(task, low_offset, window, duration):
+    """Векторизованный движок совпадает с rule.between(rng_start - duration, rng_end, inc=True)"""
+    rng_start = task.start + low_offset
+    rng_end = rng_start + window
+    expected = task.build_rrule().between(rng_start - duration, rng_end, inc=True)
+    assert occurrences_between(task, rng_start - duration, rng_end) == expected
+
+
+@given(tasks=st.lists(series(), min_size=1, max_size=20), low=starts, window=windows)
+@settings(max_examples=100, deadline=None)
+def test_batch_matches_single(tasks, low, window):
+    """Пакетное разворачивание совпадает с разворачиванием каждой задачи по отдельности"""
+    lows = [low] * len(tasks)
+    highs = [low + window] * len(tasks)
+    assert expand_occurrences(tasks, lows, highs) == [
+        task.build_rrule().between(low, low + window, inc=True) for task in tasks
+    ]
+
+
+def test_exotic_rules_fall_back_to_dateutil():
+    """Задачи без правила и с неизвестным интервалом обрабатываются через dateutil"""
+    start = datetime.datetime(2025, 1, 31, 9, 0)
+    no_rule = Task(id='no-rule', start=None, interval_id=1)
+    monthly = Task(id='monthly', start=start, interval_id=3, is_infinite=True)
+    result = expand_occurrences([no_rule, monthly], [start, start], [start + datetime.timedelta(days=120)] * 2)
+    assert result[0] == []
+    # 31-е число есть не в каждом месяце — такие месяцы пропускаются
+    assert [occ.month for occ in result[1]] == [1, 3, 5]
+
+
+@pytest.mark.benchmark
+def test_recurrence_engine_benchmark(record_property):
+    """Бенчмарк: вхождений в секунду для rrule и для векторизованного движка"""
+    start = datetime.datetime(2025, 1, 1, 9, 0)
+    tasks = [
+        Task(id=str(i), start=start + datetime.timedelta(days=i % 7, minutes=i), interval_id=(i % 5) + 1, is_infinite=True)
+        for i in range(2000)
+    ]
+    low, high = datetime.datetime(2025, 1, 1), datetime.datetime(2026, 1, 1)
+
+    started = time.perf_counter()
+    expected = [task.build_rrule().between(low, high, inc=True) for task in tasks]
+    rrule_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = expand_occurrences(tasks, [low] * len(tasks), [high] * len(tasks))
+    engine_elapsed = time.perf_counter() - started
+
+    total = sum(len(occurrences) for occurrences in result)
+    record_property('rrule_occurrences_per_s', round(total / rrule_elapsed))
+    record_property('vectorized_occurrences_per_s', round(total / engine_elapsed))
+    assert result == expected
+    assert engine_elapsed < rrule_elapsed
@@ -0,0 +1,101 @@
+import time
+import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.tasks.models import Task, TaskType, List, Interval
+
+
+class QueryCounter:
+    """Считает SQL-запросы, выполненные внутри блока with."""
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(db.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+def _seed_tasks(db_session, user_id, count):
+    task_types = [TaskType(user_id=user_id, name=f'Type {i}', color='#123456') for i in range(3)]
+    lists = [List(title=f'List {i}', user_id=user_id, order=i) for i in range(3)]
+    db_session.add_all(task_types + lists)
+    db_session.flush()
+
+    interval_ids = [interval.id for interval in Interval.query.order_by(Interval.id).all()]
+    start = datetime.datetime(2025, 1, 6, 9, 0)
+    tasks = []
+    for i in range(count):
+        task = Task(
+            title=f'Task {i}',
+            user_id=user_id,
+            start=start + datetime.timedelta(hours=i) if i % 2 else None,
+            end=start + datetime.timedelta(hours=i, minutes=30) if i % 2 else None,
+            completed_at=start if i % 7 == 0 else None,
+            is_background=i % 5 == 0,
+            interval_id=interval_ids[i % len(interval_ids)] if i % 4 == 1 else None,
+            is_infinite=i % 8 == 1,
+            type_id=task_types[i % 3].id if i % 3 else None,
+        )
+        task.lists = lists[:i % 3]
+        tasks.append(task)
+    db_session.add_all(tasks)
+    db_session.commit()
+    return [task.id for task in tasks]
+
+
+def test_to_dict_many_matches_to_dict(db_session, test_user):
+    """Пакетная сериализация дает тот же JSON, что и to_dict"""
+    task_ids = _seed_tasks(db_session, test_user.id, 40)
+    db_session.expire_all()
+    tasks = Task.query.filter(Task.id.in_(task_ids)).all()
+
+    bulk = Task.to_dict_many(tasks)
+    single = [task.to_dict() for task in tasks]
+
+    for bulk_dict, single_dict in zip(bulk, single):
+        bulk_dict['lists_ids'] = sorted(bulk_dict['lists_ids'])
+        single_dict['lists_ids'] = sorted(single_dict['lists_ids'])
+    assert bulk == single
+    assert Task.to_dict_many([]) == []
+
+
+def test_to_dict_many_query_count_is_constant(db_session, test_user):
+    """Количество запросов не зависит от числа задач: по одному на типы и на списки"""
+    task_ids = _seed_tasks(db_session, test_user.id, 60)
+    db_session.expire_all()
+    tasks = Task.query.filter(Task.id.in_(task_ids)).all()
+
+    with QueryCounter() as counter:
+        Task.to_dict_many(tasks)
+    assert counter.count == 2
+
+
+@pytest.mark.benchmark
+def test_serializer_benchmark(db_session, test_user, record_property):
+    """Бенчмарк: строк в секунду для to_dict по одной задаче и для to_dict_many"""
+    task_ids = _seed_tasks(db_session, test_user.id, 2000)
+
+    db_session.expire_all()
+    tasks = Task.query.filter(Task.id.in_(task_ids)).all()
+    started = time.perf_counter()
+    single = [task.to_dict() for task in tasks]
+    single_rate = len(single) / (time.perf_counter() - started)
+
+    db_session.expire_all()
+    tasks = Task.query.filter(Task.id.in_(task_ids)).all()
+    started = time.perf_counter()
+    bulk = Task.to_dict_many(tasks)
+    bulk_rate = len(bulk) / (time.perf_counter() - started)
+
+    record_property('to_dict_rows_per_s', round(single_rate))
+    record_property('to_dict_many_rows_per_s', round(bulk_rate))
+    assert len(bulk) == len(single) == 2000
+    assert bulk_rate > single_rate
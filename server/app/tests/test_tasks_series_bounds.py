@@ -0,0 +1,53 @@
+import datetime
+
+from app import db
+from app.tasks.models import Task
+from app.tasks.calendar.handlers import get_calendar_events
+
+
+def _series(db_session, user_id, start, end=None, interval_id=1, is_infinite=False):
+    task = Task(title='Series', user_id=user_id, start=start, end=end or start + datetime.timedelta(hours=1),
+                interval_id=interval_id, is_infinite=is_infinite)
+    db_session.add(task)
+    db_session.commit()
+    return task
+
+
+def test_series_bounds_follow_task_changes(auth_client, db_session, test_user):
+    """series_start/series_end пересчитываются при создании и изменении задачи"""
+    start = datetime.datetime(2025, 3, 1, 9, 0)
+    task = _series(db_session, test_user.id, start, end=datetime.datetime(2025, 3, 10, 9, 0))
+    assert task.series_start == start
+    # until + длительность экземпляра (9 дней)
+    assert task.series_end == datetime.datetime(2025, 3, 19, 9, 0)
+
+    response = auth_client.put('/api/tasks/edit_task', json={'taskId': task.id, 'is_infinite': True})
+    assert response.status_code == 200
+    db_session.expire_all()
+    task = db.session.get(Task, task.id)
+    assert (task.series_start, task.series_end) == (start, None)
+
+    response = auth_client.put('/api/tasks/edit_task', json={'taskId': task.id, 'interval_id': None})
+    assert response.status_code == 200
+    db_session.expire_all()
+    task = db.session.get(Task, task.id)
+    assert (task.series_start, task.series_end) == (None, None)
+
+
+def test_calendar_prunes_series_outside_window(db_session, test_user):
+    """Серии, которые не пересекают окно, не загружаются; пересекающие — разворачиваются как раньше"""
+    finished = _series(db_session, test_user.id, datetime.datetime(2024, 1, 1, 9, 0), end=datetime.datetime(2024, 1, 10, 10, 0))
+    future = _series(db_session, test_user.id, datetime.datetime(2030, 1, 1, 9, 0), is_infinite=True)
+    infinite = _series(db_session, test_user.id, datetime.datetime(2020, 1, 1, 9, 0), is_infinite=True)
+    # Экземпляры длятся 4 дня: вхождения до окна всё ещё его пересекают
+    long_instances = _series(db_session, test_user.id, datetime.datetime(2025, 3, 1, 9, 0),
+                             end=datetime.datetime(2025, 3, 5, 9, 0))
+
+    data, status = get_calendar_events('2025-03-07T00:00:00Z', '2025-03-08T00:00:00Z', user_id=test_user.id)
+
+    assert status == 200
+    assert {task['id'] for task in data['parent_tasks']} == {infinite.id, long_instances.id}
+    long_starts = sorted(event['start'] for event in data['events'] if event['parent_task_id'] == long_instances.id)
+    assert long_starts == ['2025-03-03T09:00:00Z', '2025-03-04T09:00:00Z', '2025-03-05T09:00:00Z']
+    assert finished.id not in {event['parent_task_id'] for event in data['events']}
+    assert future.id not in {event['parent_task_id'] for event in data['events']}
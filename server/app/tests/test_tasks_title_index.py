@@ -0,0 +1,127 @@
+import random
+import time
+
+import pytest
+from rapidfuzz import fuzz, process
+
+from app import db
+from app.secretary import get_best_matching_lists, get_best_task_and_list_id
+from app.tasks.list_handlers import add_object, edit_list
+from app.tasks.models import List, Task
+from app.tasks.task_handlers import add_task, del_task, edit_task, get_tasks
+from app.tasks.title_index import TitleIndex, title_index
+
+WORDS = ['купить', 'молоко', 'хлеб', 'позвонить', 'маме', 'отчёт', 'сдать', 'квартальный', 'записаться',
+         'к', 'врачу', 'оплатить', 'интернет', 'прочитать', 'книгу', 'убрать', 'гараж', 'Проект', 'Альфа']
+
+
+@pytest.fixture
+def index():
+    title_index.clear()
+    yield title_index
+    title_index.clear()
+
+
+def _title(rng):
+    return ' '.join(rng.sample(WORDS, rng.randint(1, 4)))
+
+
+def test_scores_match_token_sort_ratio(db_session, test_user):
+    """Сравнение подготовленных названий через fuzz.ratio даёт те же оценки, что token_sort_ratio"""
+    rng = random.Random(21)
+    tasks = [Task(title=_title(rng), user_id=test_user.id) for _ in range(300)]
+    db_session.add_all(tasks)
+    db_session.commit()
+    index = TitleIndex()
+
+    for _ in range(200):
+        query = _title(rng)
+        expected = process.extractOne(query.lower(), {t.id: t.title.lower() for t in tasks},
+                                      scorer=fuzz.token_sort_ratio, score_cutoff=80)
+        task_id, score = index.match_task(test_user.id, query)
+        if expected is None:
+            assert (task_id, score) == (None, 0)
+        else:
+            # При равных оценках победитель зависит от порядка строк, поэтому сверяется оценка найденной задачи
+            assert score == expected[1]
+            assert fuzz.token_sort_ratio(query.lower(), db.session.get(Task, task_id).title.lower()) == score
+
+
+def test_index_follows_changes_without_reloading(db_session, test_user, index, monkeypatch):
+    user_id = test_user.id
+    list_data, _ = add_object({'title': 'Покупки на неделю', 'type': 'list'}, user_id=user_id)
+    list_id = list_data['new_object']['id']
+    task_data, _ = add_task({'title': 'Купить молоко', 'listId': list_id}, user_id=user_id)
+    task_id = task_data['task']['id']
+
+    assert get_best_task_and_list_id('молоко купить', 'покупки на неделю', user_id) == (task_id, list_id)
+
+    # Дальше индекс не перечитывается из базы: изменения применяются после коммита
+    loads = []
+    load = index._load
+    monkeypatch.setattr(index, '_load', lambda user: loads.append(user) or load(user))
+    edit_task({'taskId': task_id, 'title': 'Купить хлеб'}, user_id=user_id)
+    edit_list({'listId': list_id, 'type': 'list', 'title': 'Магазин'}, user_id=user_id)
+    assert get_best_task_and_list_id('купить хлеб', 'магазин', user_id) == (task_id, list_id)
+    assert get_best_matching_lists('покупки на неделю', user_id)[0] == []
+
+    # Задача без списка ищется среди всех задач, а в чужом списке — не находится
+    other, _ = add_task({'title': 'Позвонить маме'}, user_id=user_id)
+    assert get_best_task_and_list_id('позвонить маме', None, user_id) == (other['task']['id'], 'tasks')
+    assert get_best_task_and_list_id('позвонить маме', 'магазин', user_id) == (None, None)
+
+    lst = db.session.get(List, list_id)
+    lst.tasks.append(db.session.get(Task, other['task']['id']))
+    db_session.commit()
+    assert get_best_task_and_list_id('позвонить маме', 'магазин', user_id) == (other['task']['id'], list_id)
+
+    del_task({'taskId': task_id}, user_id=user_id)
+    assert get_best_task_and_list_id('купить хлеб', 'магазин', user_id) == (None, None)
+    assert loads == []
+
+
+def test_rolled_back_changes_are_not_indexed(db_session, test_user, index):
+    task = Task(title='Сдать отчёт', user_id=test_user.id)
+    db_session.add(task)
+    db_session.commit()
+    assert index.match_task(test_user.id, 'сдать отчёт')[0] == task.id
+
+    task.title = 'Убрать гараж'
+    db_session.flush()
+    db_session.rollback()
+    assert index.match_task(test_user.id, 'сдать отчёт')[0] == task.id
+    assert index.match_task(test_user.id, 'убрать гараж') == (None, 0)
+
+
+@pytest.mark.benchmark
+def test_title_index_benchmark(db_session, test_user, index, record_property):
+    """Бенчмарк: поиск задачи по сериализации всех задач и по индексу названий"""
+    rng = random.Random(5)
+    count = 5000
+    db_session.execute(Task.__table__.insert(), [
+        {'id': f'00000000-0000-4000-8000-{i:012d}', 'user_id': test_user.id, 'title': f'{_title(rng)} {i}'}
+        for i in range(count)
+    ])
+    db_session.commit()
+    queries = [f'{_title(rng)} {rng.randrange(count)}' for _ in range(50)]
+
+    started = time.perf_counter()
+    for query in queries[:5]:
+        tasks = get_tasks('all', user_id=test_user.id)[0]['tasks']
+        process.extract(query.lower(), [(t['title'] or '').lower() for t in tasks], scorer=fuzz.token_sort_ratio,
+                        limit=1, score_cutoff=80)
+    legacy_elapsed = (time.perf_counter() - started) / 5
+
+    started = time.perf_counter()
+    index.match_task(test_user.id, queries[0])
+    build_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for query in queries:
+        index.match_task(test_user.id, query)
+    indexed_elapsed = (time.perf_counter() - started) / len(queries)
+
+    record_property('legacy_ms_per_query', round(legacy_elapsed * 1000, 1))
+    record_property('build_ms', round(build_elapsed * 1000, 1))
+    record_property('indexed_ms_per_query', round(indexed_elapsed * 1000, 2))
+    assert indexed_elapsed < legacy_elapsed / 10
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+
+import pytest
+
+from app.main.handlers import save_and_emit_message
+from app.main.models import ChatHistory
+from app.tts_cache import TTSCache, cache_key
+from app.tts_jobs import TTSJobService
+
+
+class FakeSynthesizer:
+    def __init__(self, size=100, delay=0):
+        self.size = size
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, text, voice, rate, output_path):
+        self.calls.append(text)
+        time.sleep(self.delay)
+        with open(output_path, 'wb') as f:
+            f.write(text.encode()[:self.size].ljust(self.size, b'\0'))
+
+
+def _cache_files(directory):
+    return sorted(name for name in os.listdir(directory) if not name.startswith('.'))
+
+
+def test_repeated_phrase_is_synthesized_once(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=10_000, max_files=100)
+    synthesize = FakeSynthesizer()
+
+    first = cache.get_or_create('Уточните запрос!', 'voice', '+40%', synthesize)
+    assert cache.get_or_create('  Уточните   запрос! ', 'voice', '+40%', synthesize) == first
+    assert cache.get_or_create('*Уточните запрос.*', 'voice', '+40%', synthesize) == first
+    assert synthesize.calls == ['Уточните запрос.']
+
+    # Другой голос или скорость — другой файл
+    assert cache.get_or_create('Уточните запрос!', 'voice', '+0%', synthesize) != first
+    assert cache.stats() == {'hits': 2, 'misses': 2, 'evictions': 0, 'files': 2, 'bytes': 200}
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=250, max_files=100)
+    synthesize = FakeSynthesizer(size=100)
+
+    a = cache.get_or_create('a', 'v', 'r', synthesize)
+    b = cache.get_or_create('b', 'v', 'r', synthesize)
+    cache.get_or_create('a', 'v', 'r', synthesize)
+    c = cache.get_or_create('c', 'v', 'r', synthesize)
+
+    assert _cache_files(tmp_path) == sorted(os.path.basename(path) for path in (a, c))
+    assert not os.path.exists(b)
+    assert cache.stats()['evictions'] == 1 and cache.stats()['bytes'] == 200
+
+    small = TTSCache(str(tmp_path), max_bytes=10_000, max_files=1)
+    assert small.lookup(cache_key('c', 'v', 'r')) == c
+    assert _cache_files(tmp_path) == [os.path.basename(c)]
+
+
+def test_cache_survives_restart_and_cleans_partial_files(tmp_path):
+    synthesize = FakeSynthesizer()
+    path = TTSCache(str(tmp_path), 10_000, 100).get_or_create('привет', 'v', 'r', synthesize)
+    stale = tmp_path / '.tts_stale.part'
+    stale.write_bytes(b'x')
+    os.utime(stale, (time.time() - 7200, time.time() - 7200))
+
+    cache = TTSCache(str(tmp_path), 10_000, 100)
+    assert cache.get_or_create('привет', 'v', 'r', synthesize) == path
+    assert len(synthesize.calls) == 1
+    assert not stale.exists()
+
+
+def test_failed_synthesis_leaves_no_files(tmp_path):
+    cache = TTSCache(str(tmp_path), 10_000, 100)
+
+    def fail(text, voice, rate, output_path):
+        with open(output_path, 'wb') as f:
+            f.write(b'partial')
+        raise RuntimeError('network down')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_create('текст', 'v', 'r', fail)
+    with pytest.raises(RuntimeError):
+        cache.get_or_create('пусто', 'v', 'r', lambda *args: None)
+    assert os.listdir(tmp_path) == []
+    assert cache.stats()['files'] == 0
+
+
+def test_concurrent_requests_share_one_synthesis(tmp_path):
+    cache = TTSCache(str(tmp_path), 10_000, 100)
+    synthesize = FakeSynthesizer(delay=0.05)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_create('одно', 'v', 'r', synthesize)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(results)) == 1 and len(results) == 8
+    assert synthesize.calls == ['одно']
+
+
+def test_chat_message_audio_is_served_from_cache(app, auth_client, test_user, db_session, tmp_path, monkeypatch):
+    synthesize = FakeSynthesizer()
+    service = TTSJobService(app, synthesize, TTSCache(str(tmp_path), 10_000, 100))
+    monkeypatch.setitem(app.extensions, 'tts_jobs', service)
+
+    message_ids = [save_and_emit_message(test_user.id, 'Уточните запрос')[0]['message_id'] for _ in range(3)]
+    bodies = []
+    for message_id in message_ids:
+        response = auth_client.get(f'/temp/edge_audio_{message_id}.mp3')
+        assert response.status_code == 200 and response.mimetype == 'audio/mpeg'
+        bodies.append(response.data)
+        response.close()
+    response = auth_client.post('/get_tts_audio', data={'text': 'Уточните запрос'})
+    bodies.append(response.data)
+    response.close()
+
+    assert len(set(bodies)) == 1
+    assert synthesize.calls == ['Уточните запрос']
+    assert auth_client.get('/temp/edge_audio_999999999.mp3').status_code == 404
+    assert auth_client.get('/temp/../config.py').status_code == 404
+
+    ChatHistory.query.filter_by(user_id=test_user.id).delete()
+    db_session.commit()
+    service.shutdown()
@@ -0,0 +1,231 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.tts_cache import TTSCache
+from app.tts_chunked import ChunkedHTTPTTS, split_text
+from app.tts_jobs import TTSJobService, get_tts_service
+
+
+class StubTTSServer(ThreadingHTTPServer):
+    """Локальный HTTP-сервис озвучки: отвечает «[текст]», считает одновременные запросы"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.delay = 0.05
+        self.gate = threading.Event()
+        self.gate.set()
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/generate'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        with server.lock:
+            server.requests.append(params)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.delay)
+            if 'последн' in params['text']:
+                server.gate.wait(5)
+        finally:
+            with server.lock:
+                server.active -= 1
+        if 'сбой' in params['text']:
+            self.send_response(500)
+            body = b''
+        else:
+            self.send_response(200)
+            body = f"[{params['text']}|{params['speaker']}]".encode()
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = StubTTSServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.gate.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def tts(server, tmp_path):
+    tts = ChunkedHTTPTTS(server.url, params={'format': 'mp3'}, max_chars=30, workers=3,
+                         temp_dir=str(tmp_path / 'parts'))
+    yield tts
+    tts.close()
+
+
+def _sentences(count, prefix='часть'):
+    return ''.join(f'{prefix} номер {i:02d} здесь. ' for i in range(count))
+
+
+def test_split_text_keeps_sentences_within_limit():
+    text = 'Первое предложение. Второе! Третье? ' + 'очень ' * 40 + 'длинное. Хвост'
+    parts = split_text(text, max_chars=50)
+    assert ''.join(parts) == text
+    assert all(0 < len(part) <= 50 for part in parts)
+    assert parts[0] == 'Первое предложение. Второе! Третье?'
+    assert split_text('Коротко.') == ['Коротко.']
+    assert split_text('   ') == []
+
+
+def test_parts_are_fetched_in_parallel_and_merged_in_order(server, tts, tmp_path):
+    text = _sentences(9)
+    parts = split_text(text, 30)
+    output = tmp_path / 'out.mp3'
+
+    started = time.perf_counter()
+    tts(text, 'levitan', '+0%', str(output))
+    elapsed = time.perf_counter() - started
+
+    assert output.read_bytes() == ''.join(f'[{part}|levitan]' for part in parts).encode()
+    assert len(server.requests) == len(parts) == 9
+    assert all(request['format'] == 'mp3' for request in server.requests)
+    assert server.max_active == 3
+    assert elapsed < server.delay * len(parts)
+    assert os.listdir(tmp_path / 'parts') == []
+
+
+def test_stream_yields_leading_parts_before_the_rest(server, tts):
+    server.gate.clear()
+    text = _sentences(2) + 'последняя часть текста.'
+    parts = split_text(text, 30)
+    chunks = tts.stream(text, 'oksana', '+0%')
+
+    # Первая часть приходит, пока последняя ещё синтезируется
+    assert next(chunks) == f'[{parts[0]}|oksana]'.encode()
+    assert any('последн' in request['text'] for request in server.requests)
+    server.gate.set()
+    assert b''.join(chunks).endswith(f'[{parts[-1]}|oksana]'.encode())
+
+
+def test_concurrent_jobs_do_not_collide(server, tts, tmp_path):
+    outputs = {}
+
+    def run(name):
+        path = tmp_path / f'{name}.mp3'
+        tts(_sentences(4, prefix=name), name, '+0%', str(path))
+        outputs[name] = path.read_bytes()
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ('alyss', 'zahar', 'jane')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name, data in outputs.items():
+        expected = ''.join(f'[{part}|{name}]' for part in split_text(_sentences(4, prefix=name), 30))
+        assert data == expected.encode()
+    assert server.max_active <= 3
+    assert os.listdir(tmp_path / 'parts') == []
+
+
+def test_failed_part_aborts_the_job(server, tts, tmp_path):
+    chunks = tts.stream(_sentences(3) + 'тут сбой.', 'levitan', '+0%')
+    with pytest.raises(Exception):
+        b''.join(chunks)
+    assert os.listdir(tmp_path / 'parts') == []
+
+    # Клиент, ушедший посреди потока, не оставляет файлов частей
+    chunks = tts.stream(_sentences(6), 'levitan', '+0%')
+    next(chunks)
+    chunks.close()
+    assert os.listdir(tmp_path / 'parts') == []
+
+
+def test_audio_route_streams_through_backend(app, auth_client, server, tts, tmp_path, monkeypatch):
+    service = TTSJobService(app, tts, TTSCache(str(tmp_path / 'cache'), 100_000, 100))
+    monkeypatch.setitem(app.extensions, 'tts_jobs', service)
+    text = _sentences(3)
+
+    response = auth_client.post('/get_tts_audio', data={'text': text, 'stream': '1'})
+    assert response.status_code == 200 and response.mimetype == 'audio/mpeg'
+    streamed = response.data
+    assert streamed.startswith(b'[') and len(server.requests) == 3
+
+    # Дочитанный поток попал в кэш: повторы отдаются с диска без запросов к сервису
+    for data in ({'text': text}, {'text': text, 'stream': '1'}):
+        response = auth_client.post('/get_tts_audio', data=data)
+        assert response.data == streamed and len(server.requests) == 3
+        response.close()
+    assert service.stats()['files'] == 1
+    service.shutdown()
+
+
+def test_interrupted_stream_is_not_cached(app, server, tts, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    service = TTSJobService(app, tts, TTSCache(str(cache_dir), 100_000, 100))
+
+    chunks = service.stream(_sentences(6), 'levitan', '+0%')
+    next(chunks)
+    chunks.close()
+    assert os.listdir(cache_dir) == [] and os.listdir(tmp_path / 'parts') == []
+
+    chunks = service.stream(_sentences(3) + 'тут сбой.', 'levitan', '+0%')
+    with pytest.raises(Exception):
+        b''.join(chunks)
+    assert os.listdir(cache_dir) == [] and service.stats()['files'] == 0
+    service.shutdown()
+
+
+def test_text_without_words_is_rejected_before_streaming(app, auth_client, server, tts, tmp_path, monkeypatch):
+    with pytest.raises(ValueError):
+        tts.stream('... ?!', 'levitan', '+0%')
+    assert not (tmp_path / 'parts').exists() and server.requests == []
+
+    service = TTSJobService(app, tts, TTSCache(str(tmp_path / 'cache'), 100_000, 100))
+    monkeypatch.setitem(app.extensions, 'tts_jobs', service)
+    response = auth_client.post('/get_tts_audio', data={'text': '...', 'stream': '1'})
+    assert response.status_code == 400
+    service.shutdown()
+
+
+def test_http_backend_is_built_from_config(app, auth_client, server, monkeypatch):
+    monkeypatch.setitem(app.config, 'TTS_HTTP_URL', server.url)
+    monkeypatch.setitem(app.config, 'TTS_HTTP_PARAMS', {'format': 'mp3'})
+    monkeypatch.setitem(app.config, 'TTS_HTTP_VOICE', 'jane')
+    previous = app.extensions.pop('tts_jobs', None)
+    try:
+        with app.app_context():
+            service = get_tts_service()
+        assert isinstance(service.backend, ChunkedHTTPTTS)
+
+        text = f'Проверка настройки {time.time()}.'
+        response = auth_client.post('/get_tts_audio', data={'text': text, 'stream': '1'})
+        assert response.status_code == 200
+        assert response.data == f'[{text}|jane]'.encode()
+        assert server.requests == [{'format': 'mp3', 'speaker': 'jane', 'text': text}]
+    finally:
+        service = app.extensions.pop('tts_jobs', None)
+        if service is not None:
+            service.shutdown()
+            service.backend.close()
+        if previous is not None:
+            app.extensions['tts_jobs'] = previous
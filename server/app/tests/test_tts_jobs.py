@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import socketio
+from app.tts_cache import TTSCache
+from app.tts_jobs import TTSJobService, TTSQueueFull
+
+
+class BlockingBackend:
+    """Синтезатор, который ждёт разрешения и считает одновременные вызовы"""
+
+    def __init__(self, fail=False):
+        self.release = threading.Event()
+        self.fail = fail
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, text, voice, rate, output_path):
+        with self._lock:
+            self.calls.append(text)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            assert self.release.wait(5)
+            if self.fail:
+                raise RuntimeError('backend down')
+            with open(output_path, 'wb') as f:
+                f.write(text.encode())
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def backend():
+    backend = BlockingBackend()
+    yield backend
+    backend.release.set()
+
+
+@pytest.fixture
+def service(app, backend, tmp_path, monkeypatch):
+    service = TTSJobService(app, backend, TTSCache(str(tmp_path), 100_000, 100), workers=2, max_pending=4)
+    monkeypatch.setitem(app.extensions, 'tts_jobs', service)
+    yield service
+    backend.release.set()
+    service.shutdown()
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_identical_requests_share_one_job(service, backend):
+    jobs = [service.submit('Уточните запрос', 'v', 'r', user_id=user_id) for user_id in (1, 2, 1)]
+    assert len({job.id for job in jobs}) == 1
+    assert jobs[0].user_ids == {'1', '2'}
+
+    backend.release.set()
+    assert jobs[0].wait(5) and jobs[0].status == 'done'
+    assert backend.calls == ['Уточните запрос']
+
+    # Готовая фраза берётся из кэша: новое задание сразу завершено
+    cached = service.submit('  Уточните   запрос ', 'v', 'r')
+    assert cached.done and cached.path == jobs[0].path
+    assert backend.calls == ['Уточните запрос']
+
+
+def test_pool_and_queue_are_bounded(service, backend):
+    jobs = [service.submit(f'фраза {i}', 'v', 'r') for i in range(4)]
+    _wait_for(lambda: backend.active == 2)
+    with pytest.raises(TTSQueueFull):
+        service.submit('лишняя', 'v', 'r')
+    # Повтор уже поставленной фразы не занимает места в очереди
+    assert service.submit('фраза 3', 'v', 'r') is jobs[3]
+
+    backend.release.set()
+    assert all(job.wait(5) for job in jobs)
+    assert backend.max_active == 2
+    assert service.stats()['pending'] == 0
+
+
+def test_failed_backend_marks_job_failed(app, tmp_path):
+    backend = BlockingBackend(fail=True)
+    backend.release.set()
+    service = TTSJobService(app, backend, TTSCache(str(tmp_path), 100_000, 100))
+    job = service.submit('текст', 'v', 'r')
+    assert job.wait(5)
+    assert job.to_dict() == {'job_id': job.id, 'status': 'failed', 'error': 'TTS generation failed'}
+
+    # Неудачное задание не запоминается: повтор запускает синтез заново
+    assert service.submit('текст', 'v', 'r').id != job.id
+    service.shutdown()
+
+
+def test_job_api_and_ready_event(app, auth_client, test_user, service, backend):
+    with app.app_context():
+        token = create_access_token(identity=str(test_user.id))
+    chat = socketio.test_client(app, namespace='/chat', auth={'token': token})
+    chat.get_received('/chat')
+
+    response = auth_client.post('/get_tts_audio_filename', data={'text': 'Добрый день', 'wait': '0'})
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job['status'] in ('queued', 'running')
+    _wait_for(lambda: backend.active == 1)
+    assert auth_client.get(f"/tts_jobs/{job['job_id']}").get_json() == job | {'status': 'running'}
+
+    backend.release.set()
+    _wait_for(lambda: service.get(job['job_id']).done)
+    data = auth_client.get(f"/tts_jobs/{job['job_id']}").get_json()
+    assert data['status'] == 'done' and data['filename'].endswith('.mp3')
+
+    events = [packet for packet in chat.get_received('/chat') if packet['name'] == 'tts_ready']
+    assert [packet['args'][0] for packet in events] == [data]
+    chat.disconnect('/chat')
+
+    # Блокирующий вызов и повтор без ожидания отдают готовый файл
+    response = auth_client.post('/get_tts_audio', data={'text': 'Добрый день'})
+    assert response.status_code == 200 and response.data == 'Добрый день'.encode()
+    response.close()
+    response = auth_client.post('/get_tts_audio_filename', data={'text': 'Добрый день', 'wait': '0'})
+    assert response.status_code == 200 and response.get_json()['filename'] == data['filename']
+    assert auth_client.get('/tts_jobs/unknown').status_code == 404
+
+
+def test_full_queue_returns_503(auth_client, service):
+    for i in range(4):
+        assert auth_client.post('/get_tts_audio_filename', data={'text': f'фраза {i}', 'wait': '0'}).status_code == 202
+    assert auth_client.post('/get_tts_audio_filename', data={'text': 'лишняя', 'wait': '0'}).status_code == 503
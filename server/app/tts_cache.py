@@ -0,0 +1,209 @@
+"""
+Кэш озвучки (TTS) на диске с адресацией по содержимому.
+
+Файл кэша называется по хэшу (нормализованный текст, голос, скорость), поэтому
+одна и та же фраза синтезируется один раз и дальше отдаётся с диска. Размер
+кэша ограничен по байтам и числу файлов, вытесняются давно не использованные
+(порядок хранится в mtime, так что переживает перезапуск). Запись атомарная:
+синтез идёт во временный файл, который затем переименовывается.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+CACHE_PREFIX = 'tts_'
+CACHE_SUFFIX = '.mp3'
+PART_SUFFIX = '.part'
+# Недописанные временные файлы старше этого возраста (секунды) удаляются при загрузке кэша
+STALE_PART_AGE = 3600
+
+
+def normalize_text(text):
+    """Текст в том виде, в котором он уходит в синтез (и участвует в ключе кэша)."""
+    return ' '.join(text.replace('*', '').replace('!', '.').split())
+
+
+def cache_key(text, voice, rate):
+    payload = json.dumps([normalize_text(text), voice, rate], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TTSCache:
+    """LRU-кэш файлов озвучки в каталоге directory."""
+
+    def __init__(self, directory, max_bytes, max_files):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries = None
+        self._lock = threading.Lock()
+        # Один синтез на ключ: параллельные запросы той же фразы ждут его результата
+        self._key_locks = {}
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{CACHE_PREFIX}{key}{CACHE_SUFFIX}')
+
+    def _load(self):
+        """Файлы кэша с диска в порядке mtime (давно использованные — первыми)."""
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(PART_SUFFIX):
+                    if now - entry.stat().st_mtime > STALE_PART_AGE:
+                        self._remove(entry.path)
+                    continue
+                if entry.name.startswith(CACHE_PREFIX) and entry.name.endswith(CACHE_SUFFIX):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name[len(CACHE_PREFIX):-len(CACHE_SUFFIX)], stat.st_size))
+        self._entries = OrderedDict((key, size) for _, key, size in sorted(files))
+        self.total_bytes = sum(self._entries.values())
+        self._evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        while self._entries and (self.total_bytes > self.max_bytes or len(self._entries) > self.max_files):
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            self._remove(self.path(key))
+
+    def _touch(self, key):
+        """Отмечает использование файла; False, если его удалил другой процесс."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            self.total_bytes -= self._entries.pop(key, 0)
+            return False
+        self.total_bytes += size - self._entries.get(key, 0)
+        self._entries[key] = size
+        self._entries.move_to_end(key)
+        return True
+
+    def lookup(self, key):
+        """Путь к файлу ключа, если он уже в кэше (в том числе записан другим процессом)."""
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            if self._touch(key):
+                self.hits += 1
+                return self.path(key)
+            return None
+
+    def get_or_create(self, text, voice, rate, synthesize):
+        """
+        Путь к озвучке текста: из кэша или после synthesize(text, voice, rate,
+        output_path). Исключение synthesize пробрасывается, в кэш ничего не
+        попадает.
+        """
+        key = cache_key(text, voice, rate)
+        path = self.lookup(key)
+        if path:
+            return path
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            try:
+                path = self.lookup(key)
+                if path:
+                    return path
+                with self._lock:
+                    self.misses += 1
+                fd, part_path = tempfile.mkstemp(prefix=f'.{CACHE_PREFIX}', suffix=PART_SUFFIX,
+                                                 dir=self.directory)
+                os.close(fd)
+                try:
+                    synthesize(normalize_text(text), voice, rate, part_path)
+                    if not os.path.getsize(part_path):
+                        raise RuntimeError('TTS produced an empty file')
+                    os.replace(part_path, self.path(key))
+                except BaseException:
+                    self._remove(part_path)
+                    raise
+                with self._lock:
+                    self._touch(key)
+                    self._evict()
+                return self.path(key)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def tee(self, text, voice, rate, chunks):
+        """
+        Отдаёт байты chunks и попутно пишет их во временный файл: дочитанный
+        до конца поток становится файлом кэша озвучки текста. Если поток
+        прерван (ошибка синтеза, клиент отключился) или пуст, в кэш ничего
+        не попадает.
+        """
+        key = cache_key(text, voice, rate)
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            self.misses += 1
+        fd, part_path = tempfile.mkstemp(prefix=f'.{CACHE_PREFIX}', suffix=PART_SUFFIX, dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            if not os.path.getsize(part_path):
+                self._remove(part_path)
+                return
+            os.replace(part_path, self.path(key))
+        except BaseException:
+            self._remove(part_path)
+            raise
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+        with self._lock:
+            self._touch(key)
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'files': len(self._entries or ()),
+                'bytes': self.total_bytes,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_tts_cache():
+    """Кэш озвучки приложения: каталог temp/ и ограничения из конфигурации."""
+    directory = os.path.join(current_app.root_path, 'temp')
+    with _caches_lock:
+        cache = _caches.get(directory)
+        if cache is None:
+            cache = _caches[directory] = TTSCache(directory, current_app.config['TTS_CACHE_MAX_BYTES'],
+                                                  current_app.config['TTS_CACHE_MAX_FILES'])
+        return cache
@@ -0,0 +1,158 @@
+"""
+Озвучка длинного текста через HTTP-сервис по частям.
+
+Сервисы вроде бесплатного Yandex TTS принимают ограниченный по длине текст,
+поэтому текст режется на части по границам предложений (не длиннее
+max_chars), части запрашиваются параллельно в ограниченном пуле через одну
+HTTP-сессию с пулом соединений и складываются во временный каталог задания
+(у каждого вызова свой, параллельные задания не пересекаются). Склейка —
+последовательная запись частей mp3 по порядку: поток отдаёт первую часть,
+как только она скачана, не дожидаясь остальных.
+
+Объект ChunkedHTTPTTS — бэкенд для app.tts_jobs, а его метод stream
+используется для потоковой отдачи аудио. Бэкенд включается заданием
+TTS_HTTP_URL в конфигурации (см. backend_from_config).
+"""
+
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+MAX_CHARS = 990
+CHUNK_SIZE = 64 * 1024
+
+_SENTENCE_RE = re.compile(r'[^.!?]+[.!?]+|[^.!?]+$')
+_WORD_RE = re.compile(r'\w')
+
+
+def split_text(text, max_chars=MAX_CHARS):
+    """
+    Части текста не длиннее max_chars: предложения собираются в часть, пока
+    она помещается; слишком длинное предложение режется по пробелам.
+    """
+    parts = []
+    part = ''
+    for sentence in _SENTENCE_RE.findall(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars) + 1 or max_chars
+            if part:
+                parts.append(part)
+                part = ''
+            parts.append(sentence[:cut])
+            sentence = sentence[cut:]
+        if len(part) + len(sentence) > max_chars:
+            parts.append(part)
+            part = ''
+        part += sentence
+    if part.strip():
+        parts.append(part)
+    return [part for part in parts if part.strip()]
+
+
+class ChunkedHTTPTTS:
+    """
+    Синтез через HTTP GET url с параметрами params, текстом части в параметре
+    text_param и голосом в voice_param (скорость — в rate_param, если задан).
+    Если задан voice, сервису всегда передаётся он, а не голос вызывающего:
+    приложение по умолчанию просит голос edge-tts, которого у сервиса нет.
+    """
+
+    def __init__(self, url, params=None, text_param='text', voice_param='speaker', rate_param=None,
+                 voice=None, max_chars=MAX_CHARS, workers=4, timeout=30, temp_dir=None):
+        self.url = url
+        self.params = dict(params or {})
+        self.text_param = text_param
+        self.voice_param = voice_param
+        self.voice = voice
+        self.rate_param = rate_param
+        self.max_chars = max_chars
+        self.timeout = timeout
+        self.temp_dir = temp_dir
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tts-http')
+
+    def _fetch(self, text, voice, rate, path):
+        params = {**self.params, self.text_param: text}
+        if self.voice_param:
+            params[self.voice_param] = self.voice or voice
+        if self.rate_param:
+            params[self.rate_param] = rate
+        with self.session.get(self.url, params=params, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            with open(path, 'wb') as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+        if not os.path.getsize(path):
+            raise RuntimeError('TTS service returned an empty part')
+        return path
+
+    def stream(self, text, voice, rate):
+        """
+        Байты mp3 по порядку частей: часть отдаётся, как только она и все
+        предыдущие скачаны. Ошибка части прерывает поток исключением.
+        Текст без слов (пробелы, знаки препинания) — ValueError сразу, до
+        начала потока.
+        """
+        parts = [part for part in split_text(text, self.max_chars) if _WORD_RE.search(part)]
+        if not parts:
+            raise ValueError('Nothing to synthesize')
+        return self._stream_parts(parts, voice, rate)
+
+    def _stream_parts(self, parts, voice, rate):
+        if self.temp_dir:
+            os.makedirs(self.temp_dir, exist_ok=True)
+        job_dir = tempfile.mkdtemp(prefix='tts_job_', dir=self.temp_dir)
+        futures = []
+        try:
+            for index, part in enumerate(parts):
+                path = os.path.join(job_dir, f'part{index:04d}.mp3')
+                futures.append(self._executor.submit(self._fetch, part, voice, rate, path))
+            for future in futures:
+                with open(future.result(), 'rb') as f:
+                    while chunk := f.read(CHUNK_SIZE):
+                        yield chunk
+        finally:
+            # Клиент отключился или часть не удалась: оставшиеся части не нужны,
+            # а уже начатые дожидаемся, чтобы не писать в удалённый каталог
+            for future in futures:
+                future.cancel()
+            for future in futures:
+                if not future.cancelled():
+                    future.exception()
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    def __call__(self, text, voice, rate, output_path):
+        """Бэкенд app.tts_jobs: склеенная озвучка в output_path."""
+        with open(output_path, 'wb') as f:
+            for chunk in self.stream(text, voice, rate):
+                f.write(chunk)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.session.close()
+
+
+def backend_from_config(config):
+    """
+    ChunkedHTTPTTS по ключам TTS_HTTP_* конфигурации или None, если TTS_HTTP_URL
+    не задан. Без TTS_HTTP_VOICE голос не передаётся и сервис берёт свой.
+    """
+    url = config.get('TTS_HTTP_URL')
+    if not url:
+        return None
+    voice = config.get('TTS_HTTP_VOICE')
+    return ChunkedHTTPTTS(
+        url,
+        params=config.get('TTS_HTTP_PARAMS'),
+        voice_param=(config.get('TTS_HTTP_VOICE_PARAM') or None) if voice else None,
+        voice=voice,
+        workers=config.get('TTS_HTTP_WORKERS', 4),
+    )
@@ -0,0 +1,191 @@
+"""
+Очередь заданий озвучки (TTS) с ограниченным пулом исполнителей.
+
+Синтез выполняется не в обработчике запроса, а в пуле из TTS_WORKERS
+исполнителей (под eventlet — зелёные потоки, сам edge-tts работает в
+отдельном процессе). Одинаковые запросы (тот же текст, голос и скорость),
+пока задание не завершено, получают одно и то же задание; готовые фразы
+берутся из кэша (app.tts_cache) без постановки в очередь. Когда в очереди и
+в работе уже TTS_MAX_PENDING заданий, новое не принимается (TTSQueueFull).
+
+Синтезатор — подключаемый бэкенд: вызываемый объект
+``backend(text, voice, rate, output_path)``, который пишет mp3 в output_path
+или бросает исключение. По умолчанию это edge-tts (app.text_to_edge_tts);
+HTTP-сервис по частям (app.tts_chunked) включается ключом TTS_HTTP_URL,
+произвольный бэкенд задаётся ключом TTS_BACKEND.
+
+О готовности задания сообщается событием ``tts_ready`` в пространстве /chat
+в комнату пользователя, отправившего запрос. Бэкенд с методом
+``stream(text, voice, rate)`` (app.tts_chunked) позволяет отдавать аудио
+клиенту по мере синтеза, минуя очередь.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from app import socketio
+from app.socketio_utils import user_room
+from app.tts_cache import cache_key, get_tts_cache, normalize_text
+from app.tts_chunked import backend_from_config
+
+# Сколько секунд хранится результат завершённого задания для опроса
+JOB_RESULT_TTL = 600
+
+
+class TTSQueueFull(Exception):
+    pass
+
+
+class TTSJob:
+    __slots__ = ('id', 'key', 'text', 'voice', 'rate', 'status', 'path', 'error', 'user_ids',
+                 'finished_at', '_done')
+
+    def __init__(self, key, text, voice, rate):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.text = text
+        self.voice = voice
+        self.rate = rate
+        self.status = 'queued'
+        self.path = None
+        self.error = None
+        self.user_ids = set()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Ждёт завершения задания; True, если оно завершилось за timeout секунд."""
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        result = {'job_id': self.id, 'status': self.status}
+        if self.path:
+            result['filename'] = os.path.basename(self.path)
+        if self.error:
+            result['error'] = self.error
+        return result
+
+
+class TTSJobService:
+    """Пул исполнителей заданий озвучки с общей очередью и объединением одинаковых запросов."""
+
+    def __init__(self, app, backend, cache, workers=2, max_pending=64):
+        self.app = app
+        self.backend = backend
+        self.cache = cache
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tts')
+        self._jobs = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, text, voice, rate, user_id=None):
+        """
+        Задание озвучки текста. Если фраза уже в кэше, задание сразу готово;
+        если такое же задание в очереди или в работе, возвращается оно.
+        """
+        key = cache_key(text, voice, rate)
+        with self._lock:
+            self._prune()
+            job = self._pending.get(key)
+            if job is not None:
+                if user_id is not None:
+                    job.user_ids.add(str(user_id))
+                return job
+
+            job = TTSJob(key, text, voice, rate)
+            self._jobs[job.id] = job
+            path = self.cache.lookup(key)
+            if path:
+                self._finish(job, 'done', path=path)
+                return job
+            if len(self._pending) >= self.max_pending:
+                del self._jobs[job.id]
+                raise TTSQueueFull(f'TTS queue is full ({self.max_pending} jobs)')
+            if user_id is not None:
+                job.user_ids.add(str(user_id))
+            self._pending[key] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def stream(self, text, voice, rate):
+        """
+        Байты mp3 по мере синтеза, если бэкенд это умеет и фразы ещё нет в
+        кэше; иначе None (тогда подходит обычное задание). Дочитанный поток
+        сохраняется в кэш (TTSCache.tee). ValueError бэкенда (нечего
+        озвучивать) пробрасывается до начала потока.
+        """
+        stream = getattr(self.backend, 'stream', None)
+        if stream is None or self.cache.lookup(cache_key(text, voice, rate)):
+            return None
+        return self.cache.tee(text, voice, rate, stream(normalize_text(text), voice, rate))
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        with self.app.app_context():
+            job.status = 'running'
+            try:
+                path = self.cache.get_or_create(job.text, job.voice, job.rate, self.backend)
+            except Exception as e:
+                current_app.logger.error(f'TTS job {job.id} failed: {e!r}')
+                with self._lock:
+                    self._finish(job, 'failed', error='TTS generation failed')
+            else:
+                with self._lock:
+                    self._finish(job, 'done', path=path)
+            for user_id in job.user_ids:
+                socketio.emit('tts_ready', job.to_dict(), namespace='/chat', to=user_room(user_id))
+
+    def _finish(self, job, status, path=None, error=None):
+        """Вызывается под self._lock."""
+        job.status = status
+        job.path = path
+        job.error = error
+        job.finished_at = time.monotonic()
+        self._pending.pop(job.key, None)
+        job._done.set()
+
+    def _prune(self):
+        """Удаляет давно завершённые задания; вызывается под self._lock."""
+        deadline = time.monotonic() - JOB_RESULT_TTL
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < deadline]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            return {'pending': len(self._pending), 'jobs': len(self._jobs), **self.cache.stats()}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_service_lock = threading.Lock()
+
+
+def get_tts_service():
+    """Сервис озвучки приложения (создаётся при первом обращении)."""
+    app = current_app._get_current_object()
+    with _service_lock:
+        service = app.extensions.get('tts_jobs')
+        if service is None:
+            backend = app.config.get('TTS_BACKEND') or backend_from_config(app.config)
+            if backend is None:
+                from app.text_to_edge_tts import synthesize_edge_tts
+                backend = synthesize_edge_tts
+            service = app.extensions['tts_jobs'] = TTSJobService(
+                app, backend, get_tts_cache(),
+                workers=app.config['TTS_WORKERS'], max_pending=app.config['TTS_MAX_PENDING'],
+            )
+        return service
@@ -0,0 +1,41 @@
+"""per-user data versions
+
+Revision ID: 3f9b2c7d1e40
+Revises: a1c64e7a81e5
+Create Date: 2026-10-18 10:05:12.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9b2c7d1e40'
+down_revision = 'a1c64e7a81e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Старая глобальная строка с JSON-версиями не переносится: счётчики начинаются с нуля,
+    # клиенты просто перезапросят данные при первом изменении.
+    op.drop_table('data_versions', schema='productivity')
+    op.create_table('data_versions',
+    sa.Column('user_id', sa.String(length=36), nullable=False),
+    sa.Column('version_key', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id', 'version_key'),
+    schema='productivity'
+    )
+
+
+def downgrade():
+    op.drop_table('data_versions', schema='productivity')
+    op.create_table('data_versions',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('version_metadata', sa.JSON(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    schema='productivity'
+    )
@@ -0,0 +1,34 @@
+"""journal facets
+
+Revision ID: 4b8f1c2d9e63
+Revises: e7a3d95c0b21
+Create Date: 2026-10-18 16:11:52.730914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8f1c2d9e63'
+down_revision = 'e7a3d95c0b21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Заполняется командой `flask rebuild-journal-facets`: значения
+    # вычисляются по filter_config модулей, которого нет в БД
+    op.create_table('journal_facets',
+    sa.Column('user_id', sa.String(length=36), nullable=False),
+    sa.Column('journal_type', sa.String(length=50), nullable=False),
+    sa.Column('field', sa.String(length=100), nullable=False),
+    sa.Column('value', sa.Text(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'journal_type', 'field', 'value'),
+    schema='content'
+    )
+
+
+def downgrade():
+    op.drop_table('journal_facets', schema='content')
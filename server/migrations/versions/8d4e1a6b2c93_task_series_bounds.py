@@ -0,0 +1,44 @@
+"""task series bounds
+
+Revision ID: 8d4e1a6b2c93
+Revises: 3f9b2c7d1e40
+Create Date: 2026-10-18 12:40:03.512907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4e1a6b2c93'
+down_revision = '3f9b2c7d1e40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tasks', schema='productivity') as batch_op:
+        batch_op.add_column(sa.Column('SeriesStart', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('SeriesEnd', sa.DateTime(), nullable=True))
+
+    # Заполнение по тем же правилам, что и Task.update_series_bounds
+    op.execute('''
+        UPDATE productivity.tasks SET
+            "SeriesStart" = "Start",
+            "SeriesEnd" = CASE
+                WHEN COALESCE("IsInfinite", false) OR "Deadline" IS NULL THEN NULL
+                WHEN "Deadline" > "Start" THEN "Deadline" + ("Deadline" - "Start")
+                ELSE "Deadline" + interval '1 hour'
+            END
+        WHERE "IntervalID" IS NOT NULL AND "Start" IS NOT NULL
+    ''')
+
+    with op.batch_alter_table('tasks', schema='productivity') as batch_op:
+        batch_op.create_index('ix_tasks_user_series', ['user_id', 'SeriesStart', 'SeriesEnd'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tasks', schema='productivity') as batch_op:
+        batch_op.drop_index('ix_tasks_user_series')
+        batch_op.drop_column('SeriesEnd')
+        batch_op.drop_column('SeriesStart')
@@ -0,0 +1,31 @@
+"""journal search vector
+
+Revision ID: 9c2e6f4a1d57
+Revises: 4b8f1c2d9e63
+Create Date: 2026-10-18 16:48:05.214937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2e6f4a1d57'
+down_revision = '4b8f1c2d9e63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('journal_entries', schema='content') as batch_op:
+        batch_op.add_column(sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(
+            """jsonb_to_tsvector('russian'::regconfig, coalesce(data::jsonb, '{}'), '["string"]')""",
+            persisted=True), nullable=True))
+        batch_op.create_index('ix_journal_entries_search', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    with op.batch_alter_table('journal_entries', schema='content') as batch_op:
+        batch_op.drop_index('ix_journal_entries_search', postgresql_using='gin')
+        batch_op.drop_column('search_vector')
@@ -0,0 +1,89 @@
+"""journal number float parity
+
+Revision ID: b6e1d4a9c3f2
+Revises: f4b8c2d7a913
+Create Date: 2026-10-18 23:05:31.604318
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e1d4a9c3f2'
+down_revision = 'f4b8c2d7a913'
+branch_labels = None
+depends_on = None
+
+# Копия app.journals.sql.JOURNAL_FILTER_FUNCTIONS (journal_number_text и
+# journal_number) на момент миграции: разбор по правилам float() приведением
+# к double precision вместо вычислений через numeric
+JOURNAL_NUMBER_FUNCTIONS = (
+    r"""CREATE OR REPLACE FUNCTION content.journal_number_text(raw text) RETURNS double precision
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+DECLARE
+    t text := btrim(raw, E' \t\n\r\f\v');
+    underflow boolean;
+BEGIN
+    -- Короткая десятичная запись с порядком до двух цифр не переполняется
+    IF t ~ '^[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]{1,2})?$' AND char_length(t) <= 200 THEN
+        RETURN t::double precision;
+    END IF;
+    -- Остальной синтаксис float(): подчёркивания между цифрами, inf, infinity, nan
+    IF t !~* '^[+-]?(([0-9](_?[0-9])*(\.([0-9](_?[0-9])*)?)?|\.[0-9](_?[0-9])*)(e[+-]?[0-9](_?[0-9])*)?|inf|infinity|nan)$' THEN
+        RETURN NULL;
+    END IF;
+    t := replace(t, '_', '');
+    RETURN t::double precision;
+EXCEPTION WHEN numeric_value_out_of_range THEN
+    -- float() не выдаёт ошибку: слишком большое по модулю значение — ±inf, слишком малое — 0
+    BEGIN
+        underflow := abs(t::numeric) < 1;
+    EXCEPTION WHEN numeric_value_out_of_range THEN
+        underflow := t ~ '[eE]-';
+    END;
+    RETURN CASE WHEN underflow THEN 0::double precision WHEN left(t, 1) = '-' THEN '-Infinity' ELSE 'Infinity' END;
+END
+$$""",
+    r"""CREATE OR REPLACE FUNCTION content.journal_number(value json) RETURNS double precision
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(CASE json_typeof(value)
+        WHEN 'boolean' THEN CASE WHEN value::text = 'true' THEN 1 ELSE 0 END
+        WHEN 'number' THEN content.journal_number_text(value::text)
+        WHEN 'string' THEN content.journal_number_text(value #>> '{}')
+    END, 'NaN')
+$$""",
+)
+
+# journal_number_text из миграции e7a3d95c0b21
+PREVIOUS_JOURNAL_NUMBER_TEXT = r"""CREATE OR REPLACE FUNCTION content.journal_number_text(raw text) RETURNS double precision
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN t ~* '^[+-]?(inf|infinity)$' THEN
+            CASE WHEN left(t, 1) = '-' THEN '-Infinity'::double precision ELSE 'Infinity'::double precision END
+        WHEN t !~ '^[+-]?([0-9](_?[0-9])*(\.([0-9](_?[0-9])*)?)?|\.[0-9](_?[0-9])*)([eE][+-]?[0-9](_?[0-9])*)?$' THEN NULL
+        WHEN abs(coalesce(substring(s from '[eE]([+-]?[0-9]+)$')::numeric, 0)) > 1000 THEN
+            CASE
+                WHEN s !~ '[1-9][^eE]*[eE]' THEN 0
+                WHEN s ~ '[eE]-' THEN 0
+                WHEN left(s, 1) = '-' THEN '-Infinity'::double precision
+                ELSE 'Infinity'::double precision
+            END
+        WHEN abs(s::numeric) >= power(2::numeric, 1024) - power(2::numeric, 970) THEN
+            CASE WHEN left(s, 1) = '-' THEN '-Infinity'::double precision ELSE 'Infinity'::double precision END
+        WHEN abs(s::numeric) * power(2::numeric, 1075) <= 1 THEN 0
+        ELSE s::double precision
+    END
+    FROM (SELECT btrim(raw, E' \t\n\r\f\v') AS t, replace(btrim(raw, E' \t\n\r\f\v'), '_', '') AS s) AS value
+$$"""
+
+
+def upgrade():
+    for statement in JOURNAL_NUMBER_FUNCTIONS:
+        op.execute(statement)
+    op.execute('REINDEX INDEX content.ix_journal_entries_score')
+
+
+def downgrade():
+    op.execute(PREVIOUS_JOURNAL_NUMBER_TEXT)
+    op.execute(JOURNAL_NUMBER_FUNCTIONS[1])
+    op.execute('REINDEX INDEX content.ix_journal_entries_score')
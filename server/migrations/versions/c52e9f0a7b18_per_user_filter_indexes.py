@@ -0,0 +1,92 @@
+"""per-user filter indexes
+
+Revision ID: c52e9f0a7b18
+Revises: 8d4e1a6b2c93
+Create Date: 2026-10-18 13:25:41.060214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52e9f0a7b18'
+down_revision = '8d4e1a6b2c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tasks', schema='productivity') as batch_op:
+        batch_op.create_index('ix_tasks_user_start', ['user_id', 'Start'], unique=False)
+        batch_op.create_index('ix_tasks_user_important_open', ['user_id'], unique=False,
+                              postgresql_where=sa.text('"IsImportant" AND NOT "IsCompleted"'))
+        batch_op.create_index('ix_tasks_user_background_open', ['user_id'], unique=False,
+                              postgresql_where=sa.text('"IsBackground" AND NOT "IsCompleted"'))
+
+    with op.batch_alter_table('task_list_relations', schema='productivity') as batch_op:
+        batch_op.create_index('ix_task_list_relations_list_task', ['ListID', 'TaskID'], unique=False)
+
+    with op.batch_alter_table('task_subtasks_relations', schema='productivity') as batch_op:
+        batch_op.create_index('ix_task_subtasks_relations_subtask_task', ['SubtaskID', 'TaskID'], unique=False)
+
+    with op.batch_alter_table('task_project_relations', schema='productivity') as batch_op:
+        batch_op.create_index('ix_task_project_relations_project_task', ['ProjectID', 'TaskID'], unique=False)
+
+    with op.batch_alter_table('list_group_relations', schema='productivity') as batch_op:
+        batch_op.create_index('ix_list_group_relations_group_list', ['GroupID', 'ListID'], unique=False)
+
+    with op.batch_alter_table('list_project_relations', schema='productivity') as batch_op:
+        batch_op.create_index('ix_list_project_relations_project_list', ['ProjectID', 'ListID'], unique=False)
+
+    with op.batch_alter_table('lists', schema='productivity') as batch_op:
+        batch_op.create_index('ix_lists_user_id', ['user_id'], unique=False)
+
+    with op.batch_alter_table('groups', schema='productivity') as batch_op:
+        batch_op.create_index('ix_groups_user_id', ['user_id'], unique=False)
+
+    with op.batch_alter_table('projects', schema='productivity') as batch_op:
+        batch_op.create_index('ix_projects_user_id', ['user_id'], unique=False)
+
+    with op.batch_alter_table('journal_entries', schema='content') as batch_op:
+        batch_op.create_index('ix_journal_entries_user_type', ['user_id', 'journal_type'], unique=False)
+
+    with op.batch_alter_table('chat_history', schema='communication') as batch_op:
+        batch_op.create_index('ix_chat_history_user_message', ['user_id', 'message_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chat_history', schema='communication') as batch_op:
+        batch_op.drop_index('ix_chat_history_user_message')
+
+    with op.batch_alter_table('journal_entries', schema='content') as batch_op:
+        batch_op.drop_index('ix_journal_entries_user_type')
+
+    with op.batch_alter_table('projects', schema='productivity') as batch_op:
+        batch_op.drop_index('ix_projects_user_id')
+
+    with op.batch_alter_table('groups', schema='productivity') as batch_op:
+        batch_op.drop_index('ix_groups_user_id')
+
+    with op.batch_alter_table('lists', schema='productivity') as batch_op:
+        batch_op.drop_index('ix_lists_user_id')
+
+    with op.batch_alter_table('list_project_relations', schema='productivity') as batch_op:
+        batch_op.drop_index('ix_list_project_relations_project_list')
+
+    with op.batch_alter_table('list_group_relations', schema='productivity') as batch_op:
+        batch_op.drop_index('ix_list_group_relations_group_list')
+
+    with op.batch_alter_table('task_project_relations', schema='productivity') as batch_op:
+        batch_op.drop_index('ix_task_project_relations_project_task')
+
+    with op.batch_alter_table('task_subtasks_relations', schema='productivity') as batch_op:
+        batch_op.drop_index('ix_task_subtasks_relations_subtask_task')
+
+    with op.batch_alter_table('task_list_relations', schema='productivity') as batch_op:
+        batch_op.drop_index('ix_task_list_relations_list_task')
+
+    with op.batch_alter_table('tasks', schema='productivity') as batch_op:
+        batch_op.drop_index('ix_tasks_user_background_open')
+        batch_op.drop_index('ix_tasks_user_important_open')
+        batch_op.drop_index('ix_tasks_user_start')
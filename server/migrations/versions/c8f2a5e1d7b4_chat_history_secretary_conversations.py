@@ -0,0 +1,45 @@
+"""chat history secretary conversations
+
+Revision ID: c8f2a5e1d7b4
+Revises: b6e1d4a9c3f2
+Create Date: 2026-10-18 23:31:08.715942
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f2a5e1d7b4'
+down_revision = 'b6e1d4a9c3f2'
+branch_labels = None
+depends_on = None
+
+# Пользователь, от имени которого пишет секретарь (app.main.chat.routes)
+SECRETARY_USER_ID = '2'
+
+
+def upgrade():
+    # Миграция f4b8c2d7a913 отнесла прежние ответы секретаря к его собственной беседе.
+    # Ответ относится к беседе ближайшего предшествующего сообщения не от секретаря;
+    # ответы до первого такого сообщения (приветствие) — к беседе следующего
+    op.execute(f"""
+        UPDATE communication.chat_history AS reply
+        SET conversation_id = coalesce(
+            (SELECT message.user_id FROM communication.chat_history AS message
+             WHERE message.user_id <> '{SECRETARY_USER_ID}' AND message.message_id < reply.message_id
+             ORDER BY message.message_id DESC LIMIT 1),
+            (SELECT message.user_id FROM communication.chat_history AS message
+             WHERE message.user_id <> '{SECRETARY_USER_ID}' AND message.message_id > reply.message_id
+             ORDER BY message.message_id LIMIT 1),
+            reply.user_id
+        )
+        WHERE reply.user_id = '{SECRETARY_USER_ID}'
+          AND (reply.conversation_id IS NULL OR reply.conversation_id = '{SECRETARY_USER_ID}')
+    """)
+
+
+def downgrade():
+    op.execute(f"""
+        UPDATE communication.chat_history SET conversation_id = user_id
+        WHERE user_id = '{SECRETARY_USER_ID}'
+    """)
@@ -0,0 +1,25 @@
+"""journal entries created index
+
+Revision ID: d81f3a6c5e27
+Revises: 9c2e6f4a1d57
+Create Date: 2026-10-18 18:12:40.531862
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f3a6c5e27'
+down_revision = '9c2e6f4a1d57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('journal_entries', schema='content') as batch_op:
+        batch_op.create_index('ix_journal_entries_created', ['user_id', 'journal_type', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('journal_entries', schema='content') as batch_op:
+        batch_op.drop_index('ix_journal_entries_created')
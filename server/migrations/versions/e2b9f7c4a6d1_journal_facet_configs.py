@@ -0,0 +1,32 @@
+"""journal facet configs
+
+Revision ID: e2b9f7c4a6d1
+Revises: c8f2a5e1d7b4
+Create Date: 2026-10-18 23:48:26.190573
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b9f7c4a6d1'
+down_revision = 'c8f2a5e1d7b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Пустая таблица означает, что счётчики content.journal_facets ещё не построены:
+    # их заполняет `flask rebuild-journal-facets --stale` при запуске контейнера
+    # и периодическая задача sync_journal_facets (filter_config берётся из modules.json)
+    op.create_table('journal_facet_configs',
+    sa.Column('journal_type', sa.String(length=50), nullable=False),
+    sa.Column('fields', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('journal_type'),
+    schema='content'
+    )
+
+
+def downgrade():
+    op.drop_table('journal_facet_configs', schema='content')
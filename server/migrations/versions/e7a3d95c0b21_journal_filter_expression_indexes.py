@@ -0,0 +1,77 @@
+"""journal filter expression indexes
+
+Revision ID: e7a3d95c0b21
+Revises: c52e9f0a7b18
+Create Date: 2026-10-18 15:02:17.418306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3d95c0b21'
+down_revision = 'c52e9f0a7b18'
+branch_labels = None
+depends_on = None
+
+# Копия app.journals.models.JOURNAL_FILTER_FUNCTIONS на момент миграции
+JOURNAL_FILTER_FUNCTIONS = (
+    r"""CREATE OR REPLACE FUNCTION content.journal_number_text(raw text) RETURNS double precision
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN t ~* '^[+-]?(inf|infinity)$' THEN
+            CASE WHEN left(t, 1) = '-' THEN '-Infinity'::double precision ELSE 'Infinity'::double precision END
+        WHEN t !~ '^[+-]?([0-9](_?[0-9])*(\.([0-9](_?[0-9])*)?)?|\.[0-9](_?[0-9])*)([eE][+-]?[0-9](_?[0-9])*)?$' THEN NULL
+        WHEN abs(coalesce(substring(s from '[eE]([+-]?[0-9]+)$')::numeric, 0)) > 1000 THEN
+            CASE
+                WHEN s !~ '[1-9][^eE]*[eE]' THEN 0
+                WHEN s ~ '[eE]-' THEN 0
+                WHEN left(s, 1) = '-' THEN '-Infinity'::double precision
+                ELSE 'Infinity'::double precision
+            END
+        WHEN abs(s::numeric) >= power(2::numeric, 1024) - power(2::numeric, 970) THEN
+            CASE WHEN left(s, 1) = '-' THEN '-Infinity'::double precision ELSE 'Infinity'::double precision END
+        WHEN abs(s::numeric) * power(2::numeric, 1075) <= 1 THEN 0
+        ELSE s::double precision
+    END
+    FROM (SELECT btrim(raw, E' \t\n\r\f\v') AS t, replace(btrim(raw, E' \t\n\r\f\v'), '_', '') AS s) AS value
+$$""",
+    r"""CREATE OR REPLACE FUNCTION content.journal_number(value json) RETURNS double precision
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(CASE json_typeof(value)
+        WHEN 'boolean' THEN CASE WHEN value::text = 'true' THEN 1 ELSE 0 END
+        WHEN 'number' THEN content.journal_number_text(value::text)
+        WHEN 'string' THEN content.journal_number_text(value #>> '{}')
+    END, 'NaN')
+$$""",
+    r"""CREATE OR REPLACE FUNCTION content.journal_sort_key(value json) RETURNS bytea
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE WHEN json_typeof(value) = 'string' AND value #>> '{}' <> ''
+        THEN convert_to(value #>> '{}', 'UTF8')
+    END
+$$""",
+)
+
+
+def upgrade():
+    for statement in JOURNAL_FILTER_FUNCTIONS:
+        op.execute(statement)
+
+    with op.batch_alter_table('journal_entries', schema='content') as batch_op:
+        batch_op.create_index('ix_journal_entries_publish_date',
+                              ['user_id', 'journal_type', sa.text("content.journal_sort_key(data -> 'publish_date')")],
+                              unique=False)
+        batch_op.create_index('ix_journal_entries_score',
+                              ['user_id', 'journal_type', sa.text("content.journal_number(data -> 'score')")],
+                              unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('journal_entries', schema='content') as batch_op:
+        batch_op.drop_index('ix_journal_entries_score')
+        batch_op.drop_index('ix_journal_entries_publish_date')
+
+    op.execute('DROP FUNCTION IF EXISTS content.journal_sort_key(json)')
+    op.execute('DROP FUNCTION IF EXISTS content.journal_number(json)')
+    op.execute('DROP FUNCTION IF EXISTS content.journal_number_text(text)')
@@ -0,0 +1,33 @@
+"""chat history conversation
+
+Revision ID: f4b8c2d7a913
+Revises: d81f3a6c5e27
+Create Date: 2026-10-18 21:40:12.318407
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b8c2d7a913'
+down_revision = 'd81f3a6c5e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('chat_history', schema='communication') as batch_op:
+        batch_op.add_column(sa.Column('conversation_id', sa.String(length=36), nullable=True))
+
+    # Прежние сообщения относятся к беседе своего автора
+    op.execute('UPDATE communication.chat_history SET conversation_id = user_id WHERE conversation_id IS NULL')
+
+    with op.batch_alter_table('chat_history', schema='communication') as batch_op:
+        batch_op.create_index('ix_chat_history_conversation_message', ['conversation_id', 'message_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chat_history', schema='communication') as batch_op:
+        batch_op.drop_index('ix_chat_history_conversation_message')
+        batch_op.drop_column('conversation_id')
@@ -4,9 +4,10 @@ import eventlet
 eventlet.monkey_patch()
 
 from app import create_app, socketio
+from app.maintenance import start_maintenance_jobs
 
 
-def run_server_with_ssl(app, args):
+def run_server_with_ssl(app, args, use_reloader):
     base_dir = os.path.dirname(os.path.abspath(__file__))
     cert_path = os.path.join(base_dir, 'localhost.pem')
     key_path = os.path.join(base_dir, 'localhost-key.pem')
@@ -18,8 +19,8 @@ def run_server_with_ssl(app, args):
                  host=args.host,
                  port=args.port,
                  debug=(args.mode == 'development'),
-                 use_reloader=(args.mode == 'development'),
-                 reloader_options={'extra_files': None} if args.mode == 'development' else None,
+                 use_reloader=use_reloader,
+                 reloader_options={'extra_files': None} if use_reloader else None,
                  certfile=cert_path,
                  keyfile=key_path)
 
@@ -39,9 +40,14 @@ def main():
     config_type = 'test' if args.mode == 'test' else 'work'
     app = create_app(config_type)
 
+    # При перезагрузчике задачи запускаются только в дочернем процессе
+    use_reloader = args.mode == 'development'
+    if not use_reloader or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_maintenance_jobs(app)
+
     if args.mode in ['development', 'production', 'test']:
         print(f"{args.mode.capitalize()} server running at: https://{args.host}:{args.port}")
-        run_server_with_ssl(app, args)
+        run_server_with_ssl(app, args, use_reloader)
     else:  # docker or test without SSL
         print(f"{args.mode.capitalize()} server running at: http://{args.host}:{args.port}")
         socketio.run(app,